@@ -0,0 +1,175 @@
+"""Benchmark call patterns of the client against a local stub server.
+
+Usage:
+    python benchmarks/bench_client.py [--latency 0.02] [--count 200] ...
+
+Starts a listennotes.stub_server.StubServer, then fetches the same `count`
+episodes sequentially, with threads (fetch_many), with threads and
+Client(coalesce=...), with asyncio (AsyncClient.fetch_many), and in batches
+(batch_fetch_all_episodes), reporting throughput and latency percentiles of
+each pattern. Runs offline, so it can be used to catch performance
+regressions of the client.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from listennotes import podcast_api, stub_server  # noqa: E402
+
+
+def _client(server, client_class=podcast_api.Client, **kwargs):
+    client = client_class(metrics=True, **kwargs)
+    client.api_base = server.api_base
+    return client
+
+
+def bench_sequential(server, ids, workers, client_kwargs):
+    client = _client(server, **client_kwargs)
+    for the_id in ids:
+        client.fetch_episode_by_id(id=the_id)
+    return client
+
+
+def bench_threaded(server, ids, workers, client_kwargs):
+    client = _client(server, pool_maxsize=workers, **client_kwargs)
+    for result in client.fetch_many("fetch_episode_by_id", ids):
+        if result.error:
+            raise result.error
+    return client
+
+
+def bench_coalesced(server, ids, workers, client_kwargs):
+    client = _client(
+        server, pool_maxsize=workers, coalesce="episodes", **client_kwargs
+    )
+    for result in client.fetch_many("fetch_episode_by_id", ids):
+        if result.error:
+            raise result.error
+    return client
+
+
+def bench_async(server, ids, workers, client_kwargs):
+    client = _client(
+        server,
+        client_class=podcast_api.AsyncClient,
+        max_connections=workers,
+        pool_maxsize=workers,
+        **client_kwargs
+    )
+
+    async def main():
+        async with client:
+            async for result in client.fetch_many("fetch_episode_by_id", ids):
+                if result.error:
+                    raise result.error
+
+    asyncio.run(main())
+    return client
+
+
+def bench_batched(server, ids, workers, client_kwargs):
+    client = _client(server, pool_maxsize=workers, **client_kwargs)
+    client.batch_fetch_all_episodes(ids)
+    return client
+
+
+PATTERNS = {
+    "sequential": bench_sequential,
+    "threaded": bench_threaded,
+    "coalesced": bench_coalesced,
+    "async": bench_async,
+    "batched": bench_batched,
+}
+
+
+def run(patterns, count, workers, client_kwargs=None, **server_kwargs):
+    ids = ["%032x" % i for i in range(count)]
+    results = {}
+    with stub_server.StubServer(**server_kwargs) as server:
+        for name in patterns:
+            started = time.perf_counter()
+            try:
+                client = PATTERNS[name](
+                    server, ids, workers, client_kwargs or {}
+                )
+            except ImportError as e:
+                print("%-12s skipped: %s" % (name, e))
+                continue
+            seconds = time.perf_counter() - started
+            requests = sum(
+                stats["count"] for stats in client.metrics.snapshot().values()
+            )
+            latency = client.metrics.latency()
+            results[name] = {
+                "seconds": seconds,
+                "requests": requests,
+                "episodes_per_second": count / seconds,
+                "p50": latency.quantile(0.5),
+                "p95": latency.quantile(0.95),
+                "p99": latency.quantile(0.99),
+            }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--patterns",
+        default=",".join(PATTERNS),
+        help="comma-separated patterns to run",
+    )
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--retry",
+        action="store_true",
+        help="retry failed requests, e.g., with --rate-limit-rate",
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run(
+        args.patterns.split(","),
+        args.count,
+        args.workers,
+        client_kwargs={"retry_policy": args.retry},
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=0,
+    )
+    print(
+        "%-12s %9s %9s %12s %8s %8s %8s"
+        % ("pattern", "seconds", "requests", "episodes/s", "p50", "p95", "p99")
+    )
+    for name, result in results.items():
+        print(
+            "%-12s %9.2f %9d %12.1f %7.0fms %7.0fms %7.0fms"
+            % (
+                name,
+                result["seconds"],
+                result["requests"],
+                result["episodes_per_second"],
+                result["p50"] * 1000,
+                result["p95"] * 1000,
+                result["p99"] * 1000,
+            )
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
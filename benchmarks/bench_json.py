@@ -0,0 +1,103 @@
+"""Compare json decoders on Listen API payloads.
+
+Usage:
+    python benchmarks/bench_json.py [payload.json ...]
+
+Without arguments, benchmarks synthetic payloads shaped like the responses
+of fetch_podcast_by_id and search. Pass recorded response bodies to
+benchmark real payloads.
+"""
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import requests  # noqa: E402
+
+from listennotes import decoders  # noqa: E402
+
+
+def _episode(i):
+    return {
+        "id": "%032x" % i,
+        "title": "Episode %s: a conversation about podcasts" % i,
+        "description": "<p>Show notes with <b>html</b> — %s</p>" % ("x" * 800),
+        "pub_date_ms": 1479110402000 - i * 86400000,
+        "audio": "https://www.listennotes.com/e/p/%032x/" % i,
+        "audio_length_sec": 3600 + i,
+        "image": "https://cdn-images-1.listennotes.com/%032x.jpg" % i,
+        "thumbnail": "https://cdn-images-1.listennotes.com/%032x.jpg" % i,
+        "link": "https://example.com/episodes/%s" % i,
+        "listennotes_url": "https://www.listennotes.com/e/%032x/" % i,
+        "explicit_content": False,
+        "maybe_audio_invalid": False,
+    }
+
+
+def synthetic_payloads():
+    podcast = {
+        "id": "4d3fe717742d4963a85562e9f84d8c79",
+        "title": "Star Wars 7x7",
+        "description": "x" * 2000,
+        "genre_ids": [86, 160, 138],
+        "total_episodes": 1500,
+        "next_episode_pub_date": 1479110402000,
+        "episodes": [_episode(i) for i in range(10)],
+    }
+    search = {
+        "count": 10,
+        "total": 10000,
+        "next_offset": 10,
+        "results": [
+            dict(_episode(i), podcast=dict(podcast, episodes=None))
+            for i in range(10)
+        ],
+    }
+    batch = {"episodes": [_episode(i) for i in range(1000)]}
+    return {
+        "fetch_podcast_by_id": json.dumps(podcast).encode(),
+        "search": json.dumps(search).encode(),
+        "batch_fetch_episodes (1000 episodes)": json.dumps(batch).encode(),
+    }
+
+
+def _requests_json(content):
+    # What response.json() does without a custom decoder
+    response = requests.Response()
+    response._content = content
+    response.encoding = "utf-8"
+    return response.json()
+
+
+def bench(payloads, number=200):
+    candidates = [("requests Response.json()", _requests_json)]
+    for name in decoders.available_decoders():
+        candidates.append((name, decoders.get_decoder(name)))
+
+    for payload_name, content in payloads.items():
+        print("%s, %.1f KB" % (payload_name, len(content) / 1024.0))
+        baseline = None
+        for name, decode in candidates:
+            seconds = min(
+                timeit.repeat(lambda: decode(content), number=number, repeat=3)
+            )
+            per_call = seconds / number * 1e6
+            baseline = baseline or per_call
+            print(
+                "  %-28s %10.1f us/call  %5.2fx"
+                % (name, per_call, baseline / per_call)
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        payloads = {}
+        for path in sys.argv[1:]:
+            with open(path, "rb") as f:
+                payloads[os.path.basename(path)] = f.read()
+    else:
+        payloads = synthetic_payloads()
+    bench(payloads)
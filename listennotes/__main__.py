@@ -0,0 +1,22 @@
+"""Command line tools of the Listen API client.
+
+Usage:
+    python -m listennotes export --help
+"""
+
+import argparse
+import sys
+
+from listennotes import export
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m listennotes")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export.add_parser(subparsers)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import collections
+import json
+import os
+import threading
+import time
+from urllib.parse import urlencode
+
+from listennotes import endpoints
+
+# Cache ttls (seconds) of read-only endpoints whose data changes rarely,
+# keyed by path template (see endpoints.EndpointMap).
+DEFAULT_TTLS = {
+    "/genres": 24 * 3600,
+    "/regions": 24 * 3600,
+    "/languages": 24 * 3600,
+    "/curated_podcasts": 3600,
+    "/best_podcasts": 3600,
+}
+DEFAULT_MAXSIZE = 1024
+
+
+def cache_key(method, url, params=None):
+    """Build a cache key from method + url + normalized query params."""
+    items = sorted(
+        (str(key), str(value))
+        for key, value in (params or {}).items()
+        if value is not None
+    )
+    return "%s %s?%s" % (method.upper(), url, urlencode(items))
+
+
+class MemoryBackend:
+    """Thread-safe in-process LRU storage for ResponseCache.
+
+    A cache backend maps keys to (expires_at, response) tuples, and has
+    get(key), set(key, value) and delete(key) methods.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    """Cache storage in a SQLite database file.
+
+    Several threads and processes can share the same file: each thread of
+    each process gets its own connection, and the database runs in WAL mode
+    so readers don't block the writer. When there are more than maxsize
+    responses, the least recently stored ones are deleted.
+    """
+
+    def __init__(self, path, maxsize=DEFAULT_MAXSIZE * 64, timeout=30):
+        """
+        Args:
+            path: the database file path.
+            maxsize: max number of responses kept.
+            timeout: seconds to wait for a lock held by another connection.
+        """
+        self.path = path
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " expires_at REAL NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " status_code INTEGER NOT NULL,"
+                " url TEXT NOT NULL,"
+                " headers TEXT NOT NULL,"
+                " content BLOB NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_stored_at"
+                " ON responses (stored_at)"
+            )
+
+    def _connect(self):
+        # Connections can't be shared across threads, or survive a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            import sqlite3
+
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        row = (
+            self._connect()
+            .execute(
+                "SELECT expires_at, status_code, url, headers, content"
+                " FROM responses WHERE key = ?",
+                (key,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        from listennotes import transport
+
+        expires_at, status_code, url, headers, content = row
+        response = transport.cached_response(
+            status_code, url, json.loads(headers), bytes(content)
+        )
+        return expires_at, response
+
+    def set(self, key, value):
+        expires_at, response = value
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, expires_at, stored_at, status_code, url, headers,"
+                " content) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    expires_at,
+                    time.time(),
+                    response.status_code,
+                    response.url,
+                    json.dumps(dict(response.headers)),
+                    response.content,
+                ),
+            )
+            connection.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM"
+                " responses ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def delete(self, key):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def __len__(self):
+        return (
+            self._connect()
+            .execute("SELECT COUNT(*) FROM responses")
+            .fetchone()[0]
+        )
+
+
+class ResponseCache:
+    """Cache successful GET responses of selected endpoints.
+
+    Concurrent requests for the same missing key are collapsed into one
+    (single-flight): the first caller sends the request, the others wait
+    for its response, so a cold cache doesn't send a thundering herd.
+    """
+
+    def __init__(self, ttls=None, maxsize=DEFAULT_MAXSIZE, backend=None):
+        """
+        Args:
+            ttls: a dict of path template => ttl in seconds, DEFAULT_TTLS by
+                default. Endpoints not in it are never cached.
+            maxsize: max number of responses kept by the default backend.
+            backend: a custom cache backend, e.g., SQLiteBackend to share
+                the cache across processes. If this argument is specified,
+                maxsize is ignored.
+        """
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.backend = (
+            backend if backend is not None else MemoryBackend(maxsize)
+        )
+        self._endpoint_ttls = endpoints.EndpointMap(self.ttls)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def ttl_for(self, url):
+        """Return the ttl of the endpoint of url, or None if not cached."""
+        return self._endpoint_ttls.get(url)
+
+    def fetch(self, key, ttl, send):
+        """Return the cached response of key, or call send() to get one.
+
+        An expired response with an ETag or Last-Modified header is
+        revalidated with a conditional request: if the server answers 304 Not
+        Modified, the cached response is kept for another ttl seconds.
+
+        Args:
+            key: a cache key, see cache_key().
+            ttl: seconds to keep a fresh response.
+            send: a callable taking a dict of extra request headers, and
+                returning a response or raising an exception. Exceptions
+                aren't cached.
+        """
+        from concurrent import futures
+
+        value = self.backend.get(key)
+        if value is not None and value[0] > time.time():
+            return value[1]
+
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = futures.Future()
+        if not leader:
+            return flight.result()
+
+        try:
+            response = self._revalidate(key, ttl, value, send)
+            flight.set_result(response)
+            return response
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _revalidate(self, key, ttl, value, send):
+        headers = {}
+        if value is not None:
+            etag = value[1].headers.get("ETag")
+            last_modified = value[1].headers.get("Last-Modified")
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = send(headers)
+        if response.status_code == 304 and value is not None:
+            response = value[1]
+        self.backend.set(key, (time.time() + ttl, response))
+        return response
+
+    def invalidate(self, key):
+        self.backend.delete(key)
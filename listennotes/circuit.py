@@ -0,0 +1,280 @@
+import threading
+import time
+
+from listennotes import cache, endpoints, errors
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30  # seconds
+HALF_OPEN_PROBES = 1
+DEFAULT_MAXSIZE = 1024
+
+
+class _Circuit:
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.rejected = 0
+        self.served_stale = 0
+
+
+class CircuitBreaker:
+    """Fail fast on endpoints that keep failing.
+
+    Each endpoint (path template) has its own circuit. After
+    failure_threshold consecutive failures (5xx responses, connection errors
+    or timeouts), the circuit opens: calls to the endpoint raise
+    errors.CircuitOpenError right away, without sending a request. After
+    reset_timeout seconds, the circuit is half-open: up to half_open_probes
+    calls go through as probes, and other calls are still rejected. A probe
+    that succeeds closes the circuit; one that fails opens it again.
+
+    With serve_stale, the last good response to each GET request is kept in
+    stale_cache, and returned with response.stale = True instead of raising,
+    when the circuit is open or the request fails.
+    """
+
+    def __init__(
+        self,
+        failure_threshold=FAILURE_THRESHOLD,
+        reset_timeout=RESET_TIMEOUT,
+        half_open_probes=HALF_OPEN_PROBES,
+        serve_stale=False,
+        stale_cache=None,
+    ):
+        """
+        Args:
+            failure_threshold: consecutive failures opening a circuit.
+            reset_timeout: seconds a circuit stays open before probing.
+            half_open_probes: max probes in flight in a half-open circuit.
+            serve_stale: if True, return the last good response of a GET
+                request when the endpoint fails.
+            stale_cache: a cache backend (see cache.MemoryBackend) storing
+                the last good responses; a cache.MemoryBackend holding
+                DEFAULT_MAXSIZE responses by default.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.serve_stale = serve_stale
+        if serve_stale and stale_cache is None:
+            stale_cache = cache.MemoryBackend(DEFAULT_MAXSIZE)
+        self.stale_cache = stale_cache
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, url):
+        endpoint = endpoints.endpoint_name(url)
+        circuit = self._circuits.get(endpoint)
+        if circuit is None:
+            circuit = self._circuits[endpoint] = _Circuit()
+        return circuit
+
+    def state(self, url):
+        """Return the state of the circuit of url's endpoint."""
+        with self._lock:
+            circuit = self._circuit(url)
+            if (
+                circuit.state == OPEN
+                and time.monotonic() - circuit.opened_at >= self.reset_timeout
+            ):
+                return HALF_OPEN
+            return circuit.state
+
+    def allow(self, url):
+        """Return (allowed, probe) for a call to url.
+
+        probe is True if the call is a probe of a half-open circuit, and
+        must be followed by record(url, failed, probe=True).
+        """
+        with self._lock:
+            circuit = self._circuit(url)
+            if circuit.state == CLOSED:
+                return True, False
+            if circuit.state == OPEN:
+                if time.monotonic() - circuit.opened_at < self.reset_timeout:
+                    circuit.rejected += 1
+                    return False, False
+                circuit.state = HALF_OPEN
+                circuit.probes = 0
+            if circuit.probes >= self.half_open_probes:
+                circuit.rejected += 1
+                return False, False
+            circuit.probes += 1
+            return True, True
+
+    def record(self, url, failed, probe=False):
+        """Record the outcome of a call to url."""
+        with self._lock:
+            circuit = self._circuit(url)
+            if probe:
+                circuit.probes -= 1
+                if failed:
+                    circuit.state = OPEN
+                    circuit.opened_at = time.monotonic()
+                else:
+                    circuit.state = CLOSED
+                    circuit.failures = 0
+            elif circuit.state == CLOSED:
+                # Calls sent before the circuit opened are ignored
+                if not failed:
+                    circuit.failures = 0
+                    return
+                circuit.failures += 1
+                if circuit.failures >= self.failure_threshold:
+                    circuit.state = OPEN
+                    circuit.opened_at = time.monotonic()
+
+    def _release_probe(self, url):
+        with self._lock:
+            self._circuit(url).probes -= 1
+
+    def call(
+        self,
+        method,
+        url,
+        params,
+        send,
+        transport_errors=(),
+        cacheable=True,
+    ):
+        """Call send() through the circuit of url's endpoint.
+
+        Args:
+            method, url, params: the request send() makes, keying the
+                stale response.
+            send: a function returning a response.
+            transport_errors: exception types raised by send() on
+                connection errors and timeouts.
+            cacheable: False if the response can't be served again, e.g.,
+                a streamed response whose body is read by the caller.
+        """
+        key = self._stale_key(method, url, params) if cacheable else None
+        allowed, probe = self.allow(url)
+        if not allowed:
+            return self._reject(url, key)
+        try:
+            response = send()
+        except Exception as e:
+            failed = self.is_failure(
+                error=e, transport_errors=transport_errors
+            )
+            self.record(url, failed, probe)
+            stale = self._stale(url, key) if failed else None
+            if stale is None:
+                raise
+            return stale
+        except BaseException:
+            # Interrupted or cancelled, e.g., the losing request of a hedge
+            if probe:
+                self._release_probe(url)
+            raise
+        return self._done(url, key, response, probe)
+
+    async def acall(
+        self,
+        method,
+        url,
+        params,
+        send,
+        transport_errors=(),
+        cacheable=True,
+    ):
+        """Asyncio version of call(); send() returns an awaitable."""
+        key = self._stale_key(method, url, params) if cacheable else None
+        allowed, probe = self.allow(url)
+        if not allowed:
+            return self._reject(url, key)
+        try:
+            response = await send()
+        except Exception as e:
+            failed = self.is_failure(
+                error=e, transport_errors=transport_errors
+            )
+            self.record(url, failed, probe)
+            stale = self._stale(url, key) if failed else None
+            if stale is None:
+                raise
+            return stale
+        except BaseException:
+            # Interrupted or cancelled, e.g., the losing request of a hedge
+            if probe:
+                self._release_probe(url)
+            raise
+        return self._done(url, key, response, probe)
+
+    @staticmethod
+    def is_failure(response=None, error=None, transport_errors=()):
+        """True if a response or error counts against the circuit.
+
+        4xx responses (including 429, which the rate limiter handles) mean
+        the server is up, so they don't.
+        """
+        if error is not None:
+            if isinstance(
+                error, (errors.APIConnectionError,) + transport_errors
+            ):
+                return True
+            if not isinstance(error, errors.ListenApiError):
+                return False
+            response = error.response
+        return response is not None and response.status_code >= 500
+
+    def _done(self, url, key, response, probe):
+        failed = self.is_failure(response=response)
+        self.record(url, failed, probe)
+        if failed:
+            stale = self._stale(url, key)
+            return response if stale is None else stale
+        if key is not None and response.status_code == 200:
+            self.stale_cache.set(key, (time.time(), response))
+        return response
+
+    def _reject(self, url, key):
+        stale = self._stale(url, key)
+        if stale is not None:
+            return stale
+        raise errors.CircuitOpenError(
+            "Listen API endpoint %s is failing, request not sent."
+            % endpoints.endpoint_name(url)
+        )
+
+    def _stale_key(self, method, url, params):
+        if not self.serve_stale or method.upper() != "GET":
+            return None
+        return cache.cache_key(method, url, params)
+
+    def _stale(self, url, key):
+        if key is None:
+            return None
+        value = self.stale_cache.get(key)
+        if value is None:
+            return None
+        with self._lock:
+            self._circuit(url).served_stale += 1
+        stored_at, response = value
+        # Copy, so the caller that got the fresh response doesn't see it
+        # turn stale
+        stale = object.__new__(type(response))
+        stale.__dict__.update(response.__dict__)
+        stale.stale = True
+        stale.stored_at = stored_at
+        return stale
+
+    def stats(self):
+        """Return a dict of endpoint => state and counters."""
+        with self._lock:
+            return {
+                endpoint: {
+                    "state": circuit.state,
+                    "failures": circuit.failures,
+                    "rejected": circuit.rejected,
+                    "served_stale": circuit.served_stale,
+                }
+                for endpoint, circuit in self._circuits.items()
+            }
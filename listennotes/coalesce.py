@@ -0,0 +1,112 @@
+import threading
+
+from listennotes import errors
+
+
+WINDOW = 0.005  # seconds
+
+
+class _Batch:
+    __slots__ = ("futures", "timer")
+
+    def __init__(self):
+        self.futures = {}
+        self.timer = None
+
+
+class Coalescer:
+    """Merge single-id lookups arriving close together into batch requests.
+
+    The first id submitted opens a batch, sent `window` seconds later, or as
+    soon as it holds max_batch ids, in one call to batch_func. Each caller
+    then gets the item of its id, as a CoalescedResponse, or a NotFoundError
+    if the batch response doesn't have it. Callers asking for the same id
+    in the same window share one result. Thread-safe.
+    """
+
+    def __init__(self, batch_func, key, url_func, window=WINDOW, max_batch=10):
+        """
+        Args:
+            batch_func: called with ids="id1,id2,..."; returns a response
+                with the items in a list under `key`.
+            key: "episodes" or "podcasts".
+            url_func: returns the url of the single-id endpoint of an id.
+            window: max seconds an id waits for other ids to join its batch.
+            max_batch: max ids per batch request.
+        """
+        self.batch_func = batch_func
+        self.key = key
+        self.url_func = url_func
+        self.window = window
+        self.max_batch = max_batch
+        self._batch = None
+        self._lock = threading.Lock()
+
+    def fetch(self, the_id):
+        """Return the CoalescedResponse of the_id, waiting for its batch."""
+        return self.submit(the_id).result()
+
+    def submit(self, the_id):
+        """Add the_id to the open batch; return a Future of its response."""
+        from concurrent.futures import Future
+
+        the_id = str(the_id)
+        start_timer = False
+        with self._lock:
+            batch = self._batch
+            if batch is None:
+                batch = self._batch = _Batch()
+                batch.timer = threading.Timer(
+                    self.window, self._flush, [batch]
+                )
+                batch.timer.daemon = True
+                start_timer = True
+            future = batch.futures.get(the_id)
+            if future is None:
+                future = batch.futures[the_id] = Future()
+            full = len(batch.futures) >= self.max_batch
+            if full:
+                self._batch = None
+        if start_timer:
+            batch.timer.start()
+        if full:
+            batch.timer.cancel()
+            self._send(batch)
+        return future
+
+    def _flush(self, batch):
+        with self._lock:
+            if self._batch is not batch:
+                # Already sent because it was full
+                return
+            self._batch = None
+        self._send(batch)
+
+    def _send(self, batch):
+        from listennotes import transport
+
+        try:
+            response = self.batch_func(ids=",".join(batch.futures))
+            items = {
+                item["id"]: item for item in response.json().get(self.key, [])
+            }
+        except Exception as e:
+            for future in batch.futures.values():
+                future.set_exception(e)
+            return
+
+        for the_id, future in batch.futures.items():
+            item = items.get(the_id)
+            if item is None:
+                future.set_exception(
+                    errors.NotFoundError(
+                        "Podcast / episode %s not exist." % the_id,
+                        response=response,
+                    )
+                )
+            else:
+                future.set_result(
+                    transport.CoalescedResponse(
+                        response, self.url_func(the_id), item
+                    )
+                )
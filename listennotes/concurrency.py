@@ -0,0 +1,116 @@
+import collections
+import contextvars
+
+
+def _call(func, item):
+    try:
+        return func(item), None
+    except Exception as e:
+        return None, e
+
+
+def bounded_map(func, items, max_workers, ordered=True):
+    """Call func(item) for every item on a thread pool.
+
+    At most 2 * max_workers calls are pending at any time, so items can be a
+    lazy iterable of any length without queueing everything up front. Calls
+    run in a copy of the caller's context, e.g., its scheduler.priority().
+
+    Args:
+        func: a callable taking a single item.
+        items: an iterable of items.
+        max_workers: the number of threads.
+        ordered: if True, yield results in input order; otherwise yield them
+            as they complete.
+
+    Yields:
+        (item, result, error) tuples. If func raised, result is None and
+        error is the exception; otherwise error is None.
+    """
+    max_pending = 2 * max_workers
+    it = iter(items)
+    pending = collections.OrderedDict()
+
+    from concurrent import futures
+
+    with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        def fill():
+            while len(pending) < max_pending:
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                context = contextvars.copy_context()
+                pending[executor.submit(context.run, _call, func, item)] = item
+
+        try:
+            fill()
+            while pending:
+                if ordered:
+                    done = [next(iter(pending))]
+                else:
+                    done, _ = futures.wait(
+                        pending, return_when=futures.FIRST_COMPLETED
+                    )
+                for future in done:
+                    item = pending.pop(future)
+                    result, error = future.result()
+                    yield item, result, error
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+async def abounded_map(func, items, max_concurrency, ordered=True):
+    """Asyncio version of bounded_map.
+
+    Args:
+        func: a coroutine function taking a single item.
+        items: an iterable of items.
+        max_concurrency: max number of coroutines running at the same time.
+        ordered: if True, yield results in input order; otherwise yield them
+            as they complete.
+
+    Yields:
+        (item, result, error) tuples, same as bounded_map.
+    """
+    import asyncio
+
+    async def call(item):
+        try:
+            return await func(item), None
+        except Exception as e:
+            return None, e
+
+    it = iter(items)
+    pending = collections.OrderedDict()
+
+    def fill():
+        while len(pending) < max_concurrency:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            pending[asyncio.ensure_future(call(item))] = item
+
+    try:
+        fill()
+        while pending:
+            if ordered:
+                task = next(iter(pending))
+                await task
+                done = [task]
+            else:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+            for task in done:
+                item = pending.pop(task)
+                result, error = task.result()
+                yield item, result, error
+            fill()
+    finally:
+        for task in pending:
+            task.cancel()
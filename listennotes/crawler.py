@@ -0,0 +1,510 @@
+"""Crawl many podcasts or episodes with a pool of processes, or of machines.
+
+A crawl is a SQLite file holding the ids to crawl (a WorkQueue), and the
+request budget shared by all workers. Add ids, then run a Crawler on one
+or more machines, calling func(client, id) once per id:
+
+    def crawl_podcast(client, podcast_id):
+        save(client.fetch_podcast_by_id(id=podcast_id).json())
+
+    crawler.WorkQueue("crawl.db").add(podcast_ids)
+    crawler.Crawler("crawl.db", crawl_podcast, processes=8, rate=20).run()
+
+func must be picklable, e.g., a module-level function or a
+functools.partial of one, as it's sent to each worker process.
+"""
+
+import bisect
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from listennotes import concurrency, podcast_api, ratelimit
+
+# Ids are hashed to SHARDS shards, and shards to workers
+SHARDS = 256
+VNODES = 64
+LEASE = 300  # seconds
+HEARTBEAT = 10  # seconds
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+# Error of an id whose attempt never finished
+CRASHED = "worker crashed"
+
+
+def _hash(key):
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_of(task_id, shards=SHARDS):
+    return _hash(str(task_id)) % shards
+
+
+class HashRing:
+    """Consistent hashing of keys to nodes.
+
+    Each node is placed at `vnodes` points of a ring of hashes, and a key
+    goes to the node of the first point after its hash. When a node is
+    added or removed, only the keys of its points move.
+    """
+
+    def __init__(self, nodes=(), vnodes=VNODES):
+        self.vnodes = vnodes
+        self._points = []
+        self._nodes = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        for i in range(self.vnodes):
+            point = _hash("%s#%s" % (node, i))
+            bisect.insort(self._points, point)
+            self._nodes[point] = node
+
+    def remove(self, node):
+        for i in range(self.vnodes):
+            point = _hash("%s#%s" % (node, i))
+            if self._nodes.get(point) == node:
+                del self._nodes[point]
+                self._points.remove(point)
+
+    def node_for(self, key):
+        """Return the node of key, or None if the ring is empty."""
+        if not self._points:
+            return None
+        i = bisect.bisect(self._points, _hash(str(key)))
+        return self._nodes[self._points[i % len(self._points)]]
+
+    def __len__(self):
+        return len(set(self._nodes.values()))
+
+
+class WorkQueue:
+    """Ids to crawl, in a SQLite file shared by workers.
+
+    Each id belongs to one of SHARDS shards, and the shards are spread over
+    the live workers (the ones with a recent heartbeat) by a HashRing.
+    claim() leases ids of the worker's own shards first, and takes ids of
+    other shards only when its own are done, so slow workers don't hold
+    up the crawl.
+
+    A lease expires after `lease` seconds: ids claimed by a worker that
+    died are claimed again by others. An id is tried max_attempts times,
+    counting the attempts that crashed a worker, then marked failed. An
+    attempt is counted when the worker starts it (see start()), so ids
+    leased next to one crashing its worker don't lose attempts; and ids
+    that were running when their worker died are claimed one at a time,
+    so the next crash is only counted against the id causing it.
+    """
+
+    def __init__(
+        self,
+        path,
+        lease=LEASE,
+        max_attempts=MAX_ATTEMPTS,
+        heartbeat=HEARTBEAT,
+        timeout=30,
+    ):
+        """
+        Args:
+            path: the database file path.
+            lease: seconds a worker has to finish the ids it claimed.
+            max_attempts: attempts per id before it's marked failed.
+            heartbeat: seconds between worker heartbeats; workers missing
+                3 heartbeats are left out of the ring.
+            timeout: seconds to wait for a lock held by another process.
+        """
+        self.path = path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.heartbeat_interval = heartbeat
+        self.timeout = timeout
+        self._local = threading.local()
+        self._ring = None
+        self._ring_workers = None
+        with self._transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                " id TEXT PRIMARY KEY,"
+                " shard INTEGER NOT NULL,"
+                " state TEXT NOT NULL,"
+                " worker TEXT,"
+                " lease_until REAL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " error TEXT)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS tasks_state_shard"
+                " ON tasks (state, shard)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS workers ("
+                " id TEXT PRIMARY KEY,"
+                " heartbeat REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # Connections can't be shared across threads, or survive a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def add(self, task_ids, chunk_size=1000):
+        """Add ids to crawl; ids already in the queue are ignored."""
+        chunk = []
+        for task_id in task_ids:
+            task_id = str(task_id)
+            chunk.append((task_id, shard_of(task_id), PENDING))
+            if len(chunk) >= chunk_size:
+                self._insert(chunk)
+                chunk = []
+        if chunk:
+            self._insert(chunk)
+
+    def _insert(self, rows):
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks (id, shard, state)"
+                " VALUES (?, ?, ?)",
+                rows,
+            )
+
+    #
+    # Workers
+    #
+    def register(self, worker_id):
+        self.beat(worker_id)
+
+    def beat(self, worker_id):
+        """Record that worker_id is alive."""
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO workers VALUES (?, ?)",
+                (worker_id, time.time()),
+            )
+
+    def release(self, worker_id):
+        """Remove worker_id, and put the ids it leased back in the queue,
+        e.g., after it crashed."""
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET state = ?, worker = NULL"
+                " WHERE state = ? AND worker = ?",
+                (PENDING, LEASED, worker_id),
+            )
+            connection.execute(
+                "DELETE FROM workers WHERE id = ?", (worker_id,)
+            )
+
+    def live_workers(self, connection=None):
+        connection = connection or self._connect()
+        rows = connection.execute(
+            "SELECT id FROM workers WHERE heartbeat >= ? ORDER BY id",
+            (time.time() - 3 * self.heartbeat_interval,),
+        )
+        return tuple(row[0] for row in rows)
+
+    def shards_of(self, worker_id, workers):
+        """Return the shards of worker_id, among the live workers."""
+        if workers != self._ring_workers:
+            self._ring = HashRing(workers)
+            self._ring_workers = workers
+        return [
+            shard
+            for shard in range(SHARDS)
+            if self._ring.node_for(shard) == worker_id
+        ]
+
+    #
+    # Tasks
+    #
+    def claim(self, worker_id, limit):
+        """Lease up to limit ids to worker_id; return them."""
+        now = time.time()
+        with self._transaction() as connection:
+            # Leases of workers that died
+            connection.execute(
+                "UPDATE tasks SET state = ?, worker = NULL"
+                " WHERE state = ? AND lease_until < ?",
+                (PENDING, LEASED, now),
+            )
+            self._fail_exhausted(connection)
+            workers = self.live_workers(connection)
+            shards = self.shards_of(worker_id, workers)
+            task_ids = []
+            if shards:
+                task_ids = self._pending(connection, shards, limit)
+            if not task_ids:
+                # Help with the shards of others
+                task_ids = self._pending(connection, None, limit)
+            connection.executemany(
+                "UPDATE tasks SET state = ?, worker = ?, lease_until = ?"
+                " WHERE id = ?",
+                [
+                    (LEASED, worker_id, now + self.lease, task_id)
+                    for task_id in task_ids
+                ],
+            )
+        return task_ids
+
+    def _pending(self, connection, shards, limit):
+        # Up to limit pending ids, or a single one whose last attempt
+        # crashed its worker
+        where = "state = ?"
+        params = [PENDING]
+        if shards is not None:
+            where += " AND shard IN (%s)" % ",".join("?" * len(shards))
+            params += shards
+        rows = connection.execute(
+            "SELECT id FROM tasks WHERE %s AND error IS NOT ? LIMIT ?"
+            % where,
+            params + [CRASHED, limit],
+        ).fetchall()
+        if not rows:
+            rows = connection.execute(
+                "SELECT id FROM tasks WHERE %s AND error = ? LIMIT 1" % where,
+                params + [CRASHED],
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def start(self, worker_id, task_id):
+        """Record that worker_id started an attempt at task_id.
+
+        Until complete() or fail() is called, the attempt counts as one
+        that crashed the worker.
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET attempts = attempts + 1, error = ?"
+                " WHERE id = ? AND worker = ?",
+                (CRASHED, task_id, worker_id),
+            )
+
+    def complete(self, worker_id, task_id):
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET state = ?, worker = NULL, error = NULL"
+                " WHERE id = ? AND worker = ?",
+                (DONE, task_id, worker_id),
+            )
+
+    def fail(self, worker_id, task_id, error):
+        """Record a failed attempt; the id is retried up to max_attempts
+        times."""
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ?"
+                " ELSE ? END, worker = NULL, error = ?"
+                " WHERE id = ? AND worker = ?",
+                (
+                    self.max_attempts,
+                    FAILED,
+                    PENDING,
+                    str(error),
+                    task_id,
+                    worker_id,
+                ),
+            )
+
+    def _fail_exhausted(self, connection):
+        # Ids that crashed their workers max_attempts times
+        connection.execute(
+            "UPDATE tasks SET state = ?, error = ?"
+            " WHERE state = ? AND attempts >= ?",
+            (FAILED, CRASHED, PENDING, self.max_attempts),
+        )
+
+    def counts(self):
+        """Return {state: number of ids}."""
+        rows = (
+            self._connect()
+            .execute("SELECT state, COUNT(*) FROM tasks GROUP BY state")
+            .fetchall()
+        )
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+    def remaining(self):
+        """Return the number of ids pending or leased."""
+        counts = self.counts()
+        return counts[PENDING] + counts[LEASED]
+
+    def failed(self):
+        """Return a list of (id, error) of ids that failed."""
+        return (
+            self._connect()
+            .execute(
+                "SELECT id, error FROM tasks WHERE state = ? ORDER BY id",
+                (FAILED,),
+            )
+            .fetchall()
+        )
+
+
+def _worker_main(
+    worker_id, path, func, client_factory, rate, threads, queue_kwargs
+):
+    queue = WorkQueue(path, **queue_kwargs)
+    rate_limiter = ratelimit.SharedTokenBucket(path, rate) if rate else None
+    client = client_factory(rate_limit=rate_limiter, pool_maxsize=threads)
+    queue.register(worker_id)
+    last_beat = time.monotonic()
+
+    def run(task_id):
+        queue.start(worker_id, task_id)
+        return func(client, task_id)
+
+    try:
+        while True:
+            task_ids = queue.claim(worker_id, 2 * threads)
+            if not task_ids:
+                if not queue.remaining():
+                    return
+                # Others hold leases: wait in case they die
+                time.sleep(min(1.0, queue.heartbeat_interval))
+                queue.beat(worker_id)
+                continue
+            for task_id, _, error in concurrency.bounded_map(
+                run, task_ids, threads, ordered=False
+            ):
+                if error is None:
+                    queue.complete(worker_id, task_id)
+                else:
+                    queue.fail(worker_id, task_id, repr(error))
+                if time.monotonic() - last_beat >= queue.heartbeat_interval:
+                    queue.beat(worker_id)
+                    last_beat = time.monotonic()
+    finally:
+        queue.release(worker_id)
+
+
+class Crawler:
+    """Run func(client, id) for every id of a WorkQueue, on processes.
+
+    Each worker process has its own podcast_api.Client, with `threads`
+    threads sending requests, and all of them draw from one rate budget
+    of `rate` requests per second, a ratelimit.SharedTokenBucket in the
+    queue file. Run a Crawler on each of several machines with the same
+    file, on a shared volume, to spread a crawl over them.
+
+    A worker process that dies is replaced, up to max_restarts times, and
+    the ids it had leased go back to the queue right away.
+    """
+
+    def __init__(
+        self,
+        path,
+        func,
+        processes=None,
+        threads=4,
+        rate=None,
+        client_factory=podcast_api.Client,
+        max_restarts=10,
+        poll_interval=0.5,
+        mp_context=None,
+        **queue_kwargs
+    ):
+        """
+        Args:
+            path: the WorkQueue database file path.
+            func: called with (client, id) for each id; raises to fail.
+            processes: number of worker processes, os.cpu_count() by
+                default.
+            threads: requests in flight per process.
+            rate: max requests per second, for all processes of all
+                crawlers sharing path; None for no limit.
+            client_factory: called with rate_limit and pool_maxsize in
+                each worker to build its client.
+            max_restarts: max worker processes restarted after crashes.
+            poll_interval: seconds between checks of the workers.
+            mp_context: a multiprocessing context, "spawn" by default.
+            queue_kwargs: passed to WorkQueue, e.g., lease.
+        """
+        self.path = path
+        self.func = func
+        self.processes = processes or os.cpu_count() or 1
+        self.threads = threads
+        self.rate = rate
+        self.client_factory = client_factory
+        self.max_restarts = max_restarts
+        self.poll_interval = poll_interval
+        self.mp_context = mp_context or multiprocessing.get_context("spawn")
+        self.queue_kwargs = queue_kwargs
+        self.queue = WorkQueue(path, **queue_kwargs)
+        self.node = "%s-%s" % (socket.gethostname(), uuid.uuid4().hex[:8])
+        self.restarts = 0
+
+    def _start(self, n):
+        worker_id = "%s-%s-%s" % (self.node, n, self.restarts)
+        process = self.mp_context.Process(
+            target=_worker_main,
+            args=(
+                worker_id,
+                self.path,
+                self.func,
+                self.client_factory,
+                self.rate,
+                self.threads,
+                self.queue_kwargs,
+            ),
+            name="listennotes-crawler-%s" % n,
+            daemon=True,
+        )
+        process.start()
+        return worker_id, process
+
+    def run(self):
+        """Crawl until the queue is empty; return WorkQueue.counts()."""
+        workers = {n: self._start(n) for n in range(self.processes)}
+        try:
+            while workers:
+                time.sleep(self.poll_interval)
+                for n, (worker_id, process) in list(workers.items()):
+                    if process.is_alive():
+                        continue
+                    del workers[n]
+                    if process.exitcode == 0:
+                        continue
+                    # Crashed: hand its ids over to the other workers
+                    self.queue.release(worker_id)
+                    if (
+                        self.restarts < self.max_restarts
+                        and self.queue.remaining()
+                    ):
+                        self.restarts += 1
+                        workers[n] = self._start(n)
+        finally:
+            for worker_id, process in workers.values():
+                process.terminate()
+                process.join()
+                self.queue.release(worker_id)
+        return self.queue.counts()
@@ -0,0 +1,105 @@
+import json
+
+# Decoders in order of preference; each one is used if its package is
+# installed. All of them decode straight from the response bytes.
+PREFERRED = ("orjson", "msgspec", "json")
+
+
+def _orjson():
+    import orjson
+
+    return orjson.loads
+
+
+def _msgspec():
+    import msgspec
+
+    decoder = msgspec.json.Decoder()
+
+    def loads(content):
+        try:
+            return decoder.decode(content)
+        except msgspec.DecodeError as e:
+            raise ValueError(str(e)) from e
+
+    return loads
+
+
+def _json():
+    return json.loads
+
+
+_FACTORIES = {"orjson": _orjson, "msgspec": _msgspec, "json": _json}
+
+
+def get_decoder(name=None):
+    """Return a function decoding json bytes into python objects.
+
+    Args:
+        name: "orjson", "msgspec" or "json"; None for the first one of
+            PREFERRED that is installed.
+
+    Raises:
+        ImportError if the named decoder isn't installed.
+        ValueError if name is unknown.
+    """
+    if name is not None:
+        if name not in _FACTORIES:
+            raise ValueError(
+                "Unknown json decoder %s. Use one of: %s"
+                % (name, ", ".join(PREFERRED))
+            )
+        return _FACTORIES[name]()
+    for name in PREFERRED:
+        try:
+            return _FACTORIES[name]()
+        except ImportError:
+            continue
+
+
+_default = None
+
+
+def default_decoder(content):
+    """Decode json bytes with the first installed decoder of PREFERRED.
+
+    The decoder is picked, and its package imported, on the first call, so
+    creating a client doesn't pay for importing orjson or msgspec.
+    """
+    global _default
+    if _default is None:
+        _default = get_decoder()
+    return _default(content)
+
+
+def available_decoders():
+    """Return the names of installed decoders."""
+    names = []
+    for name in PREFERRED:
+        try:
+            _FACTORIES[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+class _JsonMethod:
+    __slots__ = ("decoder", "response")
+
+    def __init__(self, decoder, response):
+        self.decoder = decoder
+        self.response = response
+
+    def __call__(self, **kwargs):
+        content = self.response.content
+        if kwargs:
+            # e.g., object_hook, which only the stdlib supports
+            return json.loads(content, **kwargs)
+        return self.decoder(content)
+
+
+def bind(response, decoder):
+    """Make response.json() use decoder; return response."""
+    response.json = _JsonMethod(decoder, response)
+    return response
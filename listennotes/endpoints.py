@@ -0,0 +1,75 @@
+from urllib.parse import urlparse
+
+
+class EndpointMap:
+    """Look up per-endpoint settings by request url.
+
+    Keys are path templates relative to the api base, e.g., "/search" or
+    "/podcasts/{id}", where a {...} segment matches any value. A template
+    matches the end of the url path, segment by segment.
+    """
+
+    def __init__(self, mapping):
+        self.mapping = dict(mapping)
+        self._templates = [
+            (template.strip("/").split("/"), value)
+            for template, value in self.mapping.items()
+        ]
+
+    def get(self, url, default=None):
+        """Return the value of the first template matching url."""
+        segments = urlparse(url).path.strip("/").split("/")
+        for template, value in self._templates:
+            if len(template) > len(segments):
+                continue
+            start = len(segments) - len(template)
+            tail = segments[start:]
+            if all(
+                t == s or (t.startswith("{") and t.endswith("}"))
+                for t, s in zip(template, tail)
+            ):
+                return value
+        return default
+
+    def __bool__(self):
+        return bool(self.mapping)
+
+
+# Path templates of all Listen API endpoints. More specific templates come
+# first, since EndpointMap returns the first match.
+TEMPLATES = (
+    "/search",
+    "/typeahead",
+    "/search_episode_titles",
+    "/spellcheck",
+    "/related_searches",
+    "/trending_searches",
+    "/best_podcasts",
+    "/podcasts/submit",
+    "/podcasts/domains/{domain_name}",
+    "/podcasts/{id}/recommendations",
+    "/podcasts/{id}/audience",
+    "/podcasts/{id}",
+    "/podcasts",
+    "/episodes/{id}/recommendations",
+    "/episodes/{id}",
+    "/episodes",
+    "/curated_podcasts/{id}",
+    "/curated_podcasts",
+    "/genres",
+    "/regions",
+    "/languages",
+    "/just_listen",
+    "/playlists/{id}",
+    "/playlists",
+)
+
+_templates = EndpointMap({template: template for template in TEMPLATES})
+
+
+def endpoint_name(url):
+    """Return the path template of the endpoint of url, e.g., "/genres".
+
+    The url path is returned as is for unknown endpoints.
+    """
+    return _templates.get(url) or urlparse(url).path
@@ -52,3 +52,11 @@ class APIConnectionError(ListenApiError):
     """
 
     pass
+
+
+class CircuitOpenError(APIConnectionError):
+    """
+    Listen API endpoint kept failing, so the request was not sent
+    """
+
+    pass
@@ -0,0 +1,541 @@
+"""Export podcasts and their episodes to compressed JSONL or Parquet files.
+
+Usage:
+    python -m listennotes export --search "star wars" --output out/
+    python -m listennotes export --genre 93 --format parquet --output out/
+    python -m listennotes export --curated-list SDFKduyJ47r --output out/
+    python -m listennotes export --ids podcast_ids.txt --output out/
+
+Podcasts are written to podcasts-NNNNN.<ext> files, and their episodes to
+episodes-NNNNN.<ext>, one pair of files per checkpoint. Running the same
+command again after an interruption resumes from the last checkpoint.
+"""
+
+import argparse
+import gzip
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+
+from listennotes import concurrency, pagination, podcast_api
+
+FORMATS = ("jsonl", "parquet")
+EXTENSIONS = {"jsonl": ".jsonl.gz", "parquet": ".parquet"}
+CHECKPOINT = "checkpoint.json"
+FAILED = "failed.txt"
+# Podcasts per pair of part files
+CHECKPOINT_EVERY = 100
+# Rows buffered by a ParquetWriter before they're written
+ROW_GROUP_SIZE = 10000
+
+# Parquet columns of each kind of record. "json" columns hold json strings,
+# for lists and objects, and for fields whose type varies, e.g.,
+# listen_score, which is a message on the FREE plan. Other fields, and
+# values of another type than their column's, are kept in the json object
+# of the other_fields column.
+PARQUET_COLUMNS = {
+    "podcasts": {
+        "id": "string",
+        "title": "string",
+        "publisher": "string",
+        "description": "string",
+        "image": "string",
+        "thumbnail": "string",
+        "listennotes_url": "string",
+        "listen_score": "json",
+        "listen_score_global_rank": "json",
+        "total_episodes": "int64",
+        "audio_length_sec": "int64",
+        "update_frequency_hours": "int64",
+        "explicit_content": "bool",
+        "is_claimed": "bool",
+        "itunes_id": "int64",
+        "rss": "string",
+        "latest_pub_date_ms": "int64",
+        "latest_episode_id": "string",
+        "earliest_pub_date_ms": "int64",
+        "language": "string",
+        "country": "string",
+        "website": "string",
+        "email": "string",
+        "type": "string",
+        "genre_ids": "json",
+        "extra": "json",
+        "looking_for": "json",
+    },
+    "episodes": {
+        "id": "string",
+        "podcast_id": "string",
+        "title": "string",
+        "description": "string",
+        "pub_date_ms": "int64",
+        "audio": "string",
+        "audio_length_sec": "int64",
+        "image": "string",
+        "thumbnail": "string",
+        "link": "string",
+        "listennotes_url": "string",
+        "listennotes_edit_url": "string",
+        "explicit_content": "bool",
+        "maybe_audio_invalid": "bool",
+        "transcript": "string",
+        "guid_from_rss": "string",
+        "podcast": "json",
+    },
+}
+
+_DONE = object()
+
+
+#
+# Sources: each one yields podcast ids, in the same order on every run
+#
+def search_source(client, q, **params):
+    """Podcasts found by search(q=q, type="podcast")."""
+    for podcast in client.iter_search_results(q=q, type="podcast", **params):
+        yield podcast["id"]
+
+
+def genre_source(client, genre_id, **params):
+    """Podcasts of fetch_best_podcasts(genre_id=genre_id), all pages."""
+    for podcast in client.iter_best_podcasts(genre_id=genre_id, **params):
+        yield podcast["id"]
+
+
+def curated_list_source(client, list_id):
+    """Podcasts of a curated list."""
+    response = client.fetch_curated_podcasts_list_by_id(id=list_id)
+    for podcast in response.json()["podcasts"]:
+        yield podcast["id"]
+
+
+def file_source(path):
+    """Podcast ids in a text file, one per line; # starts a comment."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            the_id = line.split("#", 1)[0].strip()
+            if the_id:
+                yield the_id
+
+
+#
+# Part files
+#
+class JsonlWriter:
+    """Write records to a gzipped JSON Lines file, as they come."""
+
+    def __init__(self, path, kind=None):
+        self.path = path
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False))
+        self._file.write("\n")
+
+    def close(self):
+        self._file.close()
+
+
+def _fits(value, column_type):
+    if column_type == "string":
+        return isinstance(value, str)
+    if column_type == "int64":
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, bool)
+
+
+class ParquetWriter:
+    """Write records to a zstd-compressed Parquet file, a row group of
+    row_group_size rows at a time.
+
+    Every part file of a kind of records ("podcasts" or "episodes") has the
+    columns of PARQUET_COLUMNS, whatever the API returns. Requires pyarrow.
+    """
+
+    def __init__(self, path, kind, row_group_size=ROW_GROUP_SIZE):
+        import pyarrow
+        import pyarrow.parquet
+
+        self.path = path
+        self.row_group_size = row_group_size
+        self._types = dict(PARQUET_COLUMNS[kind], other_fields="json")
+        self.schema = pyarrow.schema(
+            [
+                (name, "string" if column_type == "json" else column_type)
+                for name, column_type in self._types.items()
+            ]
+        )
+        self._writer = pyarrow.parquet.ParquetWriter(
+            path, self.schema, compression="zstd"
+        )
+        self._columns = {name: [] for name in self._types}
+        self._rows = 0
+
+    def write(self, record):
+        other = {}
+        for name, column_type in self._types.items():
+            value = record.get(name)
+            if value is not None:
+                if column_type == "json":
+                    value = json.dumps(value, ensure_ascii=False)
+                elif not _fits(value, column_type):
+                    other[name] = value
+                    value = None
+            self._columns[name].append(value)
+        for name, value in record.items():
+            if name not in self._types:
+                other[name] = value
+        self._columns["other_fields"][-1] = (
+            json.dumps(other, ensure_ascii=False) if other else None
+        )
+        self._rows += 1
+        if self._rows >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow
+
+        if self._rows:
+            self._writer.write_table(
+                pyarrow.Table.from_pydict(self._columns, schema=self.schema)
+            )
+            for values in self._columns.values():
+                values.clear()
+            self._rows = 0
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+WRITERS = {"jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+class Exporter:
+    """Export podcasts, and optionally all their episodes, to part files.
+
+    A producer thread hydrates podcasts on a pool of max_workers threads,
+    and hands them over through a queue of queue_size podcasts to the
+    caller's thread, which writes them. Memory use is bounded by the queue
+    (and a Parquet row group), not by the size of a part or the export.
+
+    Every checkpoint_every podcasts, the current part files are closed,
+    renamed to their final name, and the position in the source is saved
+    to checkpoint.json. run() on the same output directory starts from the
+    saved position, so the source must yield podcasts in the same order on
+    every run. Ids that failed are appended to failed.txt.
+    """
+
+    def __init__(
+        self,
+        client,
+        output_dir,
+        format="jsonl",
+        episodes=True,
+        checkpoint_every=CHECKPOINT_EVERY,
+        max_workers=None,
+        queue_size=None,
+    ):
+        """
+        Args:
+            client: a podcast_api.Client.
+            output_dir: the directory of part files and checkpoint.
+            format: "jsonl" or "parquet".
+            episodes: if True, export all episodes of each podcast.
+            checkpoint_every: podcasts per part file.
+            max_workers: podcasts hydrated concurrently, the client's
+                max_workers by default.
+            queue_size: max hydrated podcasts waiting to be written,
+                2 * max_workers by default.
+        """
+        if format not in WRITERS:
+            raise ValueError(
+                "Unknown format %s. Use one of: %s"
+                % (format, ", ".join(FORMATS))
+            )
+        self.client = client
+        self.output_dir = output_dir
+        self.format = format
+        self.episodes = episodes
+        self.checkpoint_every = checkpoint_every
+        self.max_workers = max_workers or client.max_workers
+        self.queue_size = queue_size or 2 * self.max_workers
+
+    def _path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def load_checkpoint(self):
+        """Return the saved checkpoint dict, or a fresh one."""
+        try:
+            with open(self._path(CHECKPOINT), encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return {
+                "format": self.format,
+                "position": 0,
+                "parts": 0,
+                "podcasts": 0,
+                "episodes": 0,
+                "failed": 0,
+                "done": False,
+            }
+        if checkpoint["format"] != self.format:
+            raise ValueError(
+                "%s has a %s export; use another output directory"
+                % (self.output_dir, checkpoint["format"])
+            )
+        return checkpoint
+
+    def _save_checkpoint(self, checkpoint):
+        tmp_path = self._path(CHECKPOINT + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path(CHECKPOINT))
+
+    def _hydrate(self, podcast_id):
+        """Return (podcast, episodes) of podcast_id."""
+        params = {"id": podcast_id, "sort": "recent_first"}
+        data = self.client.fetch_podcast_by_id(**params).json()
+        next_params = pagination.next_episode_pub_date(data)
+        episodes = data.pop("episodes", [])
+        data.pop("next_episode_pub_date", None)
+        if not self.episodes:
+            return data, []
+        if next_params:
+            episodes.extend(
+                pagination.iter_items(
+                    self.client.fetch_podcast_by_id,
+                    "episodes",
+                    dict(params, **next_params),
+                    pagination.next_episode_pub_date,
+                )
+            )
+        for episode in episodes:
+            episode.setdefault("podcast_id", data["id"])
+        return data, episodes
+
+    def _produce(self, podcast_ids, results, stop):
+        def put(item):
+            # Give up if the consumer stopped, rather than block forever
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for item in concurrency.bounded_map(
+                self._hydrate, podcast_ids, self.max_workers
+            ):
+                if not put(item):
+                    return
+        except Exception as e:
+            # The source itself failed, e.g., a search request
+            put((None, None, e))
+            return
+        put(_DONE)
+
+    def run(self, podcast_ids, progress=None):
+        """Export podcast_ids; return the checkpoint dict at the end.
+
+        Args:
+            podcast_ids: an iterable of podcast ids, e.g., a *_source().
+            progress: called with the checkpoint dict after each part.
+
+        Raises:
+            the exception of the source, after saving the last checkpoint.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        checkpoint = self.load_checkpoint()
+        if checkpoint["done"]:
+            return checkpoint
+        extension = EXTENSIONS[self.format]
+        for name in os.listdir(self.output_dir):
+            if name.endswith(".tmp"):
+                # Written after the last checkpoint
+                os.remove(self._path(name))
+
+        results = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._produce,
+            args=(
+                itertools.islice(podcast_ids, checkpoint["position"], None),
+                results,
+                stop,
+            ),
+            name="listennotes-export",
+            daemon=True,
+        )
+        producer.start()
+
+        part = None
+        try:
+            while True:
+                if part is None:
+                    part = _Part(self, checkpoint["parts"], extension)
+                item = results.get()
+                if item is _DONE:
+                    break
+                the_id, result, error = item
+                if the_id is None:
+                    self._commit(part, checkpoint, progress)
+                    raise error
+                part.add(the_id, result, error)
+                if part.count >= self.checkpoint_every:
+                    self._commit(part, checkpoint, progress)
+                    part = None
+            checkpoint["done"] = True
+            self._commit(part, checkpoint, progress)
+            part = None
+        finally:
+            stop.set()
+            if part is not None:
+                part.abort()
+            producer.join()
+        return checkpoint
+
+    def _commit(self, part, checkpoint, progress):
+        part.close()
+        checkpoint["position"] += part.count
+        checkpoint["podcasts"] += part.podcasts
+        checkpoint["episodes"] += part.episodes
+        checkpoint["failed"] += len(part.failed)
+        if part.podcasts:
+            checkpoint["parts"] += 1
+        self._save_checkpoint(checkpoint)
+        if progress:
+            progress(checkpoint)
+
+
+class _Part:
+    """The podcasts and episodes files written between two checkpoints."""
+
+    def __init__(self, exporter, number, extension):
+        self.exporter = exporter
+        self.paths = {}
+        self.writers = {}
+        for kind in ("podcasts", "episodes"):
+            path = exporter._path("%s-%05d%s" % (kind, number, extension))
+            self.paths[kind] = path
+            self.writers[kind] = WRITERS[exporter.format](path + ".tmp", kind)
+        self.counts = {"podcasts": 0, "episodes": 0}
+        self.count = 0
+        self.failed = []
+
+    @property
+    def podcasts(self):
+        return self.counts["podcasts"]
+
+    @property
+    def episodes(self):
+        return self.counts["episodes"]
+
+    def add(self, the_id, result, error):
+        self.count += 1
+        if error is not None:
+            self.failed.append("%s\t%s" % (the_id, error))
+            return
+        podcast, episodes = result
+        self.writers["podcasts"].write(podcast)
+        for episode in episodes:
+            self.writers["episodes"].write(episode)
+        self.counts["podcasts"] += 1
+        self.counts["episodes"] += len(episodes)
+
+    def close(self):
+        for kind, writer in self.writers.items():
+            writer.close()
+            if self.counts[kind]:
+                os.replace(writer.path, self.paths[kind])
+            else:
+                os.remove(writer.path)
+        if self.failed:
+            with open(self.exporter._path(FAILED), "a", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in self.failed))
+
+    def abort(self):
+        for writer in self.writers.values():
+            try:
+                writer.close()
+                os.remove(writer.path)
+            except Exception:
+                pass
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser(
+        "export",
+        help="export podcasts and episodes to files",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--search", metavar="QUERY")
+    source.add_argument("--genre", metavar="GENRE_ID", type=int)
+    source.add_argument("--curated-list", metavar="LIST_ID")
+    source.add_argument(
+        "--ids", metavar="FILE", help="a file of podcast ids, one per line"
+    )
+    parser.add_argument("--output", required=True, help="output directory")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument(
+        "--no-episodes",
+        dest="episodes",
+        action="store_false",
+        help="only export podcasts",
+    )
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=CHECKPOINT_EVERY
+    )
+    parser.add_argument("--max-workers", type=int)
+    parser.add_argument(
+        "--rate-limit", type=float, help="max requests per second"
+    )
+    parser.add_argument(
+        "--api-key",
+        default=os.environ.get("LISTEN_API_KEY"),
+        help="$LISTEN_API_KEY by default; none to use the mock server",
+    )
+    parser.set_defaults(func=main)
+
+
+def main(args):
+    client = podcast_api.Client(
+        api_key=args.api_key,
+        retry_policy=True,
+        rate_limit=args.rate_limit,
+        pool_maxsize=args.max_workers,
+    )
+    if args.search is not None:
+        podcast_ids = search_source(client, args.search)
+    elif args.genre is not None:
+        podcast_ids = genre_source(client, args.genre)
+    elif args.curated_list is not None:
+        podcast_ids = curated_list_source(client, args.curated_list)
+    else:
+        podcast_ids = file_source(args.ids)
+
+    def progress(checkpoint):
+        print(
+            "%(podcasts)s podcasts, %(episodes)s episodes, %(failed)s "
+            "failed" % checkpoint,
+            file=sys.stderr,
+        )
+
+    exporter = Exporter(
+        client,
+        args.output,
+        format=args.format,
+        episodes=args.episodes,
+        checkpoint_every=args.checkpoint_every,
+    )
+    exporter.run(podcast_ids, progress=progress)
+    return 0
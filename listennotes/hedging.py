@@ -0,0 +1,120 @@
+import threading
+
+from listennotes import endpoints, metrics
+
+
+# Endpoints on the search-as-you-type path, where tail latency matters more
+# than request count
+HEDGED_ENDPOINTS = ("/typeahead", "/spellcheck")
+
+
+class HedgePolicy:
+    """When to send a duplicate of a slow request.
+
+    If a GET to one of `endpoints` hasn't answered after the `percentile`
+    latency of that endpoint (clamped to [min_delay, max_delay], and
+    initial_delay until min_samples responses were seen), a duplicate is
+    sent on another pooled connection. The first response wins, and the
+    other request is abandoned.
+
+    Hedges are capped to `budget` hedges per request on average, and are
+    only sent if the rate limiter of the client has a token available
+    right away, so they never delay other requests or blow the quota.
+    """
+
+    PERCENTILE = 0.95
+    INITIAL_DELAY = 0.1  # seconds
+    MIN_DELAY = 0.01  # seconds
+    MAX_DELAY = 1  # seconds
+    MIN_SAMPLES = 20
+    BUDGET = 0.1
+
+    def __init__(
+        self,
+        endpoints=HEDGED_ENDPOINTS,
+        percentile=PERCENTILE,
+        initial_delay=INITIAL_DELAY,
+        min_delay=MIN_DELAY,
+        max_delay=MAX_DELAY,
+        min_samples=MIN_SAMPLES,
+        budget=BUDGET,
+    ):
+        """
+        Args:
+            endpoints: path templates of the endpoints to hedge.
+            percentile: the latency percentile to wait for before hedging.
+            initial_delay: the delay before min_samples responses are seen.
+            min_delay, max_delay: bounds of the delay, in seconds.
+            min_samples: responses to see before using the percentile.
+            budget: max hedges per request, on average; the unused budget
+                accumulates up to 10 hedges.
+        """
+        self.endpoints = _endpoint_set(endpoints)
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.budget = budget
+        self.requests = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self._credits = 1.0
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def applies(self, method, url):
+        """True if requests of method to url are hedged."""
+        return method.upper() == "GET" and self.endpoints.get(url, False)
+
+    def delay(self, url):
+        """Return seconds to wait for a response before hedging."""
+        endpoint = endpoints.endpoint_name(url)
+        with self._lock:
+            self.requests += 1
+            self._credits = min(10.0, self._credits + self.budget)
+            histogram = self._latency.get(endpoint)
+            if histogram is None or histogram.count < self.min_samples:
+                return self.initial_delay
+            delay = histogram.quantile(self.percentile)
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def observe(self, url, seconds):
+        """Record the latency of a response to url."""
+        endpoint = endpoints.endpoint_name(url)
+        with self._lock:
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = metrics.Histogram()
+            histogram.observe(seconds)
+
+    def allow_hedge(self, rate_limiter=None):
+        """Take a hedge from the budget, and a token from rate_limiter.
+
+        Returns False, taking nothing, if either isn't available right away.
+        """
+        with self._lock:
+            if self._credits < 1:
+                return False
+            if rate_limiter and not rate_limiter.try_acquire():
+                return False
+            self._credits -= 1
+            self.hedges += 1
+        return True
+
+    def won(self):
+        """Count a hedge that answered before the original request."""
+        with self._lock:
+            self.hedges_won += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+            }
+
+
+def _endpoint_set(templates):
+    return endpoints.EndpointMap({template: True for template in templates})
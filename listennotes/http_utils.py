@@ -1,7 +1,82 @@
-import requests
-from requests import exceptions
+import contextvars
+import threading
+import time
 
-from listennotes import errors
+from listennotes import cache, decoders, endpoints, errors, metrics
+
+RATE_LIMIT_ERROR_MSG = (
+    "For FREE plan, exceeding the quota limit; or for all plans, "
+    "sending too many requests too fast and exceeding the rate limit "
+    "- https://www.listennotes.com/api/faq/#faq17"
+)
+
+
+def raise_for_status_code(status_code, response):
+    """Raise the errors.* exception mapped to a 4xx / 5xx status code.
+
+    Shared by the sync and asyncio transports so both surface the same
+    exceptions. Returns silently if the status code has no mapping, so the
+    caller can decide what to raise instead.
+    """
+    # from None => suppress previous exception
+    if status_code == 404:
+        raise errors.NotFoundError(
+            "Endpoint not exist, or podcast / episode not exist.",
+            response=response,
+        ) from None
+    elif status_code == 401:
+        raise errors.AuthenticationError(
+            "Wrong api key, or your account is suspended.",
+            response=response,
+        ) from None
+    elif status_code == 429:
+        raise errors.RateLimitError(
+            RATE_LIMIT_ERROR_MSG,
+            response=response,
+        ) from None
+    elif status_code == 400:
+        raise errors.InvalidRequestError(
+            "Something wrong on your end (client side errors),"
+            " e.g., missing required parameters.",
+            response=response,
+        ) from None
+    elif status_code >= 500:
+        raise errors.ListenApiError(
+            "Error on our end (unexpected server errors).",
+            response=response,
+        ) from None
+
+
+class PoolStats:
+    """Thread-safe counters of connection pool usage."""
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.discarded_connections = 0
+        self._lock = threading.Lock()
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        """Return the counters.
+
+        reused_connections is the number of requests sent on an already
+        open connection. discarded_connections counts connections closed
+        because the pool was full, i.e., pool_maxsize is too small for the
+        number of threads.
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": max(
+                    0, self.requests - self.new_connections
+                ),
+                "discarded_connections": self.discarded_connections,
+            }
 
 
 class Request:
@@ -18,6 +93,9 @@ class Request:
     MAX_RETRIES = 3
     MAX_REDIRECTS = 15
     TIMEOUT = 30  # seconds
+    # requests.adapters.DEFAULT_POOLSIZE
+    POOL_CONNECTIONS = 10
+    POOL_MAXSIZE = 10
 
     def __init__(
         self,
@@ -25,42 +103,126 @@ class Request:
         max_retries=MAX_RETRIES,
         adapter=None,
         raise_exception=True,
+        cache=None,
+        rate_limiter=None,
+        retry_policy=None,
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=False,
+        tcp_keepalive=False,
+        timeout=TIMEOUT,
+        endpoint_timeouts=None,
+        json_decoder=None,
+        hooks=None,
+        scheduler=None,
+        hedge_policy=None,
+        circuit_breaker=None,
         **kwargs
     ):
-        """Set up a requests.Session object.
+        """Set up a requests.Session object, created on first use.
 
         Args:
             max_redirects: max redirects.
             max_retries: max retries.
             adapter: a custom requests.adapters.HTTPAdapter object.
-                If this argument is specified, max_retries argument is ignored.
+                If this argument is specified, max_retries argument and the
+                pool arguments are ignored.
+            pool_connections: number of hosts to keep a connection pool for.
+            pool_maxsize: max connections kept alive per host. Set it to at
+                least the number of threads sharing this object.
+            pool_block: if True, wait for a free connection when
+                pool_maxsize connections are in use, instead of opening a
+                connection that's discarded after use.
+            tcp_keepalive: if True, turn on TCP keep-alive probes.
+            timeout: default timeout in seconds, or a (connect, read) tuple.
+            endpoint_timeouts: a dict of path template => timeout, see
+                endpoints.EndpointMap, overriding timeout for some endpoints.
+            cache: a cache.ResponseCache object to serve GET requests from.
+            rate_limiter: a ratelimit.TokenBucket object to pace requests.
+            retry_policy: a retry.RetryPolicy object to retry failed
+                requests with backoff. Without it, only connection failures
+                are retried by the adapter, with no delay.
+            json_decoder: a function decoding json bytes, used by
+                response.json(); decoders.default_decoder by default.
+            hooks: a metrics.Hooks object, called around each attempt.
+            scheduler: a scheduler.Scheduler object, limiting concurrent
+                requests by priority class.
+            hedge_policy: a hedging.HedgePolicy object, to send duplicates
+                of slow GET requests to some endpoints.
+            circuit_breaker: a circuit.CircuitBreaker object, to fail fast
+                on endpoints that keep failing.
             kwargs: keyword args to set session attribute, e.g., auth.
         """
-        self.session = requests.Session()
         self.raise_exception = raise_exception
-        if not adapter:
-            the_adapter = requests.adapters.HTTPAdapter(
-                max_retries=max_retries
-            )
-        else:
-            the_adapter = adapter
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.json_decoder = json_decoder or decoders.default_decoder
+        self.hooks = hooks if hooks is not None else metrics.Hooks()
+        self.scheduler = scheduler
+        self.hedge_policy = hedge_policy
+        self.circuit_breaker = circuit_breaker
+        self.pool_maxsize = pool_maxsize
+        self._hedge_executor = None
+        self._hedge_lock = threading.Lock()
+        self.timeout = timeout
+        self.endpoint_timeouts = endpoints.EndpointMap(endpoint_timeouts or {})
+        self._adapter = adapter
+        self._adapter_kwargs = {
+            "max_retries": max_retries,
+            "pool_connections": pool_connections,
+            "pool_maxsize": pool_maxsize,
+            "pool_block": pool_block,
+            "tcp_keepalive": tcp_keepalive,
+        }
+        self._session_attrs = dict(kwargs, max_redirects=max_redirects)
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The requests.Session object, created on first use."""
+        session = self._session
+        if session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+                session = self._session
+        return session
+
+    @property
+    def adapter(self):
+        """The transport adapter mounted on the session."""
+        # The default adapter is built along with the session
+        self.session
+        return self._adapter
 
-        for key, value in kwargs.items():
-            if hasattr(self.session, key):
-                setattr(self.session, key, value)
+    def _build_session(self):
+        import requests
 
-        self.session.max_redirects = max_redirects
-        self.session.mount("http://", the_adapter)
-        self.session.mount("https://", the_adapter)
+        from listennotes import transport
 
-    def request(self, method, url, timeout=TIMEOUT, **kwargs):
+        if not self._adapter:
+            self._adapter = transport.PoolingHTTPAdapter(
+                **self._adapter_kwargs
+            )
+        session = requests.Session()
+        for key, value in self._session_attrs.items():
+            if hasattr(session, key):
+                setattr(session, key, value)
+        session.mount("http://", self._adapter)
+        session.mount("https://", self._adapter)
+        return session
+
+    def request(self, method, url, timeout=None, **kwargs):
         """Make a http(s) request.
 
         Args:
             method: http method name, should be one of DELETE', 'GET', 'HEAD',
                 'OPTIONS', 'PATCH', 'POST', 'PUT', and 'TRACE'.
             url: the url to request.
-            timeout: request timeout.
+            timeout: request timeout; None to use the timeout of the
+                endpoint in endpoint_timeouts, or the default timeout.
             kwargs: keyword arguments.
 
         Returns:
@@ -81,21 +243,122 @@ class Request:
                 a request.
 
             requests.exceptions.TooManyRedirects if too many redirects.
+
+            errors.CircuitOpenError if the endpoint's circuit is open.
         """
+        if timeout is None:
+            timeout = self.endpoint_timeouts.get(url, self.timeout)
+        if self.circuit_breaker:
+            from requests import exceptions
+
+            return self.circuit_breaker.call(
+                method,
+                url,
+                kwargs.get("params"),
+                lambda: self._request(method, url, timeout, **kwargs),
+                transport_errors=(
+                    exceptions.ConnectionError,
+                    exceptions.Timeout,
+                ),
+                # The body of a streamed response is read by the caller
+                cacheable=not kwargs.get("stream"),
+            )
+        return self._request(method, url, timeout, **kwargs)
+
+    def _request(self, method, url, timeout, **kwargs):
+        # Streamed responses are read by the caller, so they can't be cached
+        streamed = kwargs.get("stream")
+        if self.cache and method.upper() == "GET" and not streamed:
+            ttl = self.cache.ttl_for(url)
+            if ttl:
+                key = cache.cache_key(method, url, kwargs.get("params"))
+                headers = kwargs.pop("headers", {})
+                response = self.cache.fetch(
+                    key,
+                    ttl,
+                    lambda conditional_headers: self._send(
+                        method,
+                        url,
+                        timeout,
+                        headers=dict(headers, **conditional_headers),
+                        **kwargs
+                    ),
+                )
+                return decoders.bind(response, self.json_decoder)
+        if self.hedge_policy and self.hedge_policy.applies(method, url):
+            return self._send_hedged(method, url, timeout, **kwargs)
+        return self._send(method, url, timeout, **kwargs)
+
+    def _send(self, method, url, timeout, reserved=False, **kwargs):
+        from requests import exceptions
+
+        # reserved: the first attempt already has a rate limiter token
         the_headers = {}
         if "headers" in kwargs:
             the_headers.update(kwargs["headers"])
             del kwargs["headers"]
 
-        response = self.session.request(
-            method, url, timeout=timeout, headers=the_headers, **kwargs
-        )
+        hooks = self.hooks
+        retries = 0
+        started = time.monotonic()
+        while True:
+            elapsed = time.monotonic() - started
+            the_timeout = timeout
+            if self.retry_policy:
+                the_timeout = self.retry_policy.timeout(timeout, elapsed)
+            if self.rate_limiter and not reserved:
+                self.rate_limiter.acquire()
+            reserved = False
+            if hooks:
+                event = metrics.RequestEvent(method, url, retries)
+                hooks.emit("before_request", event)
+            try:
+                response = self._session_request(
+                    method,
+                    url,
+                    timeout=the_timeout,
+                    headers=the_headers,
+                    **kwargs
+                )
+            except (exceptions.ConnectionError, exceptions.Timeout) as e:
+                delay = None
+                if self.retry_policy:
+                    delay = self.retry_policy.next_delay(
+                        method, retries, time.monotonic() - started
+                    )
+                if hooks:
+                    event.finish(error=e)
+                    if delay is None:
+                        hooks.emit("on_error", event)
+                if delay is None:
+                    raise
+            else:
+                if hooks:
+                    event.finish(response=response)
+                    hooks.emit("after_response", event)
+                if self.rate_limiter:
+                    self.rate_limiter.update(response)
+                delay = None
+                if self.retry_policy:
+                    delay = self.retry_policy.next_delay(
+                        method,
+                        retries,
+                        time.monotonic() - started,
+                        response=response,
+                    )
+                if delay is None:
+                    break
+            if hooks:
+                event.delay = delay
+                hooks.emit("on_retry", event)
+            time.sleep(delay)
+            retries += 1
+
+        # Number of retries it took to get this response
+        response.retries = retries
+        decoders.bind(response, self.json_decoder)
         # If response.status_code is 4xx or 5xx, raise
         # requests.exceptions.HTTPError
-        RateLimitErrorMsg = (
-            "For FREE plan, exceeding the quota limit; or for all plans, "
-            "sending too many requests too fast and exceeding the rate limit "
-            "- https://www.listennotes.com/api/faq/#faq17")
         if self.raise_exception:
             try:
                 response.raise_for_status()
@@ -104,36 +367,8 @@ class Request:
                     "Failed to connect to Listen API.", response=response
                 ) from None
             except exceptions.HTTPError as e:
-                status_code = e.response.status_code
-                if status_code == 404:
-                    # from None => suppress previous exception
-                    raise errors.NotFoundError(
-                        "Endpoint not exist, or podcast / episode not exist.",
-                        response=response,
-                    ) from None
-                elif status_code == 401:
-                    raise errors.AuthenticationError(
-                        "Wrong api key, or your account is suspended.",
-                        response=response,
-                    ) from None
-                elif status_code == 429:
-                    raise errors.RateLimitError(
-                        RateLimitErrorMsg,
-                        response=response,
-                    ) from None
-                elif status_code == 400:
-                    raise errors.InvalidRequestError(
-                        "Something wrong on your end (client side errors),"
-                        " e.g., missing required parameters.",
-                        response=response,
-                    ) from None
-                elif status_code >= 500:
-                    raise errors.ListenApiError(
-                        "Error on our end (unexpected server errors).",
-                        response=response,
-                    ) from None
-                else:
-                    raise
+                raise_for_status_code(e.response.status_code, response)
+                raise
             except Exception:
                 raise errors.ListenApiError(
                     "Unknown error. Please report to hello@listennotes.com",
@@ -142,38 +377,420 @@ class Request:
 
         return response
 
-    def delete(self, url, timeout=TIMEOUT, **kwargs):
+    def _send_hedged(self, method, url, timeout, **kwargs):
+        from concurrent import futures
+
+        policy = self.hedge_policy
+        delay = policy.delay(url)
+        primary = self._submit(method, url, timeout, False, kwargs)
+        done, _ = futures.wait([primary], timeout=delay)
+        if done or not policy.allow_hedge(self.rate_limiter):
+            return primary.result()
+
+        hedge = self._submit(method, url, timeout, True, kwargs)
+        pending = [primary, hedge]
+        error = None
+        while pending:
+            done, _ = futures.wait(
+                pending, return_when=futures.FIRST_COMPLETED
+            )
+            # Check in submission order, so a tie goes to the primary
+            for future in list(pending):
+                if future not in done:
+                    continue
+                pending.remove(future)
+                if future.exception() is None:
+                    if future is hedge:
+                        policy.won()
+                    # The other request can't be interrupted; its response
+                    # is dropped when it completes
+                    for other in pending:
+                        other.cancel()
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def _submit(self, method, url, timeout, reserved, kwargs):
+        """Run _send() on the hedging thread pool, timing it for the policy."""
+        from concurrent import futures
+
+        with self._hedge_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = futures.ThreadPoolExecutor(
+                    max_workers=2 * self.pool_maxsize,
+                    thread_name_prefix="listennotes-hedge",
+                )
+        started = time.monotonic()
+        future = self._hedge_executor.submit(
+            contextvars.copy_context().run,
+            self._send,
+            method,
+            url,
+            timeout,
+            reserved,
+            **kwargs
+        )
+
+        def observe(future):
+            if not future.cancelled() and future.exception() is None:
+                self.hedge_policy.observe(url, time.monotonic() - started)
+
+        future.add_done_callback(observe)
+        return future
+
+    def _session_request(self, method, url, **kwargs):
+        if not self.scheduler:
+            return self.session.request(method, url, **kwargs)
+        with self.scheduler.slot(url):
+            return self.session.request(method, url, **kwargs)
+
+    def pool_stats(self):
+        """Return connection pool counters, see PoolStats.as_dict().
+
+        Returns None if a custom adapter without statistics is used.
+        """
+        stats = getattr(self.adapter, "stats", None)
+        return stats.as_dict() if stats else None
+
+    def delete(self, url, timeout=None, **kwargs):
         """Shortcut for DELETE request."""
         return self.request("DELETE", url, timeout, **kwargs)
 
-    def get(self, url, timeout=TIMEOUT, **kwargs):
+    def get(self, url, timeout=None, **kwargs):
         """Shortcut for GET request."""
         return self.request("GET", url, timeout, **kwargs)
 
-    def head(self, url, timeout=TIMEOUT, **kwargs):
+    def head(self, url, timeout=None, **kwargs):
         """Shortcut for HEAD request."""
         return self.request("HEAD", url, timeout, **kwargs)
 
-    def options(self, url, timeout=TIMEOUT, **kwargs):
+    def options(self, url, timeout=None, **kwargs):
         """Shortcut for OPTIONS request."""
         return self.request("OPTIONS", url, timeout, **kwargs)
 
-    def patch(self, url, timeout=TIMEOUT, **kwargs):
+    def patch(self, url, timeout=None, **kwargs):
         """Shortcut for PATCH request."""
         return self.request("PATCH", url, timeout, **kwargs)
 
-    def post(self, url, timeout=TIMEOUT, **kwargs):
+    def post(self, url, timeout=None, **kwargs):
         """Shortcut for POST request."""
         return self.request("POST", url, timeout, **kwargs)
 
-    def put(self, url, timeout=TIMEOUT, **kwargs):
+    def put(self, url, timeout=None, **kwargs):
         """Shortcut for PUT request."""
         return self.request("PUT", url, timeout, **kwargs)
 
-    def trace(self, url, timeout=TIMEOUT, **kwargs):
+    def trace(self, url, timeout=None, **kwargs):
         """Shortcut for TRACE request."""
         return self.request("TRACE", url, timeout, **kwargs)
 
-    def purge(self, url, timeout=TIMEOUT, **kwargs):
+    def purge(self, url, timeout=None, **kwargs):
         """Shortcut for TRACE request."""
         return self.request("PURGE", url, timeout, **kwargs)
+
+
+class AsyncRequest:
+    """Making HTTP requests on asyncio.
+
+    The non-blocking counterpart of Request, built on httpx. Every method is
+    a coroutine. All requests share one bounded connection pool, so a single
+    event loop can keep many requests in flight while reusing connections.
+    """
+
+    MAX_RETRIES = Request.MAX_RETRIES
+    MAX_REDIRECTS = Request.MAX_REDIRECTS
+    MAX_CONNECTIONS = 100
+    MAX_KEEPALIVE_CONNECTIONS = 20
+    TIMEOUT = Request.TIMEOUT
+
+    def __init__(
+        self,
+        max_redirects=MAX_REDIRECTS,
+        max_retries=MAX_RETRIES,
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        transport=None,
+        raise_exception=True,
+        rate_limiter=None,
+        retry_policy=None,
+        timeout=TIMEOUT,
+        endpoint_timeouts=None,
+        json_decoder=None,
+        hooks=None,
+        hedge_policy=None,
+        circuit_breaker=None,
+    ):
+        """Set up a httpx.AsyncClient object.
+
+        Args:
+            max_redirects: max redirects.
+            max_retries: max retries on connection failures.
+            max_connections: max concurrent connections in the pool.
+            max_keepalive_connections: max idle connections kept alive.
+            transport: a custom httpx.AsyncBaseTransport object.
+                If this argument is specified, max_retries and the pool
+                limits are ignored.
+            rate_limiter: a ratelimit.TokenBucket object to pace requests.
+            retry_policy: a retry.RetryPolicy object to retry failed
+                requests with backoff.
+            timeout: default timeout in seconds.
+            endpoint_timeouts: a dict of path template => timeout, see
+                endpoints.EndpointMap, overriding timeout for some endpoints.
+            json_decoder: a function decoding json bytes, used by
+                response.json(); decoders.default_decoder by default.
+            hooks: a metrics.Hooks object, called around each attempt.
+            hedge_policy: a hedging.HedgePolicy object, to send duplicates
+                of slow GET requests to some endpoints.
+            circuit_breaker: a circuit.CircuitBreaker object, to fail fast
+                on endpoints that keep failing.
+        """
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError(
+                "AsyncClient requires httpx. "
+                "Install it with: pip install podcast-api[async]"
+            ) from None
+
+        self.raise_exception = raise_exception
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.json_decoder = json_decoder or decoders.default_decoder
+        self.hooks = hooks if hooks is not None else metrics.Hooks()
+        self.hedge_policy = hedge_policy
+        self.circuit_breaker = circuit_breaker
+        self.timeout = timeout
+        self.endpoint_timeouts = endpoints.EndpointMap(endpoint_timeouts or {})
+        # Only the default transport reports the connections it opens
+        self.stats = None if transport else PoolStats()
+        if not transport:
+            transport = httpx.AsyncHTTPTransport(
+                retries=max_retries,
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                ),
+            )
+        self.session = httpx.AsyncClient(
+            transport=transport,
+            follow_redirects=True,
+            max_redirects=max_redirects,
+        )
+
+    async def request(self, method, url, timeout=None, **kwargs):
+        """Make a http(s) request.
+
+        Args:
+            method: http method name.
+            url: the url to request.
+            timeout: request timeout; None to use the timeout of the
+                endpoint in endpoint_timeouts, or the default timeout.
+            kwargs: keyword arguments, e.g., params, data, headers; with
+                stream=True, the body isn't read, see
+                httpx.Response.aiter_bytes().
+
+        Returns:
+            a httpx.Response object.
+
+        Raises:
+            errors.APIConnectionError if a connection error occurred.
+
+            errors.ListenApiError (or a subclass) if status code is mapped
+                to one by raise_for_status_code.
+
+            httpx.HTTPStatusError for other 4xx status codes.
+
+            errors.CircuitOpenError if the endpoint's circuit is open.
+        """
+        if timeout is None:
+            timeout = self.endpoint_timeouts.get(url, self.timeout)
+        if self.circuit_breaker:
+            return await self.circuit_breaker.acall(
+                method,
+                url,
+                kwargs.get("params"),
+                lambda: self._request(method, url, timeout, **kwargs),
+                # The body of a streamed response is read by the caller
+                cacheable=not kwargs.get("stream"),
+            )
+        return await self._request(method, url, timeout, **kwargs)
+
+    async def _request(self, method, url, timeout, **kwargs):
+        if self.hedge_policy and self.hedge_policy.applies(method, url):
+            return await self._send_hedged(method, url, timeout, **kwargs)
+        return await self._send(method, url, timeout, **kwargs)
+
+    async def _send(self, method, url, timeout, reserved=False, **kwargs):
+        import asyncio
+
+        import httpx
+
+        # httpx doesn't drop None-valued headers like requests does
+        the_headers = {
+            key: value
+            for key, value in kwargs.pop("headers", {}).items()
+            if value is not None
+        }
+        stream = kwargs.pop("stream", False)
+
+        hooks = self.hooks
+        retries = 0
+        started = time.monotonic()
+        while True:
+            elapsed = time.monotonic() - started
+            the_timeout = timeout
+            if self.retry_policy:
+                the_timeout = self.retry_policy.timeout(timeout, elapsed)
+            if isinstance(the_timeout, tuple):
+                # requests-style (connect, read) timeout
+                the_timeout = httpx.Timeout(
+                    the_timeout[1], connect=the_timeout[0]
+                )
+            if self.rate_limiter and not reserved:
+                await self.rate_limiter.aacquire()
+            reserved = False
+            if hooks:
+                event = metrics.RequestEvent(method, url, retries)
+                hooks.emit("before_request", event)
+            if self.stats:
+                self.stats.incr("requests")
+                kwargs["extensions"] = {"trace": self._trace}
+            try:
+                request = self.session.build_request(
+                    method,
+                    url,
+                    timeout=the_timeout,
+                    headers=the_headers,
+                    **kwargs
+                )
+                response = await self.session.send(request, stream=stream)
+            except httpx.TransportError as e:
+                delay = None
+                if self.retry_policy:
+                    delay = self.retry_policy.next_delay(
+                        method, retries, time.monotonic() - started
+                    )
+                if hooks:
+                    event.finish(error=e)
+                    if delay is None:
+                        hooks.emit("on_error", event)
+                if delay is None:
+                    raise errors.APIConnectionError(
+                        "Failed to connect to Listen API."
+                    ) from None
+            else:
+                if hooks:
+                    event.finish(response=response)
+                    hooks.emit("after_response", event)
+                if self.rate_limiter:
+                    self.rate_limiter.update(response)
+                delay = None
+                if self.retry_policy:
+                    delay = self.retry_policy.next_delay(
+                        method,
+                        retries,
+                        time.monotonic() - started,
+                        response=response,
+                    )
+                if delay is None:
+                    break
+                if stream:
+                    # Release the connection of the discarded response
+                    await response.aclose()
+            if hooks:
+                event.delay = delay
+                hooks.emit("on_retry", event)
+            await asyncio.sleep(delay)
+            retries += 1
+
+        # Number of retries it took to get this response
+        response.retries = retries
+        decoders.bind(response, self.json_decoder)
+
+        if self.raise_exception and response.is_error:
+            if stream:
+                # So the error's response has a body
+                await response.aread()
+            raise_for_status_code(response.status_code, response)
+            response.raise_for_status()
+
+        return response
+
+    async def _send_hedged(self, method, url, timeout, **kwargs):
+        import asyncio
+
+        policy = self.hedge_policy
+        delay = policy.delay(url)
+        primary = self._start(method, url, timeout, False, kwargs)
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if done or not policy.allow_hedge(self.rate_limiter):
+            return await primary
+
+        hedge = self._start(method, url, timeout, True, kwargs)
+        pending = [primary, hedge]
+        error = None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                # Check in start order, so a tie goes to the primary
+                for task in list(pending):
+                    if task not in done:
+                        continue
+                    pending.remove(task)
+                    if task.exception() is None:
+                        if task is hedge:
+                            policy.won()
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _start(self, method, url, timeout, reserved, kwargs):
+        """Run _send() in a task, timing it for the hedge policy."""
+        import asyncio
+
+        started = time.monotonic()
+        task = asyncio.ensure_future(
+            self._send(method, url, timeout, reserved, **kwargs)
+        )
+
+        def observe(task):
+            if not task.cancelled() and task.exception() is None:
+                self.hedge_policy.observe(url, time.monotonic() - started)
+
+        task.add_done_callback(observe)
+        return task
+
+    async def _trace(self, event_name, info):
+        # httpcore trace extension
+        if event_name == "connection.connect_tcp.complete":
+            self.stats.incr("new_connections")
+
+    def pool_stats(self):
+        """Return connection pool counters, see PoolStats.as_dict().
+
+        discarded_connections is always 0: httpx doesn't report the idle
+        connections it closes beyond max_keepalive_connections. Returns
+        None if a custom transport is used.
+        """
+        return self.stats.as_dict() if self.stats else None
+
+    async def aclose(self):
+        """Close all pooled connections."""
+        await self.session.aclose()
+
+    async def delete(self, url, timeout=None, **kwargs):
+        """Shortcut for DELETE request."""
+        return await self.request("DELETE", url, timeout, **kwargs)
+
+    async def get(self, url, timeout=None, **kwargs):
+        """Shortcut for GET request."""
+        return await self.request("GET", url, timeout, **kwargs)
+
+    async def post(self, url, timeout=None, **kwargs):
+        """Shortcut for POST request."""
+        return await self.request("POST", url, timeout, **kwargs)
@@ -0,0 +1,497 @@
+import bisect
+import threading
+import time
+
+from listennotes import endpoints
+
+
+# Events emitted by http_utils.Request and http_utils.AsyncRequest
+EVENTS = ("before_request", "after_response", "on_retry", "on_error")
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.15,
+    0.2,
+    0.3,
+    0.4,
+    0.5,
+    0.75,
+    1,
+    1.5,
+    2,
+    3,
+    5,
+    7.5,
+    10,
+    15,
+    30,
+    60,
+)
+
+
+class RequestEvent:
+    """One attempt of a request, passed to every hook.
+
+    Attributes:
+        method, url: of the request.
+        endpoint: the path template of the endpoint, e.g., "/podcasts/{id}".
+        attempt: 0 for the first attempt, n for the n-th retry.
+        elapsed: seconds the attempt took, once it's done.
+        response: the response, if one was received.
+        error: the exception raised by the transport, if any.
+        delay: seconds to wait before the next attempt (on_retry only).
+    """
+
+    __slots__ = (
+        "method",
+        "url",
+        "endpoint",
+        "attempt",
+        "started",
+        "elapsed",
+        "response",
+        "error",
+        "delay",
+    )
+
+    def __init__(self, method, url, attempt):
+        self.method = method.upper()
+        self.url = url
+        self.endpoint = endpoints.endpoint_name(url)
+        self.attempt = attempt
+        self.started = time.monotonic()
+        self.elapsed = None
+        self.response = None
+        self.error = None
+        self.delay = None
+
+    def finish(self, response=None, error=None):
+        self.elapsed = time.monotonic() - self.started
+        self.response = response
+        self.error = error
+
+
+class Hooks:
+    """Callbacks called with a RequestEvent around each request attempt.
+
+    - before_request: before an attempt is sent.
+    - after_response: when a response is received, whatever its status.
+    - on_retry: when an attempt failed and is going to be retried.
+    - on_error: when a request fails without a response, e.g., on a
+      connection error or timeout, and isn't retried.
+
+    An empty Hooks object is falsy, so requests skip creating events at all
+    when there's no callback.
+    """
+
+    def __init__(self, **callbacks):
+        """
+        Args:
+            callbacks: event name => a callback or a list of callbacks.
+        """
+        self._callbacks = {event: [] for event in EVENTS}
+        self._enabled = False
+        for event, callback in callbacks.items():
+            if callable(callback):
+                callback = [callback]
+            for the_callback in callback:
+                self.add(event, the_callback)
+
+    def add(self, event, callback):
+        """Call callback(request_event) on event."""
+        if event not in self._callbacks:
+            raise ValueError(
+                "Unknown event %r, should be one of %s"
+                % (event, ", ".join(EVENTS))
+            )
+        self._callbacks[event].append(callback)
+        self._enabled = True
+
+    def remove(self, event, callback):
+        self._callbacks[event].remove(callback)
+        self._enabled = any(self._callbacks.values())
+
+    def register(self, listener):
+        """Add the methods of listener named after events as callbacks."""
+        for event in EVENTS:
+            callback = getattr(listener, event, None)
+            if callback is not None:
+                self.add(event, callback)
+        return listener
+
+    def emit(self, event, request_event):
+        for callback in self._callbacks[event]:
+            callback(request_event)
+
+    def __bool__(self):
+        return self._enabled
+
+
+def request_size(response):
+    """Return the size in bytes of the body of the request of response."""
+    request = response.request
+    if hasattr(request, "body"):
+        body = request.body
+    else:
+        body = getattr(request, "content", None)
+    if isinstance(body, str):
+        return len(body.encode("utf-8"))
+    return len(body) if isinstance(body, bytes) else 0
+
+
+def response_size(response):
+    """Return the size in bytes of the body of response, as transferred.
+
+    Streamed responses that haven't been read yet count as 0 bytes, unless
+    they have a Content-Length header.
+    """
+    length = response.headers.get("Content-Length")
+    if length is not None and length.isdigit():
+        return int(length)
+    content = getattr(response, "_content", None)
+    return len(content) if isinstance(content, bytes) else 0
+
+
+class Histogram:
+    """A fixed-bucket histogram, estimating quantiles by interpolation.
+
+    Estimates are exact to within the width of a bucket, with constant
+    memory whatever the number of observations.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Return an estimate of the q-quantile (0 <= q <= 1)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                upper = min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    def merge(self, other):
+        """Add the observations of another histogram with the same buckets."""
+        if other.buckets != self.buckets:
+            raise ValueError("Can't merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def cumulative_counts(self):
+        """Yield (upper bound, count of observations <= upper bound)."""
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class EndpointStats:
+    """Metrics of one (method, endpoint) pair."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.latency = Histogram(buckets)
+        self.statuses = {}
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.retries = 0
+        self.errors = {}
+
+    def as_dict(self):
+        return {
+            "count": self.latency.count,
+            "total_time": self.latency.sum,
+            "p50": self.latency.quantile(0.5),
+            "p95": self.latency.quantile(0.95),
+            "p99": self.latency.quantile(0.99),
+            "max": self.latency.max,
+            "statuses": dict(self.statuses),
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "retries": self.retries,
+            "errors": dict(self.errors),
+        }
+
+
+class MetricsCollector:
+    """Collect per-endpoint latency, status codes, payload sizes and retries.
+
+    Register it on Client.hooks, or pass metrics=True to Client:
+
+        client = podcast_api.Client(api_key=api_key, metrics=True)
+        ...
+        print(client.metrics.snapshot())
+        print(client.metrics.to_prometheus())
+
+    Every attempt is counted, so a request retried twice counts 3 times.
+    Responses served from the cache aren't counted. Thread-safe.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, request_event):
+        key = (request_event.method, request_event.endpoint)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats.setdefault(key, EndpointStats(self.buckets))
+        return stats
+
+    def after_response(self, request_event):
+        response = request_event.response
+        request_bytes = request_size(response)
+        response_bytes = response_size(response)
+        with self._lock:
+            stats = self._get(request_event)
+            stats.latency.observe(request_event.elapsed)
+            status = response.status_code
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+
+    def on_retry(self, request_event):
+        with self._lock:
+            self._get(request_event).retries += 1
+            if request_event.error is not None:
+                self._count_error(request_event)
+
+    def on_error(self, request_event):
+        with self._lock:
+            self._count_error(request_event)
+
+    def _count_error(self, request_event):
+        stats = self._get(request_event)
+        name = type(request_event.error).__name__
+        stats.errors[name] = stats.errors.get(name, 0) + 1
+
+    def snapshot(self):
+        """Return {"METHOD /endpoint": stats dict}.
+
+        Endpoints are sorted by total time spent waiting for them, most
+        first. See EndpointStats.as_dict() for the stats.
+        """
+        with self._lock:
+            items = [
+                ("%s %s" % key, stats.as_dict())
+                for key, stats in self._stats.items()
+            ]
+        items.sort(key=lambda item: item[1]["total_time"], reverse=True)
+        return dict(items)
+
+    def latency(self):
+        """Return a Histogram of the latency of all endpoints together."""
+        histogram = Histogram(self.buckets)
+        with self._lock:
+            for stats in self._stats.values():
+                histogram.merge(stats.latency)
+        return histogram
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def to_prometheus(self, prefix="listennotes"):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def add_metric(name, kind, help_text):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_text))
+            lines.append("# TYPE %s_%s %s" % (prefix, name, kind))
+
+        def add_sample(name, labels, value):
+            lines.append(
+                "%s_%s{%s} %s"
+                % (
+                    prefix,
+                    name,
+                    ",".join(
+                        '%s="%s"' % (key, _escape(label))
+                        for key, label in labels
+                    ),
+                    _format(value),
+                )
+            )
+
+        with self._lock:
+            stats = sorted(self._stats.items())
+
+            add_metric(
+                "request_duration_seconds",
+                "histogram",
+                "Listen API request latency.",
+            )
+            for (method, endpoint), the_stats in stats:
+                labels = [("method", method), ("endpoint", endpoint)]
+                for bound, count in the_stats.latency.cumulative_counts():
+                    add_sample(
+                        "request_duration_seconds_bucket",
+                        labels + [("le", _format(bound))],
+                        count,
+                    )
+                add_sample(
+                    "request_duration_seconds_sum",
+                    labels,
+                    the_stats.latency.sum,
+                )
+                add_sample(
+                    "request_duration_seconds_count",
+                    labels,
+                    the_stats.latency.count,
+                )
+
+            add_metric(
+                "responses_total", "counter", "Responses by status code."
+            )
+            for (method, endpoint), the_stats in stats:
+                for status, count in sorted(the_stats.statuses.items()):
+                    add_sample(
+                        "responses_total",
+                        [
+                            ("method", method),
+                            ("endpoint", endpoint),
+                            ("status", status),
+                        ],
+                        count,
+                    )
+
+            for name, attribute, help_text in (
+                ("request_bytes_total", "request_bytes", "Bytes sent."),
+                ("response_bytes_total", "response_bytes", "Bytes received."),
+                ("retries_total", "retries", "Retried attempts."),
+            ):
+                add_metric(name, "counter", help_text)
+                for (method, endpoint), the_stats in stats:
+                    add_sample(
+                        name,
+                        [("method", method), ("endpoint", endpoint)],
+                        getattr(the_stats, attribute),
+                    )
+
+            add_metric(
+                "errors_total",
+                "counter",
+                "Attempts failing without a response.",
+            )
+            for (method, endpoint), the_stats in stats:
+                for error, count in sorted(the_stats.errors.items()):
+                    add_sample(
+                        "errors_total",
+                        [
+                            ("method", method),
+                            ("endpoint", endpoint),
+                            ("error", error),
+                        ],
+                        count,
+                    )
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(label):
+    return (
+        str(label)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def _format(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class OpenTelemetryMetrics:
+    """Record request metrics with an OpenTelemetry meter.
+
+        from opentelemetry import metrics
+        client.hooks.register(
+            OpenTelemetryMetrics(metrics.get_meter("listennotes"))
+        )
+
+    Instruments follow the OpenTelemetry semantic conventions for http
+    clients, with the Listen API endpoint template as the url.template
+    attribute.
+    """
+
+    def __init__(self, meter):
+        self.duration = meter.create_histogram(
+            "http.client.request.duration",
+            unit="s",
+            description="Duration of Listen API requests.",
+        )
+        self.request_size = meter.create_counter(
+            "http.client.request.body.size",
+            unit="By",
+            description="Bytes sent to Listen API.",
+        )
+        self.response_size = meter.create_counter(
+            "http.client.response.body.size",
+            unit="By",
+            description="Bytes received from Listen API.",
+        )
+        self.retries = meter.create_counter(
+            "listennotes.client.retries",
+            description="Retried Listen API requests.",
+        )
+
+    @staticmethod
+    def _attributes(request_event, **extra):
+        attributes = {
+            "http.request.method": request_event.method,
+            "url.template": request_event.endpoint,
+        }
+        attributes.update(extra)
+        return attributes
+
+    def after_response(self, request_event):
+        response = request_event.response
+        attributes = self._attributes(
+            request_event,
+            **{"http.response.status_code": response.status_code}
+        )
+        self.duration.record(request_event.elapsed, attributes)
+        self.request_size.add(request_size(response), attributes)
+        self.response_size.add(response_size(response), attributes)
+
+    def on_retry(self, request_event):
+        self.retries.add(1, self._attributes(request_event))
+        if request_event.error is not None:
+            self.on_error(request_event)
+
+    def on_error(self, request_event):
+        self.duration.record(
+            request_event.elapsed,
+            self._attributes(
+                request_event,
+                **{"error.type": type(request_event.error).__name__}
+            ),
+        )
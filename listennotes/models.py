@@ -0,0 +1,346 @@
+import json
+
+from listennotes import decoders, endpoints
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode(
+        "utf-8"
+    )
+
+
+def _is_model(value):
+    if isinstance(value, list):
+        value = value[0]
+    return isinstance(value, Model)
+
+
+class Model:
+    """Typed, memory-efficient view of a Listen API json object.
+
+    Fields are stored in __slots__ rather than a per-object dict. Nested
+    objects (e.g., the episodes of a podcast) are kept as json bytes, about
+    half the size of the decoded dicts, until they are accessed for the
+    first time, then decoded and converted to models once:
+
+        podcast = models.parse(client.fetch_podcast_by_id(id=podcast_id))
+        for episode in podcast.episodes:
+            print(episode.title, episode.pub_date_ms)
+
+    Fields Listen API adds in the future are still available as attributes;
+    they're kept in a small side dict.
+    """
+
+    __slots__ = ("_extra",)
+
+    # Nested fields: name => (model class name, is a list). Stored as json
+    # bytes in the "_<name>" slot until first accessed.
+    _nested = {}
+    _fields = ()
+    # json key => slot
+    _slot_of = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        slots = []
+        for klass in reversed(cls.__mro__):
+            slots.extend(getattr(klass, "__slots__", ()))
+        cls._fields = tuple(slot for slot in slots if slot != "_extra")
+        cls._slot_of = {field.lstrip("_"): field for field in cls._fields}
+
+    def __init__(self, data):
+        for field in self._fields:
+            setattr(self, field, None)
+        extra = None
+        slot_of = self._slot_of
+        nested = self._nested
+        for key, value in data.items():
+            field = slot_of.get(key)
+            if field is not None:
+                if key in nested and isinstance(value, (dict, list)):
+                    if value and not _is_model(value):
+                        value = _encode(value)
+                setattr(self, field, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    @classmethod
+    def from_response(cls, response):
+        """Build a model from a response of the matching endpoint."""
+        return cls(response.json())
+
+    def __getattr__(self, name):
+        # Only called when normal attribute lookup fails
+        if name.startswith("_"):
+            raise AttributeError(name)
+        nested = type(self)._nested.get(name)
+        if nested is not None:
+            model_name, is_list = nested
+            value = getattr(self, "_" + name)
+            if isinstance(value, bytes):
+                value = decoders.default_decoder(value)
+                model = MODELS[model_name]
+                if is_list:
+                    value = [model(item) for item in value]
+                else:
+                    value = model(value)
+                # Drop the json
+                setattr(self, "_" + name, value)
+            return value
+        extra = self._extra
+        if extra and name in extra:
+            return extra[name]
+        raise AttributeError(
+            "%r object has no attribute %r" % (type(self).__name__, name)
+        )
+
+    def to_dict(self):
+        """Convert back to json-compatible dicts and lists."""
+        data = dict(self._extra or {})
+        for field in self._fields:
+            key = field.lstrip("_")
+            if key in self._nested:
+                value = getattr(self, key)
+            else:
+                value = getattr(self, field)
+            if isinstance(value, Model):
+                value = value.to_dict()
+            elif value and isinstance(value, list):
+                value = [
+                    item.to_dict() if isinstance(item, Model) else item
+                    for item in value
+                ]
+            data[key] = value
+        return data
+
+    def __repr__(self):
+        the_id = getattr(self, "id", None)
+        if the_id is None:
+            return "<%s>" % type(self).__name__
+        return "<%s id=%r>" % (type(self).__name__, the_id)
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+
+class Episode(Model):
+    __slots__ = (
+        "id",
+        "title",
+        "description",
+        "pub_date_ms",
+        "audio",
+        "audio_length_sec",
+        "image",
+        "thumbnail",
+        "link",
+        "listennotes_url",
+        "listennotes_edit_url",
+        "explicit_content",
+        "maybe_audio_invalid",
+        "transcript",
+        "guid_from_rss",
+        "_podcast",
+    )
+    _nested = {"podcast": ("Podcast", False)}
+
+
+class Podcast(Model):
+    __slots__ = (
+        "id",
+        "title",
+        "publisher",
+        "description",
+        "image",
+        "thumbnail",
+        "listennotes_url",
+        "listen_score",
+        "listen_score_global_rank",
+        "total_episodes",
+        "explicit_content",
+        "itunes_id",
+        "rss",
+        "latest_pub_date_ms",
+        "latest_episode_id",
+        "earliest_pub_date_ms",
+        "language",
+        "country",
+        "website",
+        "extra",
+        "is_claimed",
+        "email",
+        "type",
+        "looking_for",
+        "genre_ids",
+        "audio_length_sec",
+        "update_frequency_hours",
+        "next_episode_pub_date",
+        "_episodes",
+    )
+    _nested = {"episodes": ("Episode", True)}
+
+
+class SearchResult(Model):
+    """An item of search results: an episode, a podcast or a curated list,
+    depending on the `type` parameter of search."""
+
+    __slots__ = (
+        "id",
+        "rss",
+        "link",
+        "audio",
+        "image",
+        "thumbnail",
+        "itunes_id",
+        "pub_date_ms",
+        "guid_from_rss",
+        "title_original",
+        "title_highlighted",
+        "description_original",
+        "description_highlighted",
+        "transcripts_highlighted",
+        "publisher_original",
+        "publisher_highlighted",
+        "listennotes_url",
+        "audio_length_sec",
+        "explicit_content",
+        "total_episodes",
+        "latest_pub_date_ms",
+        "earliest_pub_date_ms",
+        "genre_ids",
+        "_podcast",
+    )
+    _nested = {"podcast": ("Podcast", False)}
+
+
+class SearchResponse(Model):
+    __slots__ = ("count", "total", "took", "next_offset", "_results")
+    _nested = {"results": ("SearchResult", True)}
+
+
+class CuratedList(Model):
+    __slots__ = (
+        "id",
+        "title",
+        "description",
+        "source_url",
+        "source_domain",
+        "pub_date_ms",
+        "listennotes_url",
+        "total",
+        "_podcasts",
+    )
+    _nested = {"podcasts": ("Podcast", True)}
+
+
+class PlaylistItem(Model):
+    """An item of a playlist; data is an Episode or a Podcast."""
+
+    __slots__ = ("id", "type", "notes", "added_at_ms", "_data")
+
+    @property
+    def data(self):
+        value = self._data
+        if isinstance(value, dict):
+            model = Episode if self.type == "episode" else Podcast
+            value = self._data = model(value)
+        return value
+
+
+class Playlist(Model):
+    __slots__ = (
+        "id",
+        "name",
+        "description",
+        "image",
+        "thumbnail",
+        "visibility",
+        "listennotes_url",
+        "total_episodes",
+        "total_podcasts",
+        "type",
+        "last_timestamp_ms",
+        "_items",
+    )
+    _nested = {"items": ("PlaylistItem", True)}
+
+
+class BestPodcasts(Model):
+    __slots__ = (
+        "id",
+        "name",
+        "total",
+        "has_next",
+        "has_previous",
+        "page_number",
+        "previous_page_number",
+        "next_page_number",
+        "listennotes_url",
+        "parent_id",
+        "_podcasts",
+    )
+    _nested = {"podcasts": ("Podcast", True)}
+
+
+class BatchPodcasts(Model):
+    __slots__ = ("_podcasts", "_latest_episodes")
+    _nested = {
+        "podcasts": ("Podcast", True),
+        "latest_episodes": ("Episode", True),
+    }
+
+
+class BatchEpisodes(Model):
+    __slots__ = ("_episodes",)
+    _nested = {"episodes": ("Episode", True)}
+
+
+MODELS = {
+    klass.__name__: klass
+    for klass in (
+        Episode,
+        Podcast,
+        SearchResult,
+        SearchResponse,
+        CuratedList,
+        PlaylistItem,
+        Playlist,
+        BestPodcasts,
+        BatchPodcasts,
+        BatchEpisodes,
+    )
+}
+
+# Model of the response of each endpoint, see endpoints.EndpointMap
+ENDPOINT_MODELS = endpoints.EndpointMap(
+    {
+        "/search": SearchResponse,
+        "/best_podcasts": BestPodcasts,
+        "/podcasts": BatchPodcasts,
+        "/episodes": BatchEpisodes,
+        "/podcasts/{id}": Podcast,
+        "/episodes/{id}": Episode,
+        "/curated_podcasts/{id}": CuratedList,
+        "/playlists/{id}": Playlist,
+        "/just_listen": Episode,
+    }
+)
+
+
+def parse(response):
+    """Build the model matching the endpoint of a response.
+
+    Raises:
+        ValueError if the endpoint has no model.
+    """
+    model = ENDPOINT_MODELS.get(str(response.url))
+    if model is None:
+        raise ValueError("No model for %s" % response.url)
+    return model.from_response(response)
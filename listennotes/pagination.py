@@ -0,0 +1,95 @@
+import contextvars
+
+#
+# Each paginated endpoint has its own cursor scheme. A cursor function takes
+# the json of one page and returns the parameters to fetch the next page
+# with, or None on the last page.
+#
+
+
+def next_episode_pub_date(data):
+    """Cursor of fetch_podcast_by_id."""
+    cursor = data.get("next_episode_pub_date")
+    if not cursor or not data.get("episodes"):
+        return None
+    return {"next_episode_pub_date": cursor}
+
+
+def next_offset(data):
+    """Cursor of search."""
+    cursor = data.get("next_offset")
+    if not data.get("results") or cursor is None:
+        return None
+    if cursor >= data.get("total", 0):
+        return None
+    return {"offset": cursor}
+
+
+def next_page_number(data):
+    """Cursor of endpoints returning has_next / next_page_number, e.g.,
+    fetch_best_podcasts and fetch_curated_podcasts_lists."""
+    if not data.get("has_next"):
+        return None
+    return {"page": data["next_page_number"]}
+
+
+def iter_items(fetch, key, params, cursor):
+    """Yield the items of every page, fetching the next page in background.
+
+    As soon as a page arrives, the request for the next page is sent on a
+    background thread, so the round trip overlaps with the caller consuming
+    the current page.
+
+    Args:
+        fetch: a Client endpoint method.
+        key: the key of the items list in each page, e.g., "episodes".
+        params: parameters of the first page.
+        cursor: a cursor function, e.g., next_page_number.
+
+    Yields:
+        items (dicts) of all pages, in order.
+    """
+    from concurrent import futures
+
+    executor = futures.ThreadPoolExecutor(max_workers=1)
+    try:
+        future = executor.submit(
+            contextvars.copy_context().run, fetch, **params
+        )
+        while future:
+            data = future.result().json()
+            next_params = cursor(data)
+            future = None
+            if next_params:
+                future = executor.submit(
+                    contextvars.copy_context().run,
+                    fetch,
+                    **dict(params, **next_params)
+                )
+            for item in data.get(key, []):
+                yield item
+    finally:
+        if future:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+async def aiter_items(fetch, key, params, cursor):
+    """Asyncio version of iter_items; fetch is a coroutine function."""
+    import asyncio
+
+    task = asyncio.ensure_future(fetch(**params))
+    try:
+        while task:
+            data = (await task).json()
+            next_params = cursor(data)
+            task = None
+            if next_params:
+                task = asyncio.ensure_future(
+                    fetch(**dict(params, **next_params))
+                )
+            for item in data.get(key, []):
+                yield item
+    finally:
+        if task:
+            task.cancel()
@@ -1,14 +1,170 @@
-from listennotes import version, http_utils
+import collections
+import functools
+import os
+import threading
+
+from listennotes import cache as cache_module
+from listennotes import coalesce as coalesce_module
+from listennotes import circuit, concurrency, decoders, hedging, http_utils
+from listennotes import metrics as metrics_module
+from listennotes import pagination, quota, ratelimit, retry, streaming
+from listennotes import scheduler as scheduler_module
+from listennotes import typeahead as typeahead_module
+from listennotes import version
 
 
 api_key = None
 api_base_prod = "https://listen-api.listennotes.com/api/v2"
 api_base_test = "https://listen-api-test.listennotes.com/api/v2"
 default_user_agent = "podcasts-api-python %s" % version.VERSION
+# Same as the default connection pool size of http_utils.Request, so
+# concurrent calls don't open more connections than the pool keeps alive.
+# Client(pool_maxsize=...) changes both.
+default_max_workers = http_utils.Request.POOL_MAXSIZE
+
+# Endpoints taking a single `id` argument, usable with Client.fetch_many()
+FETCH_MANY_ENDPOINTS = (
+    "fetch_podcast_by_id",
+    "fetch_episode_by_id",
+    "fetch_curated_podcasts_list_by_id",
+    "fetch_recommendations_for_podcast",
+    "fetch_recommendations_for_episode",
+    "fetch_playlist_by_id",
+    "fetch_audience_for_podcast",
+)
+
+# Max number of ids that batch_fetch_podcasts / batch_fetch_episodes accept
+# in a single request
+BATCH_FETCH_MAX_IDS = 10
+
+# Per-id outcome of Client.fetch_many(): either response or error is None
+FetchResult = collections.namedtuple(
+    "FetchResult", ["id", "response", "error"]
+)
+
+
+def _split_ids(ids, chunk_size):
+    """Remove duplicate ids, then split them into chunks of chunk_size."""
+    unique_ids = list(dict.fromkeys(str(the_id) for the_id in ids))
+    chunks = []
+    for start in range(0, len(unique_ids), chunk_size):
+        end = start + chunk_size
+        chunks.append(",".join(unique_ids[start:end]))
+    return unique_ids, chunks
+
+
+def _merge_batches(unique_ids, responses, key):
+    """Merge the `key` lists of batch responses, in the order of unique_ids.
+
+    Ids unknown to Listen API are missing from responses, so they are
+    missing from the result too.
+    """
+    by_id = {}
+    for response in responses:
+        for item in response.json().get(key, []):
+            by_id[item["id"]] = item
+    return [by_id[the_id] for the_id in unique_ids if the_id in by_id]
+
+
+def _join_ids(kwargs):
+    ids = kwargs.get("ids")
+    if isinstance(ids, (list, tuple)):
+        kwargs["ids"] = ",".join(str(the_id) for the_id in ids)
+    return kwargs
 
 
 class Client(object):
-    def __init__(self, api_key=None, user_agent=None, max_retries=None):
+    def __init__(
+        self,
+        api_key=None,
+        user_agent=None,
+        max_retries=None,
+        cache=None,
+        rate_limit=None,
+        retry_policy=None,
+        pool_maxsize=None,
+        pool_connections=None,
+        pool_block=False,
+        tcp_keepalive=False,
+        timeout=None,
+        endpoint_timeouts=None,
+        adapter=None,
+        json_decoder=None,
+        hooks=None,
+        metrics=None,
+        usage_tracker=None,
+        coalesce=None,
+        coalesce_window=coalesce_module.WINDOW,
+        scheduler=None,
+        hedge=None,
+        typeahead_cache=None,
+        circuit_breaker=None,
+    ):
+        """Set up a Client object.
+
+        Args:
+            api_key: your api key; None to use the mock server.
+            user_agent: the User-Agent header.
+            max_retries: max retries on connection failures.
+            cache: True, or a cache.ResponseCache object, to cache responses
+                of read-only endpoints (genres, regions, languages, curated
+                lists and best podcasts by default).
+            rate_limit: max requests per second, or a ratelimit.RateLimiter
+                object to share one budget across several clients.
+            retry_policy: True, or a retry.RetryPolicy object, to retry GET
+                requests failing with 429, 5xx, connection errors or timeouts,
+                with exponential backoff.
+            pool_maxsize: max connections kept alive; set it to at least the
+                number of threads sharing this client. It's also the default
+                concurrency of fetch_many() and the batch_fetch_all_*()
+                functions.
+            pool_connections: number of hosts to keep a connection pool for.
+            pool_block: if True, wait for a free connection when all
+                pool_maxsize connections are in use.
+            tcp_keepalive: if True, turn on TCP keep-alive probes on pooled
+                connections.
+            timeout: default timeout in seconds, or a (connect, read) tuple.
+            endpoint_timeouts: a dict of path template => timeout to
+                override timeout for some endpoints, e.g.,
+                {"/typeahead": (1, 2)}.
+            adapter: a custom requests.adapters.HTTPAdapter object; the pool
+                arguments are ignored if it's specified.
+            json_decoder: "orjson", "msgspec", "json", or a function
+                decoding json bytes, used by response.json(). By default,
+                the fastest installed one.
+            hooks: a dict of event => callback or list of callbacks, see
+                metrics.Hooks. More can be added to client.hooks later.
+            metrics: True, or a metrics.MetricsCollector object, to collect
+                per-endpoint latency, status codes and payload sizes in
+                client.metrics.
+            usage_tracker: True, or a quota.UsageTracker object, to track
+                the usage and quota reported by Listen API in
+                client.usage_tracker.
+            coalesce: True, "episodes" or "podcasts", to merge calls of
+                fetch_episode_by_id / fetch_podcast_by_id with only an id
+                argument, made within coalesce_window seconds of each
+                other (e.g., from many threads), into batch_fetch_episodes /
+                batch_fetch_podcasts requests. Responses then have the
+                fields of the batch endpoints; e.g., podcasts have no
+                episodes.
+            coalesce_window: max seconds a call waits for others to join
+                its batch.
+            scheduler: True, or a scheduler.Scheduler object, to share
+                pool_maxsize request slots between priority classes, so
+                interactive calls (typeahead, search, ...) get ahead of bulk
+                work. See Client.priority().
+            hedge: True, or a hedging.HedgePolicy object, to send a
+                duplicate of typeahead and spellcheck requests that are
+                slower than usual, and use whichever answers first.
+            typeahead_cache: True, or a typeahead.PrefixCache object, to
+                cache typeahead responses by prefix, and answer longer
+                prefixes locally when a shorter one had no results. See
+                typeahead.TypeaheadSession to debounce keystrokes.
+            circuit_breaker: True, or a circuit.CircuitBreaker object, to
+                raise errors.CircuitOpenError right away on calls to an
+                endpoint after 5 consecutive 5xx responses, connection
+                errors or timeouts, until a probe call succeeds.
+        """
         self.api_base = api_base_prod if api_key else api_base_test
 
         self.request_headers = {
@@ -19,8 +175,104 @@ class Client(object):
         request_kwargs = {}
         if max_retries:
             request_kwargs["max_retries"] = max_retries
-
-        self.http_client = http_utils.Request(**request_kwargs)
+        if cache is True:
+            request_kwargs["cache"] = cache_module.ResponseCache()
+        elif cache:
+            request_kwargs["cache"] = cache
+        if isinstance(rate_limit, (int, float)):
+            request_kwargs["rate_limiter"] = ratelimit.RateLimiter(rate_limit)
+        elif rate_limit:
+            request_kwargs["rate_limiter"] = rate_limit
+        if retry_policy is True:
+            request_kwargs["retry_policy"] = retry.RetryPolicy()
+        elif retry_policy:
+            request_kwargs["retry_policy"] = retry_policy
+        if isinstance(json_decoder, str):
+            json_decoder = decoders.get_decoder(json_decoder)
+        self.hooks = metrics_module.Hooks(**(hooks or {}))
+        if metrics is True:
+            metrics = metrics_module.MetricsCollector()
+        self.metrics = metrics or None
+        if self.metrics:
+            self.hooks.register(self.metrics)
+        if usage_tracker is True:
+            usage_tracker = quota.UsageTracker()
+        self.usage_tracker = usage_tracker or None
+        if self.usage_tracker:
+            self.hooks.register(self.usage_tracker)
+        request_kwargs["hooks"] = self.hooks
+        self.max_workers = pool_maxsize or default_max_workers
+        if scheduler is True:
+            scheduler = scheduler_module.Scheduler(self.max_workers)
+        self.scheduler = scheduler or None
+        if self.scheduler:
+            request_kwargs["scheduler"] = self.scheduler
+        if hedge is True:
+            hedge = hedging.HedgePolicy()
+        self.hedge_policy = hedge or None
+        if self.hedge_policy:
+            request_kwargs["hedge_policy"] = self.hedge_policy
+        if circuit_breaker is True:
+            circuit_breaker = circuit.CircuitBreaker()
+        self.circuit_breaker = circuit_breaker or None
+        if self.circuit_breaker:
+            request_kwargs["circuit_breaker"] = self.circuit_breaker
+        for key, value in (
+            ("pool_maxsize", pool_maxsize),
+            ("pool_connections", pool_connections),
+            ("pool_block", pool_block),
+            ("tcp_keepalive", tcp_keepalive),
+            ("timeout", timeout),
+            ("endpoint_timeouts", endpoint_timeouts),
+            ("adapter", adapter),
+            ("json_decoder", json_decoder),
+        ):
+            if value:
+                request_kwargs[key] = value
+
+        self.http_client = self._build_http_client(request_kwargs)
+        self._coalescers = self._build_coalescers(coalesce, coalesce_window)
+        if typeahead_cache is True:
+            typeahead_cache = typeahead_module.PrefixCache()
+        self.typeahead_cache = typeahead_cache or None
+
+    def _build_http_client(self, request_kwargs):
+        return http_utils.Request(**request_kwargs)
+
+    def _build_coalescers(self, coalesce, window):
+        if coalesce is True:
+            coalesce = ("episodes", "podcasts")
+        elif isinstance(coalesce, str):
+            coalesce = (coalesce,)
+        coalescers = {}
+        for key in coalesce or ():
+            if key == "episodes":
+                batch_func = self.batch_fetch_episodes
+            elif key == "podcasts":
+                batch_func = self.batch_fetch_podcasts
+            else:
+                raise ValueError("Can't coalesce %r" % key)
+            coalescers[key] = coalesce_module.Coalescer(
+                batch_func,
+                key,
+                functools.partial(self._item_url, key),
+                window=window,
+                max_batch=BATCH_FETCH_MAX_IDS,
+            )
+        return coalescers
+
+    def priority(self, name):
+        """Return a context manager running the requests made in it with
+        the priority class `name`, e.g., "bulk"; see scheduler.priority().
+        """
+        return scheduler_module.priority(name)
+
+    def _item_url(self, key, the_id):
+        return "%s/%s/%s" % (self.api_base, key, the_id)
+
+    def pool_stats(self):
+        """Return connection pool counters, e.g., reused_connections."""
+        return self.http_client.pool_stats()
 
     #
     # All endpoints
@@ -33,12 +285,25 @@ class Client(object):
         )
 
     def typeahead(self, **kwargs):
+        cache = self.typeahead_cache
+        if cache is not None and cache.accepts(kwargs):
+            return self._cached_typeahead(kwargs)
+        return self._typeahead(kwargs)
+
+    def _typeahead(self, params):
         return self.http_client.get(
             "%s/typeahead" % self.api_base,
-            params=kwargs,
+            params=params,
             headers=self.request_headers,
         )
 
+    def _cached_typeahead(self, params):
+        response = self.typeahead_cache.get(params)
+        if response is None:
+            response = self._typeahead(params)
+            self.typeahead_cache.put(params, response)
+        return response
+
     def search_episode_titles(self, **kwargs):
         return self.http_client.get(
             "%s/search_episode_titles" % self.api_base,
@@ -75,6 +340,13 @@ class Client(object):
         )
 
     def fetch_podcast_by_id(self, **kwargs):
+        coalescer = self._coalescers.get("podcasts")
+        if coalescer and kwargs.keys() == {"id"}:
+            return coalescer.fetch(kwargs["id"])
+        return self._fetch_podcast(**kwargs)
+
+    def _fetch_podcast(self, **kwargs):
+        # Never coalesced, for callers needing the episodes of the podcast
         podcast_id = kwargs.pop("id", None)
         return self.http_client.get(
             "%s/podcasts/%s" % (self.api_base, podcast_id),
@@ -83,6 +355,9 @@ class Client(object):
         )
 
     def fetch_episode_by_id(self, **kwargs):
+        coalescer = self._coalescers.get("episodes")
+        if coalescer and kwargs.keys() == {"id"}:
+            return coalescer.fetch(kwargs["id"])
         episode_id = kwargs.pop("id", None)
         return self.http_client.get(
             "%s/episodes/%s" % (self.api_base, episode_id),
@@ -93,14 +368,14 @@ class Client(object):
     def batch_fetch_podcasts(self, **kwargs):
         return self.http_client.post(
             "%s/podcasts" % self.api_base,
-            data=kwargs,
+            data=_join_ids(kwargs),
             headers=self.request_headers,
         )
 
     def batch_fetch_episodes(self, **kwargs):
         return self.http_client.post(
             "%s/episodes" % self.api_base,
-            data=kwargs,
+            data=_join_ids(kwargs),
             headers=self.request_headers,
         )
 
@@ -208,3 +483,360 @@ class Client(object):
             params=kwargs,
             headers=self.request_headers,
         )
+
+    #
+    # Helpers
+    #
+    def _fetch_many_func(self, endpoint, kwargs):
+        if endpoint not in FETCH_MANY_ENDPOINTS:
+            raise ValueError(
+                "fetch_many() doesn't support %s. Use one of: %s"
+                % (endpoint, ", ".join(FETCH_MANY_ENDPOINTS))
+            )
+        func = getattr(self, endpoint)
+        return lambda the_id: func(id=the_id, **kwargs)
+
+    def fetch_many(
+        self, endpoint, ids, max_workers=None, ordered=True, **kwargs
+    ):
+        """Call an id-based endpoint for many ids concurrently.
+
+        Requests run on a bounded thread pool sharing this client's
+        connection pool. A failed request doesn't stop the others: its
+        exception is returned in the FetchResult instead.
+
+        Args:
+            endpoint: a method name in FETCH_MANY_ENDPOINTS, e.g.,
+                "fetch_podcast_by_id".
+            ids: an iterable of ids; it's consumed lazily.
+            max_workers: the number of threads, pool_maxsize by default.
+            ordered: if True, yield results in the order of ids; otherwise
+                yield them as they complete.
+            kwargs: extra parameters passed to every call, e.g., sort.
+
+        Yields:
+            FetchResult(id, response, error) tuples.
+        """
+        func = self._fetch_many_func(endpoint, kwargs)
+        for the_id, response, error in concurrency.bounded_map(
+            func, ids, max_workers or self.max_workers, ordered=ordered
+        ):
+            yield FetchResult(the_id, response, error)
+
+    def _batch_fetch_all(
+        self, func, key, ids, chunk_size, max_workers, kwargs
+    ):
+        unique_ids, chunks = _split_ids(ids, chunk_size)
+        responses = []
+        for _, response, error in concurrency.bounded_map(
+            lambda chunk: func(ids=chunk, **kwargs),
+            chunks,
+            max_workers or self.max_workers,
+        ):
+            if error:
+                raise error
+            responses.append(response)
+        return _merge_batches(unique_ids, responses, key)
+
+    def batch_fetch_all_podcasts(
+        self, ids, chunk_size=BATCH_FETCH_MAX_IDS, max_workers=None, **kwargs
+    ):
+        """Batch fetch any number of podcasts by id.
+
+        Duplicate ids are removed, the rest are split into chunks of
+        chunk_size ids, and the chunks are sent to batch_fetch_podcasts
+        concurrently.
+
+        Args:
+            ids: an iterable of podcast ids.
+            chunk_size: max ids per request.
+            max_workers: max requests in flight, pool_maxsize by default.
+            kwargs: extra parameters passed to every batch_fetch_podcasts
+                call.
+
+        Returns:
+            a list of podcast dicts, in the order of ids.
+
+        Raises:
+            the errors.* exception of the first failed request.
+        """
+        return self._batch_fetch_all(
+            self.batch_fetch_podcasts,
+            "podcasts",
+            ids,
+            chunk_size,
+            max_workers,
+            kwargs,
+        )
+
+    def batch_fetch_all_episodes(
+        self, ids, chunk_size=BATCH_FETCH_MAX_IDS, max_workers=None, **kwargs
+    ):
+        """Batch fetch any number of episodes by id.
+
+        Works like batch_fetch_all_podcasts, on top of batch_fetch_episodes.
+
+        Returns:
+            a list of episode dicts, in the order of ids.
+        """
+        return self._batch_fetch_all(
+            self.batch_fetch_episodes,
+            "episodes",
+            ids,
+            chunk_size,
+            max_workers,
+            kwargs,
+        )
+
+    #
+    # Pagination
+    #
+    def _iter_items(self, fetch, key, params, cursor):
+        return pagination.iter_items(fetch, key, params, cursor)
+
+    def iter_episodes(self, **kwargs):
+        """Iterate over all episodes of a podcast, via fetch_podcast_by_id.
+
+        Accepts the same parameters as fetch_podcast_by_id, e.g., id and
+        sort. The next page is prefetched while the current one is
+        consumed.
+        """
+        return self._iter_items(
+            self._fetch_podcast,
+            "episodes",
+            kwargs,
+            pagination.next_episode_pub_date,
+        )
+
+    def iter_search_results(self, **kwargs):
+        """Iterate over all results of search, following next_offset."""
+        return self._iter_items(
+            self.search, "results", kwargs, pagination.next_offset
+        )
+
+    def iter_best_podcasts(self, **kwargs):
+        """Iterate over all podcasts of fetch_best_podcasts."""
+        return self._iter_items(
+            self.fetch_best_podcasts,
+            "podcasts",
+            kwargs,
+            pagination.next_page_number,
+        )
+
+    def iter_curated_podcasts_lists(self, **kwargs):
+        """Iterate over all curated lists of fetch_curated_podcasts_lists."""
+        return self._iter_items(
+            self.fetch_curated_podcasts_lists,
+            "curated_lists",
+            kwargs,
+            pagination.next_page_number,
+        )
+
+    def iter_my_playlists(self, **kwargs):
+        """Iterate over all playlists of fetch_my_playlists."""
+        return self._iter_items(
+            self.fetch_my_playlists,
+            "playlists",
+            kwargs,
+            pagination.next_page_number,
+        )
+
+    def iter_podcasts_by_domain(self, **kwargs):
+        """Iterate over all podcasts of fetch_podcasts_by_domain."""
+        return self._iter_items(
+            self.fetch_podcasts_by_domain,
+            "podcasts",
+            kwargs,
+            pagination.next_page_number,
+        )
+
+    #
+    # Streaming
+    #
+    def _stream_items(self, method, url, key, **kwargs):
+        response = self.http_client.request(
+            method, url, headers=self.request_headers, stream=True, **kwargs
+        )
+        return streaming.ItemStream(response, key)
+
+    def stream_episodes(self, **kwargs):
+        """Stream the episodes of fetch_podcast_by_id one at a time.
+
+        Returns:
+            a streaming.ItemStream yielding episode dicts as the response
+            body arrives. The other podcast fields, e.g.,
+            next_episode_pub_date, are in its `fields` dict.
+        """
+        podcast_id = kwargs.pop("id", None)
+        return self._stream_items(
+            "GET",
+            "%s/podcasts/%s" % (self.api_base, podcast_id),
+            "episodes",
+            params=kwargs,
+        )
+
+    def stream_search_results(self, **kwargs):
+        """Stream the results of search one at a time."""
+        return self._stream_items(
+            "GET", "%s/search" % self.api_base, "results", params=kwargs
+        )
+
+    def stream_batch_episodes(self, **kwargs):
+        """Stream the episodes of batch_fetch_episodes one at a time."""
+        return self._stream_items(
+            "POST",
+            "%s/episodes" % self.api_base,
+            "episodes",
+            data=_join_ids(kwargs),
+        )
+
+    def stream_batch_podcasts(self, **kwargs):
+        """Stream the podcasts of batch_fetch_podcasts one at a time."""
+        return self._stream_items(
+            "POST",
+            "%s/podcasts" % self.api_base,
+            "podcasts",
+            data=_join_ids(kwargs),
+        )
+
+
+class AsyncClient(Client):
+    """Asyncio version of Client.
+
+    Exposes the same endpoint methods as Client, but each one returns an
+    awaitable that resolves to a httpx.Response. Requests share a bounded
+    connection pool of `max_connections` connections.
+
+        async with podcast_api.AsyncClient(api_key=api_key) as client:
+            response = await client.search(q="star wars")
+    """
+
+    # Client options with no httpx equivalent
+    UNSUPPORTED_OPTIONS = (
+        "cache",
+        "coalesce",
+        "scheduler",
+        "pool_connections",
+        "pool_block",
+        "tcp_keepalive",
+        "adapter",
+    )
+
+    def __init__(
+        self,
+        api_key=None,
+        user_agent=None,
+        max_retries=None,
+        max_connections=None,
+        **kwargs
+    ):
+        unsupported = [
+            name for name in self.UNSUPPORTED_OPTIONS if kwargs.get(name)
+        ]
+        if unsupported:
+            raise TypeError(
+                "AsyncClient doesn't support %s; use Client instead"
+                % ", ".join(unsupported)
+            )
+        self._max_connections = max_connections
+        super(AsyncClient, self).__init__(
+            api_key=api_key,
+            user_agent=user_agent,
+            max_retries=max_retries,
+            **kwargs
+        )
+
+    def _build_http_client(self, request_kwargs):
+        if self._max_connections:
+            request_kwargs["max_connections"] = self._max_connections
+        if "pool_maxsize" in request_kwargs:
+            request_kwargs["max_keepalive_connections"] = request_kwargs.pop(
+                "pool_maxsize"
+            )
+        return http_utils.AsyncRequest(**request_kwargs)
+
+    async def fetch_many(
+        self, endpoint, ids, max_workers=None, ordered=True, **kwargs
+    ):
+        """Asyncio version of Client.fetch_many(), used with `async for`.
+
+        max_workers caps the number of requests in flight.
+        """
+        func = self._fetch_many_func(endpoint, kwargs)
+        async for the_id, response, error in concurrency.abounded_map(
+            func, ids, max_workers or self.max_workers, ordered=ordered
+        ):
+            yield FetchResult(the_id, response, error)
+
+    async def _batch_fetch_all(
+        self, func, key, ids, chunk_size, max_workers, kwargs
+    ):
+        unique_ids, chunks = _split_ids(ids, chunk_size)
+        responses = []
+        async for _, response, error in concurrency.abounded_map(
+            lambda chunk: func(ids=chunk, **kwargs),
+            chunks,
+            max_workers or self.max_workers,
+        ):
+            if error:
+                raise error
+            responses.append(response)
+        return _merge_batches(unique_ids, responses, key)
+
+    def _iter_items(self, fetch, key, params, cursor):
+        return pagination.aiter_items(fetch, key, params, cursor)
+
+    async def _stream_items(self, method, url, key, **kwargs):
+        response = await self.http_client.request(
+            method, url, headers=self.request_headers, stream=True, **kwargs
+        )
+        return streaming.AsyncItemStream(response, key)
+
+    async def _cached_typeahead(self, params):
+        response = self.typeahead_cache.get(params)
+        if response is None:
+            response = await self._typeahead(params)
+            self.typeahead_cache.put(params, response)
+        return response
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+
+
+_shared = None
+_shared_pid = None
+_shared_lock = threading.Lock()
+
+
+def shared_client(**kwargs):
+    """Return a Client shared by the whole process, created on first call.
+
+    kwargs are passed to Client when it's created, and ignored afterwards;
+    api_key defaults to the module-level api_key. A Client is thread-safe,
+    and doesn't import requests or open connections until its first
+    request, so short-lived jobs and serverless handlers can grab it at
+    import time and reuse its connections across invocations:
+
+        podcast_api.api_key = os.environ["LISTEN_API_KEY"]
+        client = podcast_api.shared_client()
+
+    A forked child process gets its own client instead of the parent's
+    connections.
+    """
+    global _shared, _shared_pid
+    pid = os.getpid()
+    client = _shared
+    if client is None or _shared_pid != pid:
+        with _shared_lock:
+            if _shared is None or _shared_pid != pid:
+                kwargs.setdefault("api_key", api_key)
+                _shared = Client(**kwargs)
+                _shared_pid = pid
+            client = _shared
+    return client
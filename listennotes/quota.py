@@ -0,0 +1,178 @@
+import collections
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_datetime(value):
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def parse_quota_headers(headers):
+    """Parse the quota headers of a Listen API response.
+
+    Returns a (quota, usage, next_billing_date) tuple, with None for
+    missing or malformed headers.
+    """
+    return (
+        _parse_int(headers.get("X-ListenAPI-FreeQuota")),
+        _parse_int(headers.get("X-ListenAPI-Usage")),
+        _parse_datetime(headers.get("X-ListenAPI-NextBillingDate")),
+    )
+
+
+class UsageTracker:
+    """Track the monthly usage and quota reported by Listen API.
+
+    Every response carries the quota of the plan, the usage so far this
+    month, and the next billing date, when usage is reset. The tracker
+    keeps the latest of them, estimates the current request rate from the
+    usage seen over the last `window` seconds, and calls threshold
+    callbacks when the used fraction of the quota crosses them.
+
+        tracker = quota.UsageTracker()
+        tracker.add_threshold(0.8, lambda fraction, tracker: pause_crawls())
+        client = podcast_api.Client(api_key=api_key, usage_tracker=tracker)
+
+    Share one tracker across clients using the same api key. Thread-safe.
+    """
+
+    WINDOW = 3600  # seconds
+
+    def __init__(self, window=WINDOW):
+        """
+        Args:
+            window: seconds of usage history used to estimate the rate.
+        """
+        self.window = window
+        self.quota = None
+        self.usage = None
+        self.next_billing_date = None
+        self.updated_at = None
+        self._samples = collections.deque()
+        self._thresholds = []
+        self._lock = threading.Lock()
+
+    def add_threshold(self, fraction, callback):
+        """Call callback(fraction, tracker) when usage reaches a fraction.
+
+        E.g., fraction=0.9 fires once usage reaches 90% of the quota. It
+        fires again if usage is reset by a new billing period and reaches
+        it again.
+        """
+        with self._lock:
+            self._thresholds.append([fraction, callback, False])
+
+    def after_response(self, request_event):
+        """Hook to update the tracker, see metrics.Hooks."""
+        self.update(request_event.response)
+
+    def update(self, response):
+        """Update the tracker from the headers of a response."""
+        quota, usage, next_billing_date = parse_quota_headers(response.headers)
+        if usage is not None:
+            self.record(quota, usage, next_billing_date)
+
+    def record(self, quota, usage, next_billing_date=None, now=None):
+        """Record the quota and usage at time `now` (a unix timestamp)."""
+        if now is None:
+            now = time.time()
+        crossed = []
+        with self._lock:
+            if self.updated_at is not None and now < self.updated_at:
+                # Out of order, e.g., responses of concurrent requests
+                return
+            if self.usage is not None and usage < self.usage:
+                # Usage was reset by a new billing period
+                self._samples.clear()
+            self.quota = quota
+            self.usage = usage
+            if next_billing_date is not None:
+                self.next_billing_date = next_billing_date
+            self.updated_at = now
+            self._samples.append((now, usage))
+            while self._samples and self._samples[0][0] < now - self.window:
+                self._samples.popleft()
+
+            fraction_used = self.fraction_used or 0
+            for threshold in self._thresholds:
+                fraction, callback, fired = threshold
+                used = fraction_used >= fraction
+                if used and not fired:
+                    crossed.append((fraction, callback))
+                threshold[2] = used
+        for fraction, callback in crossed:
+            callback(fraction, self)
+
+    @property
+    def remaining(self):
+        """Requests left in the quota this month, or None if unknown."""
+        if self.quota is None or self.usage is None:
+            return None
+        return max(0, self.quota - self.usage)
+
+    @property
+    def fraction_used(self):
+        """Used fraction of the quota, or None if unknown."""
+        if not self.quota or self.usage is None:
+            return None
+        return self.usage / float(self.quota)
+
+    def rate(self):
+        """Return the recent usage rate in requests per second, or None."""
+        with self._lock:
+            if len(self._samples) < 2:
+                return None
+            (first_time, first_usage) = self._samples[0]
+            (last_time, last_usage) = self._samples[-1]
+        if last_time <= first_time:
+            return None
+        return (last_usage - first_usage) / (last_time - first_time)
+
+    def projected_exhaustion(self):
+        """Return when the quota runs out at the recent rate, or None.
+
+        The result is a timezone-aware datetime, or None if the quota or
+        rate is unknown, or if usage isn't growing.
+        """
+        remaining = self.remaining
+        if remaining is None:
+            return None
+        updated_at = datetime.fromtimestamp(self.updated_at, timezone.utc)
+        if remaining == 0:
+            return updated_at
+        rate = self.rate()
+        if not rate or rate <= 0:
+            return None
+        return updated_at + timedelta(seconds=remaining / rate)
+
+    def will_exhaust_before_reset(self):
+        """True if the quota is projected to run out before it's reset."""
+        exhaustion = self.projected_exhaustion()
+        if exhaustion is None or self.next_billing_date is None:
+            return False
+        return exhaustion < self.next_billing_date
+
+    def snapshot(self):
+        return {
+            "quota": self.quota,
+            "usage": self.usage,
+            "remaining": self.remaining,
+            "fraction_used": self.fraction_used,
+            "rate": self.rate(),
+            "projected_exhaustion": self.projected_exhaustion(),
+            "next_billing_date": self.next_billing_date,
+        }
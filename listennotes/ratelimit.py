@@ -0,0 +1,286 @@
+import contextlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from listennotes.quota import parse_quota_headers
+
+
+def retry_after_seconds(response):
+    """Parse the Retry-After header of a response, in seconds, or None."""
+    value = response.headers.get("Retry-After")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """A thread-safe token bucket.
+
+    Tokens are added at `rate` per second, up to `capacity`. Taking a token
+    never fails: if the bucket is empty, the caller gets a reservation and
+    is told how long to wait for it, so waiting callers are served in
+    order.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: tokens (i.e., requests) per second.
+            capacity: max burst size; max(1, rate) by default.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated_at
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+    def reserve(self, tokens=1):
+        """Take tokens, and return the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self, tokens=1):
+        """Take tokens only if available right away; return whether it did."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def aacquire(self, tokens=1):
+        """Asyncio version of acquire()."""
+        import asyncio
+
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def update(self, response):
+        """Called with every response; a plain TokenBucket ignores it."""
+        pass
+
+
+class RateLimiter(TokenBucket):
+    """Pace requests to Listen API, tuning the pace from responses.
+
+    - On 429, the rate is halved (down to min_rate), and all requests wait
+      for Retry-After seconds if the server sent it. The rate then climbs
+      back towards max_rate by 5% per successful response.
+    - With pace_to_quota, the rate never exceeds what's left of the monthly
+      quota (X-ListenAPI-FreeQuota minus X-ListenAPI-Usage) spread over the
+      time left until X-ListenAPI-NextBillingDate. Useful for the FREE plan,
+      which stops serving requests after the quota is used up.
+
+    Share one RateLimiter across threads and Client objects to give them one
+    common budget.
+    """
+
+    MIN_RATE = 0.1  # requests per second
+    INCREASE_FACTOR = 1.05
+    DECREASE_FACTOR = 0.5
+
+    def __init__(
+        self,
+        rate,
+        capacity=None,
+        min_rate=MIN_RATE,
+        auto_tune=True,
+        pace_to_quota=False,
+    ):
+        """
+        Args:
+            rate: max requests per second.
+            capacity: max burst size; max(1, rate) by default.
+            min_rate: the rate never goes below this.
+            auto_tune: if False, ignore 429s and quota headers.
+            pace_to_quota: if True, spread the quota left over the time
+                left until the next billing date.
+        """
+        super(RateLimiter, self).__init__(rate, capacity)
+        self.max_rate = self.rate
+        self.min_rate = min(min_rate, self.rate)
+        self.auto_tune = auto_tune
+        self.pace_to_quota = pace_to_quota
+        self.quota_rate = None
+        self._blocked_until = 0.0
+
+    def reserve(self, tokens=1):
+        delay = super(RateLimiter, self).reserve(tokens)
+        return max(delay, self._blocked_until - time.monotonic())
+
+    def try_acquire(self, tokens=1):
+        if time.monotonic() < self._blocked_until:
+            return False
+        return super(RateLimiter, self).try_acquire(tokens)
+
+    def update(self, response):
+        """Tune the rate from a response of Listen API."""
+        if not self.auto_tune:
+            return
+
+        if self.pace_to_quota:
+            quota_rate = self._quota_rate(response.headers)
+            if quota_rate is not None:
+                self.quota_rate = quota_rate
+
+        if response.status_code == 429:
+            rate = max(self.min_rate, self.rate * self.DECREASE_FACTOR)
+            retry_after = retry_after_seconds(response)
+            if retry_after:
+                self._blocked_until = max(
+                    self._blocked_until, time.monotonic() + retry_after
+                )
+        else:
+            rate = self.rate * self.INCREASE_FACTOR
+
+        ceiling = self.max_rate
+        if self.quota_rate is not None:
+            ceiling = min(ceiling, max(self.min_rate, self.quota_rate))
+        rate = min(rate, ceiling)
+        if rate != self.rate:
+            self.set_rate(rate)
+
+    def _quota_rate(self, headers):
+        quota, usage, next_billing_date = parse_quota_headers(headers)
+        if quota is None or usage is None or next_billing_date is None:
+            return None
+        seconds_left = (
+            next_billing_date - datetime.now(timezone.utc)
+        ).total_seconds()
+        if seconds_left <= 0:
+            return None
+        return max(0, quota - usage) / seconds_left
+
+
+class SharedTokenBucket(TokenBucket):
+    """A token bucket stored in a SQLite file, to share one request budget
+    between processes, e.g., the workers of crawler.Crawler.
+
+    Processes on several machines can share it too, if the file is on a
+    volume with working file locks and their clocks are in sync. A 429
+    with Retry-After pauses all the processes.
+    """
+
+    def __init__(self, path, rate, capacity=None, name="default", timeout=30):
+        """
+        Args:
+            path: the database file path.
+            rate: tokens (i.e., requests) per second, for all processes.
+            capacity: max burst size; max(1, rate) by default.
+            name: the name of the bucket, to keep several in one file.
+            timeout: seconds to wait for a lock held by another process.
+        """
+        super(SharedTokenBucket, self).__init__(rate, capacity)
+        self.path = path
+        self.name = name
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets ("
+                " name TEXT PRIMARY KEY,"
+                " tokens REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " blocked_until REAL NOT NULL)"
+            )
+            connection.execute(
+                "INSERT OR IGNORE INTO token_buckets VALUES (?, ?, ?, 0)",
+                (name, self.capacity, time.time()),
+            )
+
+    def _connect(self):
+        # Connections can't be shared across threads, or survive a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            import sqlite3
+
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _take(self, tokens, wait):
+        """Take tokens; return the seconds to wait before using them, or
+        None if wait is False and they aren't available right away."""
+        with self._transaction() as connection:
+            available, updated_at, blocked_until = connection.execute(
+                "SELECT tokens, updated_at, blocked_until FROM token_buckets"
+                " WHERE name = ?",
+                (self.name,),
+            ).fetchone()
+            now = time.time()
+            elapsed = max(0.0, now - updated_at)
+            available = min(self.capacity, available + elapsed * self.rate)
+            blocked = max(0.0, blocked_until - now)
+            if not wait and (blocked or available < tokens):
+                return None
+            available -= tokens
+            connection.execute(
+                "UPDATE token_buckets SET tokens = ?, updated_at = ?"
+                " WHERE name = ?",
+                (available, now, self.name),
+            )
+        return max(blocked, -available / self.rate if available < 0 else 0)
+
+    def reserve(self, tokens=1):
+        return self._take(tokens, wait=True)
+
+    def try_acquire(self, tokens=1):
+        return self._take(tokens, wait=False) is not None
+
+    def set_rate(self, rate):
+        self.rate = float(rate)
+
+    def update(self, response):
+        """Pause all processes for Retry-After seconds on a 429."""
+        if response.status_code != 429:
+            return
+        retry_after = retry_after_seconds(response)
+        if retry_after:
+            with self._transaction() as connection:
+                connection.execute(
+                    "UPDATE token_buckets SET blocked_until ="
+                    " MAX(blocked_until, ?) WHERE name = ?",
+                    (time.time() + retry_after, self.name),
+                )
@@ -0,0 +1,157 @@
+import base64
+import json
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import requests
+from requests import adapters
+from requests.structures import CaseInsensitiveDict
+
+
+class InteractionNotFound(LookupError):
+    """No recorded interaction matches a request in replay mode."""
+
+
+def interaction_key(method, url, body=None):
+    """Return the key matching a request to its recorded interactions.
+
+    Query parameters are sorted, and the scheme and host are ignored, so a
+    recording replays against any api base, e.g., a local StubServer.
+    """
+    parsed = urlparse(url)
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    return "%s %s?%s %s" % (method.upper(), parsed.path, query, body or "")
+
+
+def _encode_body(content):
+    try:
+        return {"text": content.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(content).decode("ascii")}
+
+
+def decode_body(interaction):
+    """Return the recorded response body of an interaction, in bytes."""
+    if "base64" in interaction:
+        return base64.b64decode(interaction["base64"])
+    return interaction.get("text", "").encode("utf-8")
+
+
+def load_interactions(path):
+    """Load the interactions recorded in a cassette, a JSON Lines file."""
+    interactions = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    interactions.append(json.loads(line))
+    return interactions
+
+
+class ReplayAdapter(adapters.BaseAdapter):
+    """A transport adapter recording responses to, or replaying them from,
+    a cassette file.
+
+    - "record": send requests with `adapter`, and append each interaction
+      to the cassette.
+    - "replay": serve responses from the cassette only, raising
+      InteractionNotFound for requests that weren't recorded.
+    - "once": replay recorded requests, and record the others.
+
+    Requests recorded several times are replayed in the recorded order,
+    the last one repeating. Request headers, and so the api key, are never
+    recorded.
+
+        adapter = replay.ReplayAdapter("tests/cassettes/search.jsonl")
+        client = podcast_api.Client(adapter=adapter)
+    """
+
+    MODES = ("record", "replay", "once")
+
+    def __init__(self, path, mode="replay", adapter=None):
+        """
+        Args:
+            path: the cassette file.
+            mode: "record", "replay" or "once".
+            adapter: the adapter sending requests when recording; a
+                requests.adapters.HTTPAdapter by default.
+        """
+        if mode not in self.MODES:
+            raise ValueError(
+                "mode should be one of %s, not %r"
+                % (", ".join(self.MODES), mode)
+            )
+        super(ReplayAdapter, self).__init__()
+        self.path = path
+        self.mode = mode
+        self.adapter = adapter
+        if mode != "replay" and adapter is None:
+            self.adapter = adapters.HTTPAdapter()
+        self._interactions = {}
+        self._played = {}
+        self._lock = threading.Lock()
+        for interaction in load_interactions(path):
+            self._interactions.setdefault(interaction["key"], []).append(
+                interaction
+            )
+
+    def send(self, request, **kwargs):
+        key = interaction_key(request.method, request.url, request.body)
+        if self.mode != "record":
+            with self._lock:
+                recorded = self._interactions.get(key)
+                if recorded:
+                    index = self._played.get(key, 0)
+                    self._played[key] = index + 1
+                    interaction = recorded[min(index, len(recorded) - 1)]
+            if recorded:
+                return self._build_response(request, interaction)
+            if self.mode == "replay":
+                raise InteractionNotFound(
+                    "No interaction recorded in %s for %s" % (self.path, key)
+                )
+
+        response = self.adapter.send(request, **kwargs)
+        self._record(key, response)
+        return response
+
+    def _record(self, key, response):
+        interaction = {
+            "key": key,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": dict(response.headers),
+        }
+        # Reading content here makes stream=True requests buffered
+        interaction.update(_encode_body(response.content))
+        # requests decompresses content, so the encoding no longer applies
+        for header in ("Content-Encoding", "Content-Length"):
+            interaction["headers"].pop(header, None)
+            interaction["headers"].pop(header.lower(), None)
+        line = json.dumps(interaction, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self._interactions.setdefault(key, []).append(interaction)
+
+    @staticmethod
+    def _build_response(request, interaction):
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction.get("reason")
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response._content = decode_body(interaction)
+        response._content_consumed = True
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers
+        )
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        if self.adapter is not None:
+            self.adapter.close()
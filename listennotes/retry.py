@@ -0,0 +1,92 @@
+import random
+
+from listennotes.ratelimit import retry_after_seconds
+
+
+class RetryPolicy:
+    """When and how long to wait before retrying a failed request.
+
+    Only idempotent methods are retried, on connection errors, timeouts, and
+    responses with a status code in `statuses`. The delay before retry n
+    (starting at 0) is the Retry-After header of the response if any, or a
+    random number between 0 and min(max_delay, base_delay * 2 ** n), i.e.,
+    exponential backoff with full jitter.
+    """
+
+    MAX_RETRIES = 3
+    BASE_DELAY = 0.5  # seconds
+    MAX_DELAY = 30  # seconds
+    STATUSES = (429, 500, 502, 503, 504)
+    METHODS = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(
+        self,
+        max_retries=MAX_RETRIES,
+        base_delay=BASE_DELAY,
+        max_delay=MAX_DELAY,
+        statuses=STATUSES,
+        methods=METHODS,
+        deadline=None,
+        respect_retry_after=True,
+    ):
+        """
+        Args:
+            max_retries: max retries per call.
+            base_delay: the backoff of the first retry, in seconds.
+            max_delay: max seconds to wait before a retry. A larger
+                Retry-After gives up retrying instead of waiting that long.
+            statuses: status codes to retry on.
+            methods: http methods to retry.
+            deadline: max seconds a call can take, including all retries and
+                delays; None for no limit.
+            respect_retry_after: if False, ignore the Retry-After header.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.deadline = deadline
+        self.respect_retry_after = respect_retry_after
+
+    def backoff(self, retries):
+        """Return a full-jitter exponential backoff delay, in seconds."""
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2**retries)
+        )
+
+    def next_delay(self, method, retries, elapsed, response=None):
+        """Return seconds to wait before retrying, or None to give up.
+
+        Args:
+            method: the http method of the request.
+            retries: the number of retries done so far.
+            elapsed: seconds since the call started.
+            response: the response, or None if the request raised a
+                connection error or timed out.
+        """
+        if retries >= self.max_retries or method.upper() not in self.methods:
+            return None
+        if response is not None and response.status_code not in self.statuses:
+            return None
+
+        delay = None
+        if response is not None and self.respect_retry_after:
+            delay = retry_after_seconds(response)
+            if delay is not None and delay > self.max_delay:
+                return None
+        if delay is None:
+            delay = self.backoff(retries)
+
+        if self.deadline is not None and elapsed + delay >= self.deadline:
+            return None
+        return delay
+
+    def timeout(self, timeout, elapsed):
+        """Cap the timeout of an attempt to the time left until deadline."""
+        if self.deadline is None:
+            return timeout
+        left = max(0.001, self.deadline - elapsed)
+        if isinstance(timeout, tuple):
+            return tuple(min(t, left) if t else left for t in timeout)
+        return min(timeout, left) if timeout else left
@@ -0,0 +1,204 @@
+import bisect
+import contextlib
+import contextvars
+import itertools
+import threading
+import time
+
+from listennotes import endpoints, ratelimit
+
+
+_priority = contextvars.ContextVar("listennotes_priority", default=None)
+
+INTERACTIVE = "interactive"
+DEFAULT = "default"
+BULK = "bulk"
+
+# Endpoints answering users as they type or search
+INTERACTIVE_ENDPOINTS = (
+    "/typeahead",
+    "/search",
+    "/search_episode_titles",
+    "/spellcheck",
+    "/related_searches",
+    "/trending_searches",
+)
+
+
+@contextlib.contextmanager
+def priority(name):
+    """Run the requests made in this block with the priority class `name`.
+
+        with scheduler.priority("bulk"):
+            for episode in client.iter_episodes(id=podcast_id):
+                ...
+
+    The priority follows the context, so it also applies to the threads of
+    fetch_many(), batch_fetch_all_*() and iterators started in the block.
+    """
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    """Return the priority class set by priority(), or None."""
+    return _priority.get()
+
+
+class PriorityClass:
+    """A class of requests with its own concurrency and rate budget."""
+
+    def __init__(self, name, priority, max_concurrency=None, rate=None):
+        """
+        Args:
+            name: e.g., "interactive".
+            priority: lower runs first.
+            max_concurrency: max requests of this class in flight; None for
+                no limit other than the scheduler's.
+            rate: max requests per second of this class; None for no limit.
+        """
+        self.name = name
+        self.priority = priority
+        self.max_concurrency = max_concurrency
+        self.bucket = ratelimit.TokenBucket(rate) if rate else None
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.wait_time = 0.0
+
+    def has_room(self):
+        return (
+            self.max_concurrency is None
+            or self.in_flight < self.max_concurrency
+        )
+
+    def as_dict(self):
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "wait_time": self.wait_time,
+        }
+
+
+class Scheduler:
+    """Share max_concurrency request slots between priority classes.
+
+    Each request gets a class, from priority() if set, or else from its
+    endpoint: INTERACTIVE_ENDPOINTS are "interactive", the rest "default".
+    A request waits for its class's rate budget, then for a slot. When a
+    slot frees up, it goes to the waiting request of the highest priority
+    whose class is under its max_concurrency, so queued interactive calls
+    jump ahead of bulk work.
+
+    By default, "bulk" requests can only take half of the slots, so the
+    other half stays available for interactive and default requests, even
+    during a big crawl.
+    """
+
+    def __init__(
+        self,
+        max_concurrency,
+        classes=None,
+        endpoint_priorities=None,
+        default=DEFAULT,
+    ):
+        """
+        Args:
+            max_concurrency: max requests in flight, e.g., the connection
+                pool size.
+            classes: a list of PriorityClass objects.
+            endpoint_priorities: a dict of path template => class name, see
+                endpoints.EndpointMap.
+            default: the class of other requests.
+        """
+        if classes is None:
+            classes = [
+                PriorityClass(INTERACTIVE, 0),
+                PriorityClass(DEFAULT, 1),
+                PriorityClass(BULK, 2, max(1, max_concurrency // 2)),
+            ]
+        if endpoint_priorities is None:
+            endpoint_priorities = {
+                template: INTERACTIVE for template in INTERACTIVE_ENDPOINTS
+            }
+        self.max_concurrency = max_concurrency
+        self.classes = {the_class.name: the_class for the_class in classes}
+        self.endpoint_priorities = endpoints.EndpointMap(endpoint_priorities)
+        self.default = default
+        self.in_flight = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def classify(self, url):
+        """Return the PriorityClass of a request to url."""
+        name = _priority.get() or self.endpoint_priorities.get(
+            url, self.default
+        )
+        try:
+            return self.classes[name]
+        except KeyError:
+            raise ValueError("Unknown priority class %r" % name) from None
+
+    def _runnable(self, waiter):
+        if self.in_flight >= self.max_concurrency:
+            return False
+        # Waiters are sorted by priority, then arrival
+        for other in self._waiters:
+            if other is waiter:
+                return waiter[2].has_room()
+            if other[2].has_room():
+                return False
+        return False
+
+    def acquire(self, url):
+        """Wait for a slot for a request to url; return its class."""
+        the_class = self.classify(url)
+        if the_class.bucket:
+            the_class.bucket.acquire()
+        started = time.monotonic()
+        with self._cond:
+            waiter = (the_class.priority, next(self._seq), the_class)
+            bisect.insort(self._waiters, waiter)
+            the_class.waiting += 1
+            try:
+                while not self._runnable(waiter):
+                    self._cond.wait()
+            finally:
+                self._waiters.remove(waiter)
+                the_class.waiting -= 1
+            self.in_flight += 1
+            the_class.in_flight += 1
+            the_class.wait_time += time.monotonic() - started
+            if self._waiters and self.in_flight < self.max_concurrency:
+                # Waiters queued behind this one may be able to run too
+                self._cond.notify_all()
+        return the_class
+
+    def release(self, the_class):
+        """Free the slot taken by acquire()."""
+        with self._cond:
+            self.in_flight -= 1
+            the_class.in_flight -= 1
+            the_class.completed += 1
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def slot(self, url):
+        the_class = self.acquire(url)
+        try:
+            yield the_class
+        finally:
+            self.release(the_class)
+
+    def stats(self):
+        """Return {class name: counters}, see PriorityClass.as_dict()."""
+        with self._cond:
+            return {
+                name: the_class.as_dict()
+                for name, the_class in self.classes.items()
+            }
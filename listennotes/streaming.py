@@ -0,0 +1,196 @@
+import codecs
+import json
+
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+# Characters that can follow a complete value
+_DELIMITERS = _WHITESPACE + ",:]}"
+
+
+# Yielded by the parser when it needs the next chunk
+_READ = object()
+
+
+class _ItemParser:
+    """Incremental parser of one array of a json object.
+
+    The parser is a generator yielding the items of the array, or _READ
+    when it needs more input, so the sync and asyncio streams share it and
+    only differ in how they read chunks.
+    """
+
+    def __init__(self, response, key):
+        self.response = response
+        self.key = key
+        self.fields = {}
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._items = self._parse()
+
+    def _feed(self, chunk):
+        """Append a chunk to the buffer; None at the end of the body."""
+        if chunk is None:
+            self._buffer += self._decoder.decode(b"", final=True)
+            self._eof = True
+        else:
+            self._buffer += self._decoder.decode(chunk)
+
+    def _read(self):
+        """Wait for the next chunk; return False at the end."""
+        if self._eof:
+            return False
+        # Drop what's been parsed already
+        pos = self._pos
+        if pos:
+            self._buffer = self._buffer[pos:]
+            self._pos = 0
+        yield _READ
+        return not self._eof
+
+    def _peek(self):
+        """Skip whitespace and return the next character, or "" at the
+        end."""
+        while True:
+            buffer = self._buffer
+            pos = self._pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not (yield from self._read()):
+                return ""
+
+    def _expect(self, chars):
+        char = yield from self._peek()
+        if char not in chars:
+            self._error("Expecting one of %r" % chars)
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """Decode the json value at the current position."""
+        yield from self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if (yield from self._read()):
+                    continue
+                raise
+            # A number cut by the end of the buffer, e.g., "0." or "1e",
+            # decodes to its start: read on until it's followed by a
+            # delimiter
+            buffer = self._buffer
+            if not self._eof and (
+                end == len(buffer) or buffer[end] not in _DELIMITERS
+            ):
+                yield from self._read()
+                continue
+            self._pos = end
+            return value
+
+    def _error(self, message):
+        raise json.JSONDecodeError(message, self._buffer, self._pos)
+
+    def _parse(self):
+        yield from self._expect("{")
+        if (yield from self._peek()) == "}":
+            return
+        while True:
+            name = yield from self._value()
+            if not isinstance(name, str):
+                self._error("Expecting property name")
+            yield from self._expect(":")
+            if name == self.key and (yield from self._peek()) == "[":
+                self._pos += 1
+                if (yield from self._peek()) == "]":
+                    self._pos += 1
+                else:
+                    while True:
+                        yield (yield from self._value())
+                        if (yield from self._expect(",]")) == "]":
+                            break
+            else:
+                self.fields[name] = yield from self._value()
+            if (yield from self._expect(",}")) == "}":
+                return
+
+
+class ItemStream(_ItemParser):
+    """Iterate over the items of one array of a streamed json response.
+
+    The response body is read in chunks and parsed incrementally: each item
+    of the array `key` of the top-level object is yielded as soon as it has
+    arrived, and then dropped from the buffer. Peak memory stays around one
+    chunk plus one item, whatever the size of the response.
+
+    The other top-level fields are collected in `fields`; fields after the
+    array are only there once the iteration is done.
+    """
+
+    def __init__(self, response, key, chunk_size=CHUNK_SIZE):
+        super(ItemStream, self).__init__(response, key)
+        self._chunks = response.iter_content(chunk_size=chunk_size)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            item = next(self._items)
+            if item is not _READ:
+                return item
+            self._feed(next(self._chunks, None))
+
+    def close(self):
+        """Stop reading, and release the connection."""
+        self._items.close()
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class AsyncItemStream(_ItemParser):
+    """Asyncio version of ItemStream, used with `async for`, reading a
+    streamed httpx.Response."""
+
+    def __init__(self, response, key, chunk_size=CHUNK_SIZE):
+        super(AsyncItemStream, self).__init__(response, key)
+        self._chunks = response.aiter_bytes(chunk_size=chunk_size)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            try:
+                item = next(self._items)
+            except StopIteration:
+                raise StopAsyncIteration from None
+            if item is not _READ:
+                return item
+            try:
+                chunk = await self._chunks.__anext__()
+            except StopAsyncIteration:
+                chunk = None
+            self._feed(chunk)
+
+    async def aclose(self):
+        """Stop reading, and release the connection."""
+        self._items.close()
+        await self.response.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
@@ -0,0 +1,295 @@
+"""A local stand-in for Listen API, to test and benchmark clients offline.
+
+Usage:
+    python -m listennotes.stub_server [--port 8000] [--latency 0.05] ...
+
+Then point a client to it:
+
+    client = podcast_api.Client()
+    client.api_base = "http://127.0.0.1:8000/api/v2"
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from listennotes import endpoints, replay
+
+
+def _episode(episode_id, podcast_id="0" * 32):
+    return {
+        "id": episode_id,
+        "title": "Episode %s" % episode_id,
+        "description": "<p>Show notes %s</p>" % ("x" * 500),
+        "pub_date_ms": 1479110402000,
+        "audio": "https://www.listennotes.com/e/p/%s/" % episode_id,
+        "audio_length_sec": 3600,
+        "explicit_content": False,
+        "maybe_audio_invalid": False,
+        "podcast": {"id": podcast_id, "title": "Podcast %s" % podcast_id},
+    }
+
+
+def _podcast(podcast_id, episodes=10):
+    return {
+        "id": podcast_id,
+        "title": "Podcast %s" % podcast_id,
+        "description": "x" * 1000,
+        "genre_ids": [86, 160],
+        "total_episodes": episodes,
+        "latest_pub_date_ms": 1479110402000,
+        "next_episode_pub_date": 1479110402000 - episodes * 86400000,
+        "episodes": [
+            _episode("%s-%s" % (podcast_id, i), podcast_id)
+            for i in range(episodes)
+        ],
+    }
+
+
+def synthetic_payload(method, path, params, form):
+    """Return a (status, payload) made-up response for any endpoint."""
+    endpoint = endpoints.endpoint_name(path)
+    the_id = path.rstrip("/").rsplit("/", 1)[-1]
+    ids = [i for i in form.get("ids", [""])[0].split(",") if i]
+    if endpoint == "/podcasts/{id}":
+        return 200, _podcast(the_id)
+    if endpoint == "/episodes/{id}":
+        return 200, _episode(the_id)
+    if endpoint == "/podcasts" and method == "POST":
+        return 200, {"podcasts": [_podcast(i, episodes=0) for i in ids]}
+    if endpoint == "/episodes" and method == "POST":
+        return 200, {"episodes": [_episode(i) for i in ids]}
+    if endpoint in ("/search", "/search_episode_titles"):
+        offset = int(params.get("offset", ["0"])[0])
+        return 200, {
+            "count": 10,
+            "total": 100,
+            "next_offset": offset + 10,
+            "results": [_episode(str(offset + i)) for i in range(10)],
+        }
+    if endpoint == "/typeahead":
+        q = params.get("q", [""])[0]
+        return 200, {
+            "terms": [q, q + " podcast"],
+            "genres": [],
+            "podcasts": [],
+        }
+    if endpoint == "/best_podcasts":
+        page = int(params.get("page", ["1"])[0])
+        return 200, {
+            "page_number": page,
+            "has_next": page < 5,
+            "next_page_number": page + 1,
+            "podcasts": [_podcast("%s-%s" % (page, i), 0) for i in range(20)],
+        }
+    if endpoint == "/genres":
+        return 200, {
+            "genres": [
+                {"id": 67, "name": "Podcasts", "parent_id": None},
+                {"id": 93, "name": "Business", "parent_id": 67},
+            ]
+        }
+    return 404, {"error": "Not found"}
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default of 5 drops connections when many clients connect at once
+    request_queue_size = 128
+
+
+class StubServer:
+    """Serve recorded or made-up Listen API responses on localhost.
+
+    Requests recorded in the cassette (see replay.ReplayAdapter) are
+    replayed; others get a synthetic_payload(). Each request waits
+    `latency` seconds, plus up to `jitter`, then fails with a 429 with
+    probability rate_limit_rate, or with a 500 with probability error_rate.
+
+        with stub_server.StubServer(latency=0.05) as server:
+            client = podcast_api.Client()
+            client.api_base = server.api_base
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        cassette=None,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        retry_after=1,
+        free_quota=10000,
+        seed=None,
+    ):
+        """
+        Args:
+            host, port: the address to listen on; port 0 picks a free port.
+            cassette: a cassette file recorded by replay.ReplayAdapter.
+            latency: seconds to wait before responding.
+            jitter: max random seconds added to latency.
+            error_rate: fraction of requests failing with 500.
+            rate_limit_rate: fraction of requests failing with 429.
+            retry_after: the Retry-After header of 429 responses.
+            free_quota: the X-ListenAPI-FreeQuota header of responses.
+            seed: a seed of the random generator, for repeatable runs.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.free_quota = free_quota
+        self.requests = 0
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_billing_date = (
+            datetime.now(timezone.utc) + timedelta(days=30)
+        ).isoformat()
+        self._recorded = {}
+        for interaction in replay.load_interactions(cassette or ""):
+            self._recorded.setdefault(interaction["key"], interaction)
+
+        self.httpd = _HTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def api_base(self):
+        host, port = self.httpd.server_address[:2]
+        return "http://%s:%s/api/v2" % (host, port)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, which would otherwise
+            # wait for delayed ACKs
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server.handle(self, "GET")
+
+            def do_POST(self):
+                server.handle(self, "POST")
+
+            def do_DELETE(self):
+                server.handle(self, "DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _roll(self):
+        with self._lock:
+            self.requests += 1
+            usage = self.requests
+            roll = self.random.random()
+            delay = self.latency + self.random.uniform(0, self.jitter)
+        return usage, roll, delay
+
+    def handle(self, handler, method):
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        usage, roll, delay = self._roll()
+        if delay:
+            time.sleep(delay)
+
+        headers = {
+            "Content-Type": "application/json",
+            "X-ListenAPI-FreeQuota": str(self.free_quota),
+            "X-ListenAPI-Usage": str(usage),
+            "X-ListenAPI-NextBillingDate": self._next_billing_date,
+        }
+        if roll < self.rate_limit_rate:
+            status = 429
+            headers["Retry-After"] = str(self.retry_after)
+            content = b'{"error": "Too many requests"}'
+        elif roll < self.rate_limit_rate + self.error_rate:
+            status = 500
+            content = b'{"error": "Internal server error"}'
+        else:
+            key = replay.interaction_key(method, handler.path, body)
+            interaction = self._recorded.get(key)
+            if interaction:
+                status = interaction["status"]
+                content = replay.decode_body(interaction)
+            else:
+                parsed = urlparse(handler.path)
+                status, payload = synthetic_payload(
+                    method,
+                    parsed.path,
+                    parse_qs(parsed.query),
+                    parse_qs(body.decode("utf-8", "replace")),
+                )
+                content = json.dumps(payload).encode("utf-8")
+
+        handler.send_response(status)
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def start(self):
+        """Serve requests in a background thread."""
+        self._thread = threading.Thread(
+            target=self.httpd.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--cassette", help="a recorded cassette to replay")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    server = StubServer(
+        host=args.host,
+        port=args.port,
+        cassette=args.cassette,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+    print("Serving Listen API stubs at %s" % server.api_base)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import collections
+import os
+import sqlite3
+import threading
+import time
+
+from listennotes import concurrency, pagination, podcast_api
+
+# Per-podcast sync state: the latest_pub_date_ms reported by Listen API,
+# and the pub_date_ms of the newest episode synced
+Watermark = collections.namedtuple(
+    "Watermark", ["latest_pub_date_ms", "episode_pub_date_ms"]
+)
+
+# Outcome of syncing one podcast: the podcast as returned by
+# batch_fetch_podcasts, its new episodes, newest first, and the error that
+# stopped the sync, if any
+SyncResult = collections.namedtuple(
+    "SyncResult", ["podcast_id", "podcast", "episodes", "error"]
+)
+
+# Podcasts checked per round of batch_fetch_podcasts requests
+CHECK_SIZE = 500
+
+# Podcast ids per SQLite query, which caps the number of parameters of a
+# statement
+QUERY_SIZE = 500
+
+
+class MemoryWatermarkStore:
+    """Thread-safe in-process watermark storage, for tests and one-off runs.
+
+    A watermark store has get_many(podcast_ids), returning a dict of
+    podcast id => Watermark, set(podcast_id, watermark) and
+    delete(podcast_id) methods.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, podcast_ids):
+        with self._lock:
+            return {
+                the_id: self._data[the_id]
+                for the_id in podcast_ids
+                if the_id in self._data
+            }
+
+    def set(self, podcast_id, watermark):
+        with self._lock:
+            self._data[podcast_id] = watermark
+
+    def delete(self, podcast_id):
+        with self._lock:
+            self._data.pop(podcast_id, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteWatermarkStore:
+    """Watermark storage in a SQLite database file.
+
+    Like cache.SQLiteBackend, each thread of each process gets its own
+    connection, and the database runs in WAL mode.
+    """
+
+    def __init__(self, path, timeout=30):
+        """
+        Args:
+            path: the database file path.
+            timeout: seconds to wait for a lock held by another connection.
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                " podcast_id TEXT PRIMARY KEY,"
+                " latest_pub_date_ms INTEGER,"
+                " episode_pub_date_ms INTEGER,"
+                " synced_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get_many(self, podcast_ids):
+        podcast_ids = list(podcast_ids)
+        result = {}
+        connection = self._connect()
+        for start in range(0, len(podcast_ids), QUERY_SIZE):
+            end = start + QUERY_SIZE
+            chunk = podcast_ids[start:end]
+            rows = connection.execute(
+                "SELECT podcast_id, latest_pub_date_ms, episode_pub_date_ms"
+                " FROM watermarks WHERE podcast_id IN (%s)"
+                % ",".join("?" * len(chunk)),
+                chunk,
+            )
+            for podcast_id, latest, episode in rows:
+                result[podcast_id] = Watermark(latest, episode)
+        return result
+
+    def set(self, podcast_id, watermark):
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO watermarks (podcast_id,"
+                " latest_pub_date_ms, episode_pub_date_ms, synced_at)"
+                " VALUES (?, ?, ?, ?)",
+                (podcast_id,) + tuple(watermark) + (time.time(),),
+            )
+
+    def delete(self, podcast_id):
+        with self._connect() as connection:
+            connection.execute(
+                "DELETE FROM watermarks WHERE podcast_id = ?", (podcast_id,)
+            )
+
+    def __len__(self):
+        return (
+            self._connect()
+            .execute("SELECT COUNT(*) FROM watermarks")
+            .fetchone()[0]
+        )
+
+
+class EpisodeSync:
+    """Fetch only the episodes published since the last sync of podcasts.
+
+    sync() first checks the latest_pub_date_ms of podcasts with
+    batch_fetch_podcasts, 10 podcasts per request. Only podcasts whose
+    value moved past their watermark are fetched with fetch_podcast_by_id,
+    newest episodes first, following next_episode_pub_date until an episode
+    already synced shows up.
+
+        sync = EpisodeSync(client, SQLiteWatermarkStore("watermarks.db"))
+        for result in sync.sync(podcast_ids):
+            if result.error is None:
+                save(result.podcast, result.episodes)
+
+    A podcast's watermark is advanced when the consumer asks for the next
+    result, so if the process dies while saving a result, that podcast is
+    synced again on the next run. Episodes published with a pub date older
+    than the watermark are not picked up.
+    """
+
+    def __init__(
+        self, client, store=None, since_ms=None, max_workers=None, **kwargs
+    ):
+        """
+        Args:
+            client: a podcast_api.Client.
+            store: a watermark store, a MemoryWatermarkStore by default.
+            since_ms: on the first sync of a podcast, skip episodes
+                published before this timestamp; None to fetch them all.
+            max_workers: max requests in flight, the client's by default.
+            kwargs: extra parameters passed to fetch_podcast_by_id.
+        """
+        if isinstance(client, podcast_api.AsyncClient):
+            raise TypeError(
+                "EpisodeSync needs a podcast_api.Client, not an AsyncClient"
+            )
+        self.client = client
+        self.store = store if store is not None else MemoryWatermarkStore()
+        self.since_ms = since_ms
+        self.max_workers = max_workers or client.max_workers
+        self.params = dict(kwargs, sort="recent_first")
+        self.checked = 0
+        self.changed = 0
+        self.missing = 0
+        self.episodes = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _count(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def sync(self, podcast_ids, check_size=CHECK_SIZE):
+        """Sync podcasts; yield a SyncResult per changed podcast.
+
+        Podcasts are handled check_size at a time, so podcast_ids can be a
+        lazy iterable of any length.
+        """
+        chunk = []
+        for the_id in podcast_ids:
+            chunk.append(str(the_id))
+            if len(chunk) >= check_size:
+                yield from self._sync_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from self._sync_chunk(chunk)
+
+    def check(self, podcast_ids):
+        """Return a list of (podcast, watermark) of changed podcasts.
+
+        watermark is None for podcasts never synced. Podcasts unknown to
+        Listen API are left out.
+        """
+        podcast_ids = list(dict.fromkeys(str(i) for i in podcast_ids))
+        podcasts = self.client.batch_fetch_all_podcasts(
+            podcast_ids, max_workers=self.max_workers
+        )
+        watermarks = self.store.get_many(podcast_ids)
+        changed = []
+        for podcast in podcasts:
+            watermark = watermarks.get(podcast["id"])
+            latest = podcast.get("latest_pub_date_ms") or 0
+            if (
+                watermark is None
+                or (watermark.latest_pub_date_ms or 0) < latest
+            ):
+                changed.append((podcast, watermark))
+        self._count(
+            checked=len(podcast_ids),
+            changed=len(changed),
+            missing=len(podcast_ids) - len(podcasts),
+        )
+        return changed
+
+    def _sync_chunk(self, podcast_ids):
+        for (podcast, watermark), episodes, error in concurrency.bounded_map(
+            self._fetch_new_episodes, self.check(podcast_ids), self.max_workers
+        ):
+            if error is not None:
+                yield SyncResult(podcast["id"], podcast, [], error)
+                continue
+            self._count(episodes=len(episodes))
+            yield SyncResult(podcast["id"], podcast, episodes, None)
+            # Only advanced once the consumer is done with the result
+            newest = self._stop_at(watermark)
+            if episodes:
+                newest = max(newest, episodes[0]["pub_date_ms"])
+            self.store.set(
+                podcast["id"],
+                Watermark(podcast.get("latest_pub_date_ms"), newest),
+            )
+
+    def _stop_at(self, watermark):
+        """Return the pub date of the newest episode already synced."""
+        if watermark is None:
+            return self.since_ms or 0
+        return watermark.episode_pub_date_ms or 0
+
+    def _fetch_new_episodes(self, podcast_and_watermark):
+        podcast, watermark = podcast_and_watermark
+        stop_at = self._stop_at(watermark)
+        episodes = []
+        params = dict(self.params, id=podcast["id"])
+        while True:
+            self._count(requests=1)
+            data = self.client.fetch_podcast_by_id(**params).json()
+            for episode in data.get("episodes", []):
+                if episode["pub_date_ms"] <= stop_at:
+                    return episodes
+                episodes.append(episode)
+            next_params = pagination.next_episode_pub_date(data)
+            if not next_params:
+                return episodes
+            params.update(next_params)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "changed": self.changed,
+                "missing": self.missing,
+                "episodes": self.episodes,
+                "requests": self.requests,
+            }
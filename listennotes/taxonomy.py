@@ -0,0 +1,280 @@
+"""Genres, regions and languages of Listen API, indexed for local lookups.
+
+Usage:
+    python -m listennotes.taxonomy --api-key KEY --output taxonomy.json.gz
+
+saves a snapshot of the taxonomy, to load at startup with no API call:
+
+    taxonomy = taxonomy.Taxonomy.load("taxonomy.json.gz")
+"""
+
+import argparse
+import collections
+import gzip
+import json
+import os
+
+from listennotes import podcast_api
+
+FORMAT_VERSION = 1
+# Top-level genres, regions and languages as published in the API docs.
+# Refresh it with main() to get sub-genres too.
+SNAPSHOT = os.path.join(os.path.dirname(__file__), "data", "taxonomy.json.gz")
+
+Genre = collections.namedtuple("Genre", ("id", "name", "parent_id"))
+
+
+def _normalize(name):
+    return " ".join(name.lower().replace("&", " & ").split())
+
+
+class Taxonomy:
+    """An index of genres, regions and languages.
+
+    Genres are looked up by id in O(1), and their path from the root genre
+    is computed once, when the taxonomy is built, so ancestors() and
+    is_descendant() don't walk the tree.
+
+        taxonomy = Taxonomy.load()  # the bundled snapshot
+        taxonomy = Taxonomy.from_api(client)
+        [genre.name for genre in taxonomy.path(144)]
+        # => ["Podcasts", "Personal Finance"]
+    """
+
+    def __init__(self, genres=(), regions=None, languages=()):
+        """
+        Args:
+            genres: Genre tuples, or genre dicts of fetch_podcast_genres().
+            regions: a dict of region code => name, as returned by
+                fetch_podcast_regions().
+            languages: a list of language names, as returned by
+                fetch_podcast_languages().
+        """
+        self.genres = {}
+        for genre in genres:
+            if isinstance(genre, dict):
+                genre = Genre(genre["id"], genre["name"], genre["parent_id"])
+            self.genres[genre.id] = genre
+        self.regions = dict(regions or {})
+        self.languages = tuple(languages)
+
+        children = collections.defaultdict(list)
+        for genre in self.genres.values():
+            if genre.parent_id in self.genres:
+                children[genre.parent_id].append(genre.id)
+        self._children = {
+            parent_id: tuple(sorted(ids, key=lambda i: self.genres[i].name))
+            for parent_id, ids in children.items()
+        }
+        self._paths = {}
+        for genre_id in self.genres:
+            self._path_ids(genre_id)
+        self._names = collections.defaultdict(list)
+        for genre in self.genres.values():
+            self._names[_normalize(genre.name)].append(genre.id)
+        self._region_codes = {
+            name.lower(): code for code, name in self.regions.items()
+        }
+        self._language_names = {name.lower(): name for name in self.languages}
+
+    def _path_ids(self, genre_id):
+        path = self._paths.get(genre_id)
+        if path is not None:
+            return path
+        # Walk up to a genre whose path is known, without recursion
+        chain = []
+        seen = set()
+        the_id = genre_id
+        while the_id in self.genres and the_id not in self._paths:
+            if the_id in seen:
+                raise ValueError("Genre %s is its own ancestor" % the_id)
+            seen.add(the_id)
+            chain.append(the_id)
+            the_id = self.genres[the_id].parent_id
+        path = self._paths.get(the_id, ())
+        for the_id in reversed(chain):
+            path = path + (the_id,)
+            self._paths[the_id] = path
+        return path
+
+    #
+    # Loading and saving
+    #
+    @classmethod
+    def from_api(cls, client):
+        """Build a taxonomy with 3 requests of a podcast_api.Client."""
+        return cls(
+            client.fetch_podcast_genres().json()["genres"],
+            client.fetch_podcast_regions().json()["regions"],
+            client.fetch_podcast_languages().json()["languages"],
+        )
+
+    @classmethod
+    async def afrom_api(cls, client):
+        """Asyncio version of from_api(), for a podcast_api.AsyncClient."""
+        genres = await client.fetch_podcast_genres()
+        regions = await client.fetch_podcast_regions()
+        languages = await client.fetch_podcast_languages()
+        return cls(
+            genres.json()["genres"],
+            regions.json()["regions"],
+            languages.json()["languages"],
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(
+                "Unsupported taxonomy format %r" % data.get("version")
+            )
+        return cls(
+            [Genre(*row) for row in data["genres"]],
+            data["regions"],
+            data["languages"],
+        )
+
+    def to_dict(self):
+        """Return a json-compatible dict; genres are [id, name, parent_id]
+        rows."""
+        return {
+            "version": FORMAT_VERSION,
+            "genres": [list(genre) for genre in self.genres.values()],
+            "regions": self.regions,
+            "languages": list(self.languages),
+        }
+
+    @classmethod
+    def load(cls, path=SNAPSHOT):
+        """Load a taxonomy saved by save(); by default, the bundled one."""
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path):
+        """Write the taxonomy to path as gzipped json."""
+        tmp_path = "%s.tmp" % path
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(
+                self.to_dict(), f, separators=(",", ":"), ensure_ascii=False
+            )
+        os.replace(tmp_path, path)
+
+    #
+    # Genres
+    #
+    def genre(self, genre_id):
+        """Return the Genre of genre_id; raise KeyError if unknown."""
+        return self.genres[int(genre_id)]
+
+    def get(self, genre_id, default=None):
+        return self.genres.get(int(genre_id), default)
+
+    def __contains__(self, genre_id):
+        return int(genre_id) in self.genres
+
+    def __len__(self):
+        return len(self.genres)
+
+    def parent(self, genre_id):
+        """Return the parent Genre of genre_id, or None for a root."""
+        return self.genres.get(self.genre(genre_id).parent_id)
+
+    def children(self, genre_id):
+        """Return the child Genres of genre_id, sorted by name."""
+        return [self.genres[i] for i in self._children.get(int(genre_id), ())]
+
+    def roots(self):
+        """Return the Genres without a (known) parent."""
+        return [
+            genre
+            for genre in self.genres.values()
+            if genre.parent_id not in self.genres
+        ]
+
+    def path(self, genre_id):
+        """Return the Genres from the root down to genre_id."""
+        return [self.genres[i] for i in self._paths[int(genre_id)]]
+
+    def ancestors(self, genre_id):
+        """Return the ancestor Genres of genre_id, parent first."""
+        return self.path(genre_id)[-2::-1]
+
+    def descendants(self, genre_id):
+        """Return all Genres under genre_id, breadth first."""
+        result = []
+        queue = collections.deque(self._children.get(int(genre_id), ()))
+        while queue:
+            the_id = queue.popleft()
+            result.append(self.genres[the_id])
+            queue.extend(self._children.get(the_id, ()))
+        return result
+
+    def is_descendant(self, genre_id, ancestor_id):
+        """True if genre_id is ancestor_id or one of its descendants."""
+        path = self._paths.get(int(genre_id), ())
+        return int(ancestor_id) in path
+
+    def search(self, query, limit=None):
+        """Return Genres whose name has words starting with the words of
+        query, e.g., "fin" finds "Personal Finance". Exact matches come
+        first, then names starting with query, then by name."""
+        query = _normalize(query)
+        if not query:
+            return []
+        exact = self._names.get(query, [])
+        words = query.split()
+        matches = []
+        for genre in self.genres.values():
+            if genre.id in exact:
+                continue
+            name_words = _normalize(genre.name).split()
+            if all(
+                any(word.startswith(q) for word in name_words) for q in words
+            ):
+                rank = 0 if _normalize(genre.name).startswith(query) else 1
+                matches.append((rank, genre.name, genre))
+        matches.sort(key=lambda match: match[:2])
+        result = [self.genres[i] for i in exact]
+        result.extend(genre for _, _, genre in matches)
+        return result[:limit] if limit else result
+
+    #
+    # Regions and languages
+    #
+    def region_name(self, code):
+        """Return the name of a region code, e.g., "us"; None if unknown."""
+        return self.regions.get(code.lower())
+
+    def region_code(self, name):
+        """Return the code of a region name, case-insensitive, or None."""
+        return self._region_codes.get(name.lower())
+
+    def language(self, name):
+        """Return the language as spelled by Listen API, or None."""
+        return self._language_names.get(name.lower())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Save a snapshot of Listen API genres, regions and "
+        "languages"
+    )
+    parser.add_argument("--api-key", help="None to use the mock server")
+    parser.add_argument("--output", default=SNAPSHOT)
+    args = parser.parse_args(argv)
+
+    client = podcast_api.Client(api_key=args.api_key)
+    taxonomy = Taxonomy.from_api(client)
+    taxonomy.save(args.output)
+    print(
+        "Saved %s genres, %s regions and %s languages to %s"
+        % (
+            len(taxonomy),
+            len(taxonomy.regions),
+            len(taxonomy.languages),
+            args.output,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
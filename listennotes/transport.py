@@ -0,0 +1,149 @@
+"""The parts of the sync client built on requests and urllib3.
+
+Importing requests takes longer than the rest of the library, so this
+module is only imported once a http_utils.Request needs its session, or a
+response is built from a batch or cached response.
+"""
+import json
+import socket
+
+import requests
+from requests import adapters
+from urllib3 import poolmanager
+from urllib3.connection import HTTPConnection
+
+from listennotes import http_utils
+
+
+def keepalive_socket_options(idle=60, interval=10, count=6):
+    """Socket options turning on TCP keep-alive probes.
+
+    Idle pooled connections are probed every `interval` seconds after `idle`
+    seconds without traffic, so NATs and load balancers don't silently drop
+    them. Options the platform doesn't support are skipped.
+    """
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (
+        ("TCP_KEEPIDLE", idle),
+        ("TCP_KEEPALIVE", idle),  # macOS name of TCP_KEEPIDLE
+        ("TCP_KEEPINTVL", interval),
+        ("TCP_KEEPCNT", count),
+    ):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class _CountingPoolManager(poolmanager.PoolManager):
+    def __init__(self, *args, stats=None, **kwargs):
+        super(_CountingPoolManager, self).__init__(*args, **kwargs)
+        self.stats = stats
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(_CountingPoolManager, self)._new_pool(
+            scheme, host, port, request_context=request_context
+        )
+        stats = self.stats
+        new_conn = pool._new_conn
+        put_conn = pool._put_conn
+
+        def counting_new_conn():
+            stats.incr("new_connections")
+            return new_conn()
+
+        def counting_put_conn(conn):
+            if pool.pool is not None and pool.pool.full():
+                stats.incr("discarded_connections")
+            return put_conn(conn)
+
+        pool._new_conn = counting_new_conn
+        pool._put_conn = counting_put_conn
+        return pool
+
+
+class PoolingHTTPAdapter(adapters.HTTPAdapter):
+    """HTTPAdapter with TCP keep-alive and connection pool statistics."""
+
+    __attrs__ = adapters.HTTPAdapter.__attrs__ + ["tcp_keepalive"]
+
+    def __init__(self, tcp_keepalive=False, **kwargs):
+        """
+        Args:
+            tcp_keepalive: if True, turn on TCP keep-alive probes.
+            kwargs: HTTPAdapter args, i.e., pool_connections, pool_maxsize,
+                max_retries and pool_block.
+        """
+        self.stats = http_utils.PoolStats()
+        self.tcp_keepalive = tcp_keepalive
+        super(PoolingHTTPAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **kwargs):
+        if self.tcp_keepalive:
+            kwargs["socket_options"] = keepalive_socket_options()
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _CountingPoolManager(
+            num_pools=connections,
+            maxsize=maxsize,
+            block=block,
+            stats=self.stats,
+            **kwargs
+        )
+
+    def send(self, request, **kwargs):
+        self.stats.incr("requests")
+        return super(PoolingHTTPAdapter, self).send(request, **kwargs)
+
+    def __setstate__(self, state):
+        # Counters aren't pickled
+        self.stats = http_utils.PoolStats()
+        super(PoolingHTTPAdapter, self).__setstate__(state)
+
+
+class CoalescedResponse(requests.Response):
+    """The part of a batch response about a single podcast or episode.
+
+    Looks like the response of the single-item endpoint, except the item
+    has the fields returned by the batch endpoint. json() returns the item
+    as decoded from the batch response; content is encoded on demand.
+    Also used by typeahead.PrefixCache for responses derived from another.
+    """
+
+    def __init__(self, batch_response, url, item):
+        super(CoalescedResponse, self).__init__()
+        self.status_code = batch_response.status_code
+        # httpx names it reason_phrase
+        self.reason = getattr(batch_response, "reason", None) or getattr(
+            batch_response, "reason_phrase", None
+        )
+        self.headers = batch_response.headers
+        self.encoding = "utf-8"
+        self.elapsed = batch_response.elapsed
+        self.request = batch_response.request
+        self.url = url
+        self.retries = getattr(batch_response, "retries", 0)
+        self.batch_response = batch_response
+        self.item = item
+        self._content_consumed = True
+
+    @property
+    def content(self):
+        if self._content is False:
+            self._content = json.dumps(self.item).encode("utf-8")
+        return self._content
+
+    def json(self, **kwargs):
+        return self.item
+
+
+def cached_response(status_code, url, headers, content):
+    """Build a requests.Response from stored fields."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = url
+    response.headers = requests.structures.CaseInsensitiveDict(headers)
+    response._content = content
+    response.encoding = "utf-8"
+    return response
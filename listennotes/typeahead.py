@@ -0,0 +1,263 @@
+import collections
+import threading
+import time
+
+
+# Parameters of typeahead, besides q, that change its results
+OPTIONS = ("show_podcasts", "show_genres", "safe_mode")
+LISTS = ("terms", "genres", "podcasts")
+DEFAULT_TTL = 600  # seconds
+DEFAULT_MAXSIZE = 4096
+
+
+def normalize_prefix(q):
+    """Lowercase q and collapse whitespace, as typeahead ignores both."""
+    return " ".join(str(q).lower().split())
+
+
+def _options(params):
+    return tuple(str(params.get(option, 0)) for option in OPTIONS)
+
+
+def _matches(text, prefix):
+    """True if a word of text starts with prefix, e.g., "war" in "Star
+    Wars", and the words of prefix follow in text."""
+    return (" " + normalize_prefix(text)).find(" " + prefix) >= 0
+
+
+def _narrow(data, prefix):
+    return {
+        "terms": [t for t in data.get("terms", []) if _matches(t, prefix)],
+        "genres": [
+            g for g in data.get("genres", []) if _matches(g["name"], prefix)
+        ],
+        "podcasts": [
+            p
+            for p in data.get("podcasts", [])
+            if _matches(p.get("title_original", ""), prefix)
+            or _matches(p.get("publisher_original", ""), prefix)
+        ],
+    }
+
+
+class _Node:
+    __slots__ = ("parent", "char", "children", "entry")
+
+    def __init__(self, parent=None, char=None):
+        self.parent = parent
+        self.char = char
+        self.children = {}
+        self.entry = None
+
+
+class PrefixCache:
+    """An LRU cache of typeahead responses, in one trie per set of options.
+
+    Keys are (prefix, show_podcasts, show_genres, safe_mode). Besides exact
+    hits, a prefix is answered locally from a cached shorter prefix when
+    the results provably suffice: if "pod" had no results at all, neither
+    has "podc".
+
+    With `limits`, the max number of items typeahead returns per list
+    (e.g., {"terms": 8, "genres": 5, "podcasts": 5}), a shorter prefix
+    whose lists all came back below their limits is complete, and a longer
+    prefix is answered by filtering it, assuming typeahead matches word
+    prefixes. Leave it None if that assumption doesn't hold for you.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, ttl=DEFAULT_TTL, limits=None):
+        """
+        Args:
+            maxsize: max number of cached prefixes.
+            ttl: seconds a response stays fresh.
+            limits: a dict of list name => max items, see above.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.limits = limits
+        self.hits = 0
+        self.derived = 0
+        self.misses = 0
+        self._roots = {}
+        self._lru = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def accepts(params):
+        """True if typeahead params can be served from the cache."""
+        return params.get("q") is not None and set(params) <= set(
+            ("q",) + OPTIONS
+        )
+
+    def _walk(self, options, prefix, create=False):
+        """Yield the nodes along prefix, from the root."""
+        node = self._roots.get(options)
+        if node is None:
+            if not create:
+                return
+            node = self._roots[options] = _Node()
+        yield node
+        for char in prefix:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return
+                child = node.children[char] = _Node(node, char)
+            node = child
+            yield node
+
+    def get(self, params):
+        """Return a cached or derived response to typeahead(**params), or
+        None."""
+        options = _options(params)
+        prefix = normalize_prefix(params["q"])
+        now = time.monotonic()
+        with self._lock:
+            best = None
+            depth = -1
+            for node in self._walk(options, prefix):
+                depth += 1
+                entry = node.entry
+                if entry is None:
+                    continue
+                if entry.expires_at <= now:
+                    self._remove((options, prefix[:depth]))
+                    continue
+                if depth == len(prefix):
+                    self._lru.move_to_end((options, prefix))
+                    self.hits += 1
+                    return entry.response
+                if entry.empty or entry.complete:
+                    best = entry
+            if best is None:
+                self.misses += 1
+                return None
+            self.derived += 1
+        data = _narrow(best.response.json(), prefix)
+        from listennotes import transport
+
+        return transport.CoalescedResponse(
+            best.response, str(best.response.url), data
+        )
+
+    def put(self, params, response):
+        """Cache the response to typeahead(**params)."""
+        data = response.json()
+        options = _options(params)
+        prefix = normalize_prefix(params["q"])
+        entry = _Entry(
+            response,
+            time.monotonic() + self.ttl,
+            empty=not any(data.get(key) for key in LISTS),
+            complete=self.limits is not None
+            and all(
+                len(data.get(key) or []) < limit
+                for key, limit in self.limits.items()
+            ),
+        )
+        with self._lock:
+            *_, node = self._walk(options, prefix, create=True)
+            node.entry = entry
+            self._lru[(options, prefix)] = node
+            self._lru.move_to_end((options, prefix))
+            while len(self._lru) > self.maxsize:
+                self._remove(next(iter(self._lru)))
+
+    def _remove(self, key):
+        node = self._lru.pop(key)
+        node.entry = None
+        # Prune the branch if no other prefix goes through it
+        while node.parent and not node.children and node.entry is None:
+            del node.parent.children[node.char]
+            node = node.parent
+
+    def stats(self):
+        return {
+            "size": len(self._lru),
+            "hits": self.hits,
+            "derived": self.derived,
+            "misses": self.misses,
+        }
+
+
+class _Entry:
+    __slots__ = ("response", "expires_at", "empty", "complete")
+
+    def __init__(self, response, expires_at, empty, complete):
+        self.response = response
+        self.expires_at = expires_at
+        self.empty = empty
+        self.complete = complete
+
+
+class TypeaheadSession:
+    """Debounce the typeahead calls of one search box.
+
+    Call query() on every keystroke. It waits `debounce` seconds, and only
+    sends the request if no newer query came in meanwhile; superseded
+    queries return None. Cached prefixes are returned right away. On
+    AsyncClient, use aquery(), which also cancels a superseded request
+    still in flight.
+
+        session = typeahead.TypeaheadSession(client)
+        response = session.query(q="podc", show_podcasts=1)
+        if response is not None:
+            render(response.json())
+    """
+
+    DEBOUNCE = 0.05  # seconds
+
+    def __init__(self, client, debounce=DEBOUNCE):
+        self.client = client
+        self.debounce = debounce
+        self._seq = 0
+        self._task = None
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            self._seq += 1
+            return self._seq
+
+    def _cached(self, kwargs):
+        cache = self.client.typeahead_cache
+        if cache is not None and cache.accepts(kwargs):
+            return cache.get(kwargs)
+        return None
+
+    def query(self, **kwargs):
+        """Return the typeahead response of q, or None if superseded."""
+        seq = self._next()
+        response = self._cached(kwargs)
+        if response is not None:
+            return response
+        time.sleep(self.debounce)
+        if seq != self._seq:
+            return None
+        response = self.client.typeahead(**kwargs)
+        # A superseded response is still cached, but not shown
+        return response if seq == self._seq else None
+
+    async def aquery(self, **kwargs):
+        """Asyncio version of query()."""
+        import asyncio
+
+        self._next()
+        response = self._cached(kwargs)
+        if response is not None:
+            return response
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        task = self._task = asyncio.ensure_future(self._aquery(kwargs))
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if task is not self._task:
+                return None
+            raise
+
+    async def _aquery(self, kwargs):
+        import asyncio
+
+        await asyncio.sleep(self.debounce)
+        return await self.client.typeahead(**kwargs)
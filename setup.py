@@ -29,11 +29,18 @@ setup(
     license="MIT",
     keywords="listen notes podcast api",
     packages=["listennotes", "examples"],
+    package_data={"listennotes": ["data/*.json.gz"]},
     zip_safe=False,
     install_requires=[
         'requests >= 2.20; python_version >= "3.0"',
         "setuptools>=41.0.1",
     ],
+    extras_require={
+        "async": ["httpx >= 0.23"],
+        "orjson": ["orjson >= 3.0"],
+        "msgspec": ["msgspec >= 0.16"],
+        "parquet": ["pyarrow >= 10"],
+    },
     python_requires=">=3.10",
     project_urls={
         "Bug Tracker": (
@@ -0,0 +1,229 @@
+import asyncio
+import json
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+import pytest
+
+from listennotes import cache as cache_module
+from listennotes import errors, http_utils, metrics, podcast_api, retry
+
+
+def _make_client(handler, **kwargs):
+    client = podcast_api.AsyncClient()
+    client.http_client = http_utils.AsyncRequest(
+        transport=httpx.MockTransport(handler), **kwargs
+    )
+    return client
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+class TestAsyncClient(object):
+    def test_async_client_mirrors_client_endpoints(self):
+        client = podcast_api.AsyncClient()
+        for name in dir(podcast_api.Client):
+            if not name.startswith("_"):
+                assert hasattr(client, name)
+        _run(client.aclose())
+
+    @pytest.mark.parametrize(
+        "option",
+        [
+            {"cache": True},
+            {"cache": cache_module.ResponseCache()},
+            {"coalesce": True},
+            {"scheduler": True},
+            {"pool_connections": 4},
+            {"pool_block": True},
+            {"tcp_keepalive": True},
+            {"adapter": object()},
+        ],
+    )
+    def test_unsupported_options(self, option):
+        with pytest.raises(TypeError) as e:
+            podcast_api.AsyncClient(**option)
+        assert list(option)[0] in str(e.value)
+
+    def test_pool_maxsize(self):
+        client = podcast_api.AsyncClient(max_connections=8, pool_maxsize=4)
+        assert client.max_workers == 4
+        _run(client.aclose())
+
+    def test_pool_stats_with_custom_transport(self):
+        client = _make_client(lambda request: httpx.Response(200, json={}))
+        _run(client.just_listen())
+        assert client.pool_stats() is None
+
+    def test_search(self):
+        def handler(request):
+            return httpx.Response(200, json={"results": [{"id": "a"}]})
+
+        async def main():
+            async with _make_client(handler) as client:
+                return await client.search(q="dummy", sort_by_date=1)
+
+        response = _run(main())
+        assert len(response.json().get("results", [])) > 0
+        assert response.request.method == "GET"
+        url = urlparse(str(response.url))
+        assert url.path == "/api/v2/search"
+        params = parse_qs(url.query)
+        assert params["q"][0] == "dummy"
+        assert params["sort_by_date"][0] == "1"
+        assert "x-listenapi-key" not in response.request.headers
+
+    def test_batch_fetch_episodes(self):
+        def handler(request):
+            ids = parse_qs(request.content.decode())["ids"][0]
+            return httpx.Response(
+                200, json={"episodes": [{"id": i} for i in ids.split(",")]}
+            )
+
+        async def main():
+            async with _make_client(handler) as client:
+                return await client.batch_fetch_episodes(ids="1,2,3")
+
+        response = _run(main())
+        assert response.request.method == "POST"
+        assert len(response.json()["episodes"]) == 3
+
+    def test_many_requests_in_flight(self):
+        def handler(request):
+            return httpx.Response(
+                200, content=json.dumps({"id": request.url.path})
+            )
+
+        async def main():
+            async with _make_client(handler) as client:
+                return await asyncio.gather(
+                    *[client.fetch_podcast_by_id(id=i) for i in range(50)]
+                )
+
+        responses = _run(main())
+        assert [r.json()["id"] for r in responses] == [
+            "/api/v2/podcasts/%s" % i for i in range(50)
+        ]
+
+    @pytest.mark.parametrize(
+        "status_code,error_class",
+        [
+            (400, errors.InvalidRequestError),
+            (401, errors.AuthenticationError),
+            (404, errors.NotFoundError),
+            (429, errors.RateLimitError),
+            (500, errors.ListenApiError),
+        ],
+    )
+    def test_error_mapping(self, status_code, error_class):
+        def handler(request):
+            return httpx.Response(status_code, json={})
+
+        async def main():
+            async with _make_client(handler) as client:
+                await client.fetch_episode_by_id(id="abc")
+
+        with pytest.raises(error_class) as excinfo:
+            _run(main())
+        assert excinfo.value.response.status_code == status_code
+
+    def test_connection_error(self):
+        def handler(request):
+            raise httpx.ConnectError("boom", request=request)
+
+        async def main():
+            async with _make_client(handler) as client:
+                await client.just_listen()
+
+        with pytest.raises(errors.APIConnectionError):
+            _run(main())
+
+    def test_fetch_many(self):
+        def handler(request):
+            if request.url.path.endswith("/missing"):
+                return httpx.Response(404, json={})
+            return httpx.Response(200, json={"id": request.url.path})
+
+        async def main():
+            async with _make_client(handler) as client:
+                return [
+                    result
+                    async for result in client.fetch_many(
+                        "fetch_episode_by_id", ["a", "missing", "b"]
+                    )
+                ]
+
+        results = _run(main())
+        assert [r.id for r in results] == ["a", "missing", "b"]
+        assert results[0].response.json()["id"] == "/api/v2/episodes/a"
+        assert isinstance(results[1].error, errors.NotFoundError)
+
+    def test_batch_fetch_all_episodes(self):
+        def handler(request):
+            ids = parse_qs(request.content.decode())["ids"][0].split(",")
+            return httpx.Response(
+                200, json={"episodes": [{"id": i} for i in ids]}
+            )
+
+        async def main():
+            async with _make_client(handler) as client:
+                return await client.batch_fetch_all_episodes(
+                    [str(i) for i in range(25)] * 2
+                )
+
+        episodes = _run(main())
+        assert [e["id"] for e in episodes] == [str(i) for i in range(25)]
+
+    def test_iter_curated_podcasts_lists(self):
+        def handler(request):
+            page = int(request.url.params.get("page", 1))
+            return httpx.Response(
+                200,
+                json={
+                    "curated_lists": [{"id": page}],
+                    "has_next": page < 3,
+                    "next_page_number": page + 1,
+                },
+            )
+
+        async def main():
+            async with _make_client(handler) as client:
+                return [
+                    item async for item in client.iter_curated_podcasts_lists()
+                ]
+
+        assert [item["id"] for item in _run(main())] == [1, 2, 3]
+
+    def test_retry_policy(self):
+        responses = iter([503, 200])
+
+        def handler(request):
+            return httpx.Response(next(responses), json={})
+
+        async def main():
+            async with _make_client(
+                handler, retry_policy=retry.RetryPolicy(base_delay=0.001)
+            ) as client:
+                return await client.just_listen()
+
+        assert _run(main()).retries == 1
+
+    def test_metrics(self):
+        collector = metrics.MetricsCollector()
+        hooks = metrics.Hooks()
+        hooks.register(collector)
+
+        def handler(request):
+            return httpx.Response(200, json={"id": "abc"})
+
+        async def main():
+            async with _make_client(handler, hooks=hooks) as client:
+                await client.fetch_episode_by_id(id="abc")
+                await client.batch_fetch_episodes(ids="a,b")
+
+        _run(main())
+        snapshot = collector.snapshot()
+        assert snapshot["GET /episodes/{id}"]["statuses"] == {200: 1}
+        assert snapshot["POST /episodes"]["request_bytes"] == len("ids=a%2Cb")
@@ -0,0 +1,201 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from listennotes import cache, podcast_api
+from listennotes.errors import ListenApiError
+from tests.utils import stub_client
+
+
+def _response(content, headers=None):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = "https://listen-api.listennotes.com/api/v2/genres"
+    response.headers.update(headers or {})
+    response._content = content
+    return response
+
+
+class TestResponseCache(object):
+    def test_cache_key_normalizes_params(self):
+        url = "https://listen-api.listennotes.com/api/v2/genres"
+        assert cache.cache_key("get", url, {"b": 1, "a": "x"}) == (
+            cache.cache_key("GET", url, {"a": "x", "b": "1", "c": None})
+        )
+        assert cache.cache_key("GET", url, {"a": 1}) != cache.cache_key(
+            "GET", url, {"a": 2}
+        )
+
+    def test_ttl_for(self):
+        response_cache = cache.ResponseCache(
+            ttls={"/genres": 10, "/podcasts/{id}": 5}
+        )
+        base = "https://listen-api.listennotes.com/api/v2"
+        assert response_cache.ttl_for(base + "/genres") == 10
+        assert response_cache.ttl_for(base + "/podcasts/abc") == 5
+        assert response_cache.ttl_for(base + "/curated_podcasts/abc") is None
+        assert response_cache.ttl_for(base + "/podcasts/a/audience") is None
+
+    def test_memory_backend_evicts_least_recently_used(self):
+        backend = cache.MemoryBackend(maxsize=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+        assert backend.get("b") is None
+        assert backend.get("a") == 1
+        assert len(backend) == 2
+
+    def test_expired_entries_are_refetched(self):
+        response_cache = cache.ResponseCache()
+        calls = []
+        response_cache.backend.set(
+            "key", (time.time() - 1, _response(b"stale"))
+        )
+
+        def send(headers):
+            calls.append(headers)
+            return _response(b"fresh")
+
+        assert response_cache.fetch("key", 60, send).content == b"fresh"
+        assert response_cache.fetch("key", 60, send).content == b"fresh"
+        assert calls == [{}]
+
+    def test_single_flight(self):
+        response_cache = cache.ResponseCache()
+        calls = []
+        release = threading.Event()
+        response = _response(b"{}")
+
+        def send(headers):
+            calls.append(1)
+            release.wait(5)
+            return response
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    response_cache.fetch("key", 60, send)
+                )
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert results == [response] * 8
+        assert len(calls) == 1
+
+    def test_client_caches_read_only_endpoints(self):
+        client = podcast_api.Client(cache=True)
+        adapter = stub_client(client, lambda request: {"genres": []})
+        client.fetch_podcast_genres(top_level_only=1)
+        client.fetch_podcast_genres(top_level_only=1)
+        client.fetch_podcast_genres(top_level_only=0)
+        client.fetch_podcast_by_id(id="abc")
+        client.fetch_podcast_by_id(id="abc")
+        assert len(adapter.requests) == 4
+
+    def test_client_does_not_cache_errors(self):
+        client = podcast_api.Client(cache=True)
+        adapter = stub_client(client, lambda request: (500, {}, {}))
+        for _ in range(2):
+            with pytest.raises(ListenApiError):
+                client.fetch_podcast_languages()
+        assert len(adapter.requests) == 2
+
+
+class _ETagHandler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    hits = []
+
+    def do_GET(self):
+        self.hits.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        body = json.dumps({"id": "abc", "etag": self.etag}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def etag_server():
+    _ETagHandler.hits = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ETagHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _sqlite_client(path, server):
+    response_cache = cache.ResponseCache(
+        ttls={"/podcasts/{id}": 60},
+        backend=cache.SQLiteBackend(str(path)),
+    )
+    client = podcast_api.Client(cache=response_cache)
+    client.api_base = "http://127.0.0.1:%s/api/v2" % server.server_port
+    return client
+
+
+class TestSQLiteBackend(object):
+    def test_get_set_delete(self, tmp_path):
+        backend = cache.SQLiteBackend(str(tmp_path / "cache.db"), maxsize=2)
+        response = _response(b'{"genres": []}', {"ETag": '"v1"'})
+        for key in ("a", "b", "c"):
+            backend.set(key, (123.0, response))
+        assert len(backend) == 2
+        assert backend.get("a") is None
+        expires_at, cached = backend.get("c")
+        assert expires_at == 123.0
+        assert cached.json() == {"genres": []}
+        assert cached.headers["etag"] == '"v1"'
+        backend.delete("c")
+        assert backend.get("c") is None
+
+    def test_shared_across_clients(self, tmp_path, etag_server):
+        path = tmp_path / "cache.db"
+        first = _sqlite_client(path, etag_server)
+        second = _sqlite_client(path, etag_server)
+        assert first.fetch_podcast_by_id(id="abc").json()["id"] == "abc"
+        assert second.fetch_podcast_by_id(id="abc").json()["id"] == "abc"
+        assert _ETagHandler.hits == [None]
+
+    def test_revalidates_expired_responses(self, tmp_path, etag_server):
+        client = _sqlite_client(tmp_path / "cache.db", etag_server)
+        backend = client.http_client.cache.backend
+        assert client.fetch_podcast_by_id(id="abc").json()["etag"] == '"v1"'
+
+        key = next(
+            iter(backend._connect().execute("SELECT key FROM responses"))
+        )[0]
+        backend.set(key, (time.time() - 1, backend.get(key)[1]))
+        response = client.fetch_podcast_by_id(id="abc")
+        assert response.status_code == 200
+        assert response.json()["etag"] == '"v1"'
+        assert _ETagHandler.hits == [None, '"v1"']
+        assert backend.get(key)[0] > time.time()
+
+        _ETagHandler.etag = '"v2"'
+        backend.set(key, (time.time() - 1, backend.get(key)[1]))
+        assert client.fetch_podcast_by_id(id="abc").json()["etag"] == '"v2"'
+        _ETagHandler.etag = '"v1"'
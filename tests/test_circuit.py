@@ -0,0 +1,219 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+import requests
+
+from listennotes import (
+    cache,
+    circuit,
+    errors,
+    http_utils,
+    podcast_api,
+    stub_server,
+)
+from tests.utils import stub_client
+
+GENRES = "https://listen-api.listennotes.com/api/v2/genres"
+PODCAST = "https://listen-api.listennotes.com/api/v2/podcasts/%s"
+
+
+class Backend(object):
+    """A fake Listen API, failing with status (or raising) while down."""
+
+    def __init__(self):
+        self.down = False
+        self.status = 500
+        self.calls = 0
+
+    def __call__(self, request):
+        self.calls += 1
+        if self.down:
+            if self.status is None:
+                raise requests.exceptions.ReadTimeout("timed out")
+            return self.status, {}, {}
+        return {"genres": [{"id": self.calls}]}
+
+
+def _client(backend, **kwargs):
+    breaker = circuit.CircuitBreaker(**kwargs)
+    client = podcast_api.Client(circuit_breaker=breaker)
+    stub_client(client, backend)
+    return client, breaker
+
+
+class TestCircuitBreaker(object):
+    def test_opens_after_consecutive_failures(self):
+        backend = Backend()
+        client, breaker = _client(backend, failure_threshold=3)
+        client.fetch_best_podcasts()
+        backend.down = True
+        for _ in range(3):
+            with pytest.raises(errors.ListenApiError):
+                client.fetch_best_podcasts()
+        assert breaker.state(PODCAST % "abc") == circuit.CLOSED
+        assert breaker.state(client.api_base + "/best_podcasts") == (
+            circuit.OPEN
+        )
+
+        calls = backend.calls
+        with pytest.raises(errors.CircuitOpenError):
+            client.fetch_best_podcasts()
+        assert backend.calls == calls
+        # Other endpoints aren't affected
+        with pytest.raises(errors.ListenApiError) as e:
+            client.fetch_podcast_genres()
+        assert not isinstance(e.value, errors.CircuitOpenError)
+        stats = breaker.stats()["/best_podcasts"]
+        assert stats["state"] == circuit.OPEN
+        assert stats["rejected"] == 1
+
+    def test_success_resets_failures(self):
+        backend = Backend()
+        client, breaker = _client(backend, failure_threshold=2)
+        for _ in range(3):
+            backend.down = True
+            with pytest.raises(errors.ListenApiError):
+                client.fetch_podcast_genres()
+            backend.down = False
+            client.fetch_podcast_genres()
+        assert breaker.stats()["/genres"]["state"] == circuit.CLOSED
+
+    def test_client_errors_are_not_failures(self):
+        backend = Backend()
+        backend.down = True
+        backend.status = 404
+        client, breaker = _client(backend, failure_threshold=1)
+        for _ in range(3):
+            with pytest.raises(errors.NotFoundError):
+                client.fetch_podcast_genres()
+        assert breaker.stats()["/genres"]["state"] == circuit.CLOSED
+
+    def test_timeouts_are_failures(self):
+        backend = Backend()
+        backend.down = True
+        backend.status = None
+        client, breaker = _client(backend, failure_threshold=2)
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.Timeout):
+                client.fetch_podcast_genres()
+        with pytest.raises(errors.CircuitOpenError):
+            client.fetch_podcast_genres()
+        assert backend.calls == 2
+
+    def test_half_open_probe(self):
+        backend = Backend()
+        backend.down = True
+        client, breaker = _client(
+            backend, failure_threshold=1, reset_timeout=0.05
+        )
+        with pytest.raises(errors.ListenApiError):
+            client.fetch_podcast_genres()
+        time.sleep(0.06)
+        assert breaker.state(GENRES) == circuit.HALF_OPEN
+
+        # Only one probe at a time
+        assert breaker.allow(GENRES) == (True, True)
+        assert breaker.allow(GENRES) == (False, False)
+        breaker.record(GENRES, failed=True, probe=True)
+        assert breaker.state(GENRES) == circuit.OPEN
+
+        time.sleep(0.06)
+        # The probe fails: open again
+        with pytest.raises(errors.ListenApiError):
+            client.fetch_podcast_genres()
+        with pytest.raises(errors.CircuitOpenError):
+            client.fetch_podcast_genres()
+
+        time.sleep(0.06)
+        backend.down = False
+        assert client.fetch_podcast_genres().json()["genres"]
+        assert breaker.state(GENRES) == circuit.CLOSED
+
+    def test_serve_stale(self):
+        backend = Backend()
+        client, breaker = _client(
+            backend, failure_threshold=2, serve_stale=True
+        )
+        fresh = client.fetch_podcast_genres(top_level_only=1)
+        assert not getattr(fresh, "stale", False)
+
+        backend.down = True
+        for _ in range(3):
+            response = client.fetch_podcast_genres(top_level_only=1)
+            assert response.stale
+            assert response.json() == {"genres": [{"id": 1}]}
+        # The last one never reached the server
+        assert backend.calls == 3
+        assert not getattr(fresh, "stale", False)
+        assert breaker.stats()["/genres"]["served_stale"] == 3
+
+        # No stale response for other params
+        with pytest.raises(errors.CircuitOpenError):
+            client.fetch_podcast_genres()
+
+    def test_serve_stale_sqlite(self, tmp_path):
+        backend = Backend()
+        client, breaker = _client(
+            backend,
+            failure_threshold=1,
+            serve_stale=True,
+            stale_cache=cache.SQLiteBackend(str(tmp_path / "stale.db")),
+        )
+        client.fetch_podcast_genres()
+        backend.down = True
+        response = client.fetch_podcast_genres()
+        assert response.stale
+        assert response.json() == {"genres": [{"id": 1}]}
+
+    def test_streamed_responses_are_not_served_stale(self):
+        # A real server: StubAdapter responses have their body read already
+        breaker = circuit.CircuitBreaker(failure_threshold=1, serve_stale=True)
+        client = podcast_api.Client(circuit_breaker=breaker)
+        with stub_server.StubServer() as server:
+            client.api_base = server.api_base
+            episodes = list(client.stream_episodes(id="abc"))
+            podcast = client.fetch_podcast_by_id(id="abc").json()
+            assert len(episodes) == len(podcast["episodes"]) == 10
+
+            server.error_rate = 1.0
+            with pytest.raises(errors.ListenApiError) as e:
+                client.stream_episodes(id="abc")
+            assert not isinstance(e.value, errors.CircuitOpenError)
+            with pytest.raises(errors.CircuitOpenError):
+                client.stream_episodes(id="abc")
+            stale = client.fetch_podcast_by_id(id="abc")
+            assert stale.stale
+            assert stale.json() == podcast
+
+
+def test_async_circuit_breaker():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            return httpx.Response(200, json={"genres": []})
+        raise httpx.ConnectTimeout("timed out")
+
+    async def main():
+        breaker = circuit.CircuitBreaker(failure_threshold=1, serve_stale=True)
+        client = podcast_api.AsyncClient()
+        client.http_client = http_utils.AsyncRequest(
+            transport=httpx.MockTransport(handler), circuit_breaker=breaker
+        )
+        fresh = await client.fetch_podcast_genres()
+        stale = await client.fetch_podcast_genres()
+        assert breaker.state(GENRES) == circuit.OPEN
+        with pytest.raises(errors.APIConnectionError) as e:
+            await client.fetch_best_podcasts()
+        assert not isinstance(e.value, errors.CircuitOpenError)
+        with pytest.raises(errors.CircuitOpenError):
+            await client.fetch_best_podcasts()
+        return fresh, stale
+
+    fresh, stale = asyncio.run(main())
+    assert stale.stale
+    assert stale.json() == fresh.json() == {"genres": []}
+    assert len(calls) == 3
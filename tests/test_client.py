@@ -1,7 +1,14 @@
 from urllib.parse import parse_qs, urlparse
 
+import pytest
+
 from listennotes import podcast_api
-from listennotes.errors import AuthenticationError
+from listennotes.errors import (
+    AuthenticationError,
+    NotFoundError,
+    RateLimitError,
+)
+from tests.utils import path_of, query_of, stub_client
 
 
 class TestClient(object):
@@ -274,3 +281,134 @@ class TestClient(object):
         params = parse_qs(url.query)
         assert params["page"][0] == '3'
         assert url.path == "/api/v2/podcasts/domains/%s" % domain_name
+
+
+class TestClientHelpers(object):
+    def test_fetch_many(self):
+        client = podcast_api.Client()
+
+        def handler(request):
+            podcast_id = path_of(request).rsplit("/", 1)[-1]
+            if podcast_id == "missing":
+                return 404, {}, {}
+            return {"id": podcast_id}
+
+        stub_client(client, handler)
+        ids = ["a", "missing", "b", "c"]
+        results = list(client.fetch_many("fetch_podcast_by_id", ids))
+        assert [r.id for r in results] == ids
+        assert [r.response.json()["id"] for r in results if r.response] == [
+            "a",
+            "b",
+            "c",
+        ]
+        assert isinstance(results[1].error, NotFoundError)
+
+        results = client.fetch_many(
+            "fetch_episode_by_id",
+            iter(range(100)),
+            max_workers=4,
+            ordered=False,
+        )
+        assert sorted(r.id for r in results) == list(range(100))
+
+    def test_fetch_many_passes_extra_params(self):
+        client = podcast_api.Client()
+        adapter = stub_client(client, lambda request: {})
+        list(
+            client.fetch_many(
+                "fetch_podcast_by_id", ["a"], sort="oldest_first"
+            )
+        )
+        assert query_of(adapter.requests[0])["sort"] == ["oldest_first"]
+
+    def test_fetch_many_unsupported_endpoint(self):
+        client = podcast_api.Client()
+        with pytest.raises(ValueError):
+            list(client.fetch_many("search", ["a"]))
+
+    def test_batch_fetch_all_podcasts(self):
+        client = podcast_api.Client()
+
+        def handler(request):
+            ids = parse_qs(request.body)["ids"][0].split(",")
+            assert len(ids) <= 3
+            return {"podcasts": [{"id": i} for i in reversed(ids) if i != "x"]}
+
+        adapter = stub_client(client, handler)
+        ids = ["e", "d", "x", "c", "d", "b", "a", "e", "f"]
+        podcasts = client.batch_fetch_all_podcasts(
+            ids, chunk_size=3, max_workers=2, show_latest_episodes=0
+        )
+        assert [p["id"] for p in podcasts] == ["e", "d", "c", "b", "a", "f"]
+        assert len(adapter.requests) == 3
+        assert all(
+            parse_qs(r.body)["show_latest_episodes"] == ["0"]
+            for r in adapter.requests
+        )
+
+    def test_batch_fetch_all_episodes_raises_first_error(self):
+        client = podcast_api.Client()
+        stub_client(client, lambda request: (429, {}, {}))
+        with pytest.raises(RateLimitError):
+            client.batch_fetch_all_episodes(["a"] * 5 + ["b"] * 20)
+
+    def test_batch_fetch_accepts_id_list(self):
+        client = podcast_api.Client()
+        adapter = stub_client(client, lambda request: {"episodes": []})
+        client.batch_fetch_episodes(ids=["a", "b"])
+        assert parse_qs(adapter.requests[0].body)["ids"] == ["a,b"]
+
+    def test_iter_episodes(self):
+        client = podcast_api.Client()
+        pages = {
+            None: {
+                "episodes": [{"id": 1}, {"id": 2}],
+                "next_episode_pub_date": 20,
+            },
+            "20": {"episodes": [{"id": 3}], "next_episode_pub_date": 10},
+            "10": {"episodes": [], "next_episode_pub_date": None},
+        }
+
+        def handler(request):
+            params = query_of(request)
+            assert params["sort"] == ["recent_first"]
+            return pages[params.get("next_episode_pub_date", [None])[0]]
+
+        adapter = stub_client(client, handler)
+        episodes = client.iter_episodes(id="abc", sort="recent_first")
+        assert [e["id"] for e in episodes] == [1, 2, 3]
+        assert len(adapter.requests) == 3
+        assert path_of(adapter.requests[0]) == "/api/v2/podcasts/abc"
+
+    def test_iter_search_results(self):
+        client = podcast_api.Client()
+
+        def handler(request):
+            offset = int(query_of(request).get("offset", [0])[0])
+            return {
+                "results": [{"id": offset}, {"id": offset + 1}],
+                "next_offset": offset + 2,
+                "total": 5,
+            }
+
+        stub_client(client, handler)
+        results = client.iter_search_results(q="star wars")
+        assert [r["id"] for r in results] == [0, 1, 2, 3, 4, 5]
+
+    def test_iter_best_podcasts_stops_early(self):
+        client = podcast_api.Client()
+
+        def handler(request):
+            page = int(query_of(request).get("page", [1])[0])
+            return {
+                "podcasts": [{"id": page}],
+                "has_next": True,
+                "next_page_number": page + 1,
+            }
+
+        adapter = stub_client(client, handler)
+        podcasts = client.iter_best_podcasts(genre_id=93)
+        assert [next(podcasts)["id"] for _ in range(3)] == [1, 2, 3]
+        podcasts.close()
+        assert len(adapter.requests) <= 4
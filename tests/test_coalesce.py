@@ -0,0 +1,108 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import pytest
+
+from listennotes import podcast_api
+from listennotes.errors import ListenApiError, NotFoundError
+from tests.utils import stub_client
+
+
+def _batch_handler(batches):
+    def handler(request):
+        if request.method != "POST":
+            return {"id": "single"}
+        ids = parse_qs(request.body)["ids"][0].split(",")
+        batches.append(ids)
+        return {
+            "episodes": [
+                {"id": i, "title": "t%s" % i} for i in ids if i != "x"
+            ]
+        }
+
+    return handler
+
+
+class TestCoalescer(object):
+    def test_merges_concurrent_calls(self):
+        batches = []
+        client = podcast_api.Client(coalesce="episodes", coalesce_window=0.2)
+        stub_client(client, _batch_handler(batches))
+        ids = [str(i) for i in range(25)]
+        with ThreadPoolExecutor(25) as executor:
+            responses = list(
+                executor.map(lambda i: client.fetch_episode_by_id(id=i), ids)
+            )
+        assert [r.json()["id"] for r in responses] == ids
+        assert sorted(len(batch) for batch in batches) == [5, 10, 10]
+        assert responses[3].url.endswith("/episodes/3")
+        assert b'"title": "t3"' in responses[3].content
+
+    def test_window(self):
+        batches = []
+        client = podcast_api.Client(coalesce=True, coalesce_window=0.01)
+        stub_client(client, _batch_handler(batches))
+        started = time.monotonic()
+        assert client.fetch_episode_by_id(id="a").json()["title"] == "ta"
+        assert time.monotonic() - started >= 0.01
+        client.fetch_episode_by_id(id="b")
+        assert batches == [["a"], ["b"]]
+
+    def test_only_plain_lookups_are_coalesced(self):
+        batches = []
+        client = podcast_api.Client(coalesce="episodes")
+        stub_client(client, _batch_handler(batches))
+        response = client.fetch_episode_by_id(id="a", show_transcript=1)
+        assert response.json() == {"id": "single"}
+        assert client.fetch_podcast_by_id(id="a").json() == {"id": "single"}
+        assert batches == []
+
+    def test_iter_episodes_is_not_coalesced(self):
+        def handler(request):
+            assert request.method == "GET"
+            before = parse_qs(request.url.split("?", 1)[-1]).get(
+                "next_episode_pub_date"
+            )
+            if before:
+                return {"episodes": [], "next_episode_pub_date": None}
+            return {
+                "id": "a",
+                "episodes": [{"id": "e1"}, {"id": "e2"}],
+                "next_episode_pub_date": 1,
+            }
+
+        client = podcast_api.Client(coalesce=True)
+        stub_client(client, handler)
+        episodes = list(client.iter_episodes(id="a"))
+        assert [e["id"] for e in episodes] == ["e1", "e2"]
+
+    def test_duplicate_ids_share_a_result(self):
+        batches = []
+        client = podcast_api.Client(coalesce=True, coalesce_window=0.05)
+        stub_client(client, _batch_handler(batches))
+        coalescer = client._coalescers["episodes"]
+        futures = [coalescer.submit(i) for i in ["a", "b", "a"]]
+        assert futures[0] is futures[2]
+        assert futures[1].result().json()["id"] == "b"
+        assert batches == [["a", "b"]]
+
+    def test_errors(self):
+        client = podcast_api.Client(coalesce=True, coalesce_window=0.01)
+        stub_client(client, _batch_handler([]))
+        coalescer = client._coalescers["episodes"]
+        missing, found = coalescer.submit("x"), coalescer.submit("y")
+        with pytest.raises(NotFoundError):
+            missing.result()
+        assert found.result().json()["id"] == "y"
+
+        stub_client(client, lambda request: (500, {}, {}))
+        with pytest.raises(ListenApiError) as e:
+            client.fetch_episode_by_id(id="a")
+        assert e.value.response.status_code == 500
+
+    def test_invalid_coalesce(self):
+        with pytest.raises(ValueError):
+            podcast_api.Client(coalesce="genres")
+        with pytest.raises(TypeError):
+            podcast_api.AsyncClient(coalesce=True)
@@ -0,0 +1,160 @@
+import collections
+import functools
+import os
+import time
+
+from listennotes import crawler, podcast_api
+from tests.utils import path_of, stub_client
+
+
+def _client(**kwargs):
+    client = podcast_api.Client(**kwargs)
+    stub_client(
+        client, lambda request: {"id": path_of(request).rsplit("/", 1)[-1]}
+    )
+    return client
+
+
+def _save_podcast(output_dir, client, podcast_id):
+    data = client.fetch_podcast_by_id(id=podcast_id).json()
+    marker = output_dir + ".crashed"
+    if podcast_id == "crash" and not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    if podcast_id == "bad":
+        raise ValueError("bad podcast")
+    path = os.path.join(output_dir, "%s.%s" % (data["id"], os.getpid()))
+    open(path, "w").close()
+
+
+def _crash_on_poison(output_dir, client, podcast_id):
+    if podcast_id == "poison":
+        os._exit(1)
+    time.sleep(0.01)
+    open(os.path.join(output_dir, podcast_id), "w").close()
+
+
+class TestHashRing(object):
+    def test_consistent(self):
+        ring = crawler.HashRing(["a", "b", "c", "d"])
+        before = {key: ring.node_for(key) for key in range(1000)}
+        counts = collections.Counter(before.values())
+        assert len(counts) == 4
+        assert min(counts.values()) > 100
+        ring.remove("d")
+        after = {key: ring.node_for(key) for key in range(1000)}
+        # Only the keys of d move
+        assert all(after[k] == before[k] for k in before if before[k] != "d")
+        assert "d" not in after.values()
+        assert crawler.HashRing().node_for(1) is None
+
+
+class TestWorkQueue(object):
+    def test_claim(self, tmp_path):
+        queue = crawler.WorkQueue(str(tmp_path / "crawl.db"), max_attempts=2)
+        queue.add(str(i) for i in range(100))
+        queue.add(["1"])
+        queue.register("w1")
+        queue.register("w2")
+        own = queue.claim("w1", 100)
+        shards = set(queue.shards_of("w1", ("w1", "w2")))
+        assert 0 < len(own) < 100
+        assert all(crawler.shard_of(i) in shards for i in own)
+        # w1 helps with the shards of w2
+        assert len(queue.claim("w1", 100)) == 100 - len(own)
+
+        queue.complete("w1", own[0])
+        queue.start("w1", own[1])
+        queue.fail("w1", own[1], "error")
+        queue.fail("w2", own[2], "not its lease")
+        assert queue.counts() == {
+            "pending": 1,
+            "leased": 98,
+            "done": 1,
+            "failed": 0,
+        }
+        assert queue.claim("w1", 10) == [own[1]]
+        queue.start("w1", own[1])
+        queue.fail("w1", own[1], "error again")
+        assert queue.failed() == [(own[1], "error again")]
+
+        # w1 crashed
+        queue.release("w1")
+        assert queue.remaining() == 98
+        assert len(queue.claim("w2", 200)) == 98
+
+    def test_attempts_are_counted_when_started(self, tmp_path):
+        queue = crawler.WorkQueue(str(tmp_path / "crawl.db"), max_attempts=2)
+        queue.add(["a", "b", "c", "d"])
+        queue.register("w1")
+        assert len(queue.claim("w1", 10)) == 4
+        queue.start("w1", "a")
+        queue.start("w1", "b")
+        queue.complete("w1", "b")
+        # w1 crashed running a: c and d weren't started
+        queue.release("w1")
+        queue.register("w2")
+        assert sorted(queue.claim("w2", 10)) == ["c", "d"]
+        # a crashed a worker, so it's claimed alone
+        assert queue.claim("w2", 10) == ["a"]
+        queue.start("w2", "a")
+        # c and d go back to the queue, and a is out of attempts
+        queue.release("w2")
+        assert sorted(queue.claim("w2", 10)) == ["c", "d"]
+        assert queue.failed() == [("a", crawler.CRASHED)]
+
+    def test_lease_expires(self, tmp_path):
+        queue = crawler.WorkQueue(str(tmp_path / "crawl.db"), lease=0.05)
+        queue.add(["a"])
+        assert queue.claim("w1", 1) == ["a"]
+        assert queue.claim("w2", 1) == []
+        time.sleep(0.06)
+        assert queue.claim("w2", 1) == ["a"]
+
+
+class TestCrawler(object):
+    def test_crawl(self, tmp_path):
+        output_dir = str(tmp_path / "out")
+        os.mkdir(output_dir)
+        path = str(tmp_path / "crawl.db")
+        ids = [str(i) for i in range(40)] + ["crash", "bad"]
+        crawler.WorkQueue(path).add(ids)
+        c = crawler.Crawler(
+            path,
+            functools.partial(_save_podcast, output_dir),
+            processes=2,
+            threads=2,
+            rate=1000,
+            client_factory=_client,
+            poll_interval=0.05,
+        )
+        counts = c.run()
+        assert counts == {"pending": 0, "leased": 0, "done": 41, "failed": 1}
+        assert c.restarts == 1
+        saved = {name.split(".")[0] for name in os.listdir(output_dir)}
+        assert saved == set(ids) - {"bad"}
+        # Or "worker crashed", if its last attempt ran next to "crash"
+        assert [the_id for the_id, _ in crawler.WorkQueue(path).failed()] == [
+            "bad"
+        ]
+
+    def test_poison_id(self, tmp_path):
+        output_dir = str(tmp_path / "out")
+        os.mkdir(output_dir)
+        path = str(tmp_path / "crawl.db")
+        ids = [str(i) for i in range(30)] + ["poison"]
+        crawler.WorkQueue(path).add(ids)
+        c = crawler.Crawler(
+            path,
+            functools.partial(_crash_on_poison, output_dir),
+            processes=1,
+            threads=4,
+            client_factory=_client,
+            poll_interval=0.05,
+        )
+        counts = c.run()
+        # Ids leased or running next to poison aren't failed
+        assert counts == {"pending": 0, "leased": 0, "done": 30, "failed": 1}
+        assert crawler.WorkQueue(path).failed() == [("poison", "worker crashed")]
+        assert c.restarts == crawler.MAX_ATTEMPTS
+        assert sorted(os.listdir(output_dir)) == sorted(ids[:-1])
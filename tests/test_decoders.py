@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from listennotes import decoders, podcast_api
+from tests.utils import stub_client
+
+PAYLOAD = {"id": "abc", "title": "Café \U0001f399", "episodes": [1, 2.5]}
+
+
+class TestDecoders(object):
+    @pytest.mark.parametrize("name", decoders.available_decoders())
+    def test_decoders(self, name):
+        decode = decoders.get_decoder(name)
+        assert decode(json.dumps(PAYLOAD).encode("utf-8")) == PAYLOAD
+        with pytest.raises(ValueError):
+            decode(b"{not json")
+
+    def test_default_decoder(self):
+        preferred = decoders.available_decoders()[0]
+        default = decoders.get_decoder()
+        assert default.__module__ == decoders.get_decoder(preferred).__module__
+
+    def test_lazy_default_decoder(self):
+        assert decoders.default_decoder(b'{"id": 1}') == {"id": 1}
+        with pytest.raises(ValueError):
+            decoders.default_decoder(b"{not json")
+
+    def test_unknown_decoder(self):
+        with pytest.raises(ValueError):
+            decoders.get_decoder("yaml")
+
+    @pytest.mark.parametrize("name", decoders.available_decoders())
+    def test_client_json_decoder(self, name):
+        client = podcast_api.Client(json_decoder=name)
+        stub_client(client, lambda request: PAYLOAD)
+        response = client.fetch_podcast_by_id(id="abc")
+        assert response.json() == PAYLOAD
+        assert response.json(parse_float=str)["episodes"] == [1, "2.5"]
+
+    def test_client_custom_decoder(self):
+        client = podcast_api.Client(json_decoder=lambda content: "decoded")
+        stub_client(client, lambda request: PAYLOAD)
+        assert client.just_listen().json() == "decoded"
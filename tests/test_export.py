@@ -0,0 +1,188 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from listennotes import export, podcast_api
+from listennotes.__main__ import main
+from tests.utils import path_of, query_of, stub_client
+
+DAY = 86400000
+
+
+def _handler(calls, episodes=5, page_size=2, fail=()):
+    def handler(request):
+        podcast_id = path_of(request).rsplit("/", 1)[-1]
+        before = int(query_of(request).get("next_episode_pub_date", [0])[0])
+        calls.append((podcast_id, before))
+        if podcast_id in fail:
+            return 404, {}, {}
+        page = [
+            {"id": "%s-%s" % (podcast_id, i), "pub_date_ms": i * DAY}
+            for i in range(episodes, 0, -1)
+            if not before or i * DAY < before
+        ][:page_size]
+        return {
+            "id": podcast_id,
+            "title": "Podcast %s" % podcast_id,
+            "genre_ids": [93],
+            "episodes": page,
+            "next_episode_pub_date": page[-1]["pub_date_ms"] if page else 0,
+        }
+
+    return handler
+
+
+def _read_jsonl(output_dir, kind):
+    records = []
+    for name in sorted(os.listdir(output_dir)):
+        if name.startswith(kind) and name.endswith(".jsonl.gz"):
+            with gzip.open(os.path.join(output_dir, name), "rt") as f:
+                records.extend(json.loads(line) for line in f)
+    return records
+
+
+def _exporter(output_dir, calls, **kwargs):
+    client = podcast_api.Client()
+    stub_client(client, _handler(calls, fail=kwargs.pop("fail", ())))
+    return export.Exporter(
+        client, str(output_dir), max_workers=2, checkpoint_every=2, **kwargs
+    )
+
+
+class TestExporter(object):
+    def test_jsonl(self, tmp_path):
+        calls = []
+        checkpoint = _exporter(tmp_path, calls).run(["a", "b", "c"])
+        assert checkpoint["done"]
+        assert checkpoint["podcasts"] == 3
+        assert checkpoint["episodes"] == 15
+        assert checkpoint["parts"] == 2
+        podcasts = _read_jsonl(str(tmp_path), "podcasts")
+        assert [p["id"] for p in podcasts] == ["a", "b", "c"]
+        assert "episodes" not in podcasts[0]
+        episodes = _read_jsonl(str(tmp_path), "episodes")
+        assert [e["id"] for e in episodes[:5]] == [
+            "a-5",
+            "a-4",
+            "a-3",
+            "a-2",
+            "a-1",
+        ]
+        assert episodes[0]["podcast_id"] == "a"
+        # 3 pages per podcast, then an empty one
+        assert len(calls) == 12
+        assert sorted(os.listdir(str(tmp_path))) == [
+            "checkpoint.json",
+            "episodes-00000.jsonl.gz",
+            "episodes-00001.jsonl.gz",
+            "podcasts-00000.jsonl.gz",
+            "podcasts-00001.jsonl.gz",
+        ]
+
+        # Done: nothing to do
+        calls[:] = []
+        _exporter(tmp_path, calls).run(["a", "b", "c"])
+        assert calls == []
+
+    def test_resume(self, tmp_path):
+        calls = []
+
+        def progress(checkpoint):
+            raise KeyboardInterrupt
+
+        with pytest.raises(KeyboardInterrupt):
+            _exporter(tmp_path, calls, episodes=False).run(
+                iter(["a", "b", "c", "d", "e"]), progress=progress
+            )
+        assert [p["id"] for p in _read_jsonl(str(tmp_path), "podcasts")] == [
+            "a",
+            "b",
+        ]
+        assert not any(n.endswith(".tmp") for n in os.listdir(str(tmp_path)))
+
+        calls[:] = []
+        checkpoint = _exporter(tmp_path, calls, episodes=False).run(
+            ["a", "b", "c", "d", "e"]
+        )
+        assert sorted(podcast_id for podcast_id, _ in calls) == [
+            "c",
+            "d",
+            "e",
+        ]
+        assert checkpoint["podcasts"] == 5
+        assert checkpoint["episodes"] == 0
+        assert [p["id"] for p in _read_jsonl(str(tmp_path), "podcasts")] == [
+            "a",
+            "b",
+            "c",
+            "d",
+            "e",
+        ]
+        assert _read_jsonl(str(tmp_path), "episodes") == []
+
+    def test_failed_ids(self, tmp_path):
+        calls = []
+        checkpoint = _exporter(tmp_path, calls, fail=("b",)).run(
+            ["a", "b", "c"]
+        )
+        assert checkpoint["failed"] == 1
+        assert checkpoint["podcasts"] == 2
+        with open(str(tmp_path / "failed.txt")) as f:
+            assert f.read().startswith("b\t")
+
+    def test_format_mismatch(self, tmp_path):
+        _exporter(tmp_path, []).run(["a"])
+        with pytest.raises(ValueError):
+            _exporter(tmp_path, [], format="parquet").load_checkpoint()
+
+    def test_parquet(self, tmp_path):
+        parquet = pytest.importorskip("pyarrow.parquet")
+        _exporter(tmp_path, [], format="parquet").run(["a", "b", "c"])
+        table = parquet.read_table(str(tmp_path / "podcasts-00000.parquet"))
+        assert table.column("id").to_pylist() == ["a", "b"]
+        assert table.column("genre_ids").to_pylist() == ["[93]", "[93]"]
+
+    def test_parquet_row_groups(self, tmp_path):
+        parquet = pytest.importorskip("pyarrow.parquet")
+        path = str(tmp_path / "episodes.parquet")
+        writer = export.ParquetWriter(path, "episodes", row_group_size=2)
+        empty = os.path.getsize(path)
+        for i in range(5):
+            writer.write(
+                {
+                    "id": str(i),
+                    "pub_date_ms": i * DAY,
+                    "audio_length_sec": "unknown" if i == 4 else 60,
+                    "new_field": [i],
+                }
+            )
+        # Written before the part is closed
+        assert os.path.getsize(path) > empty
+        writer.close()
+        f = parquet.ParquetFile(path)
+        assert [
+            f.metadata.row_group(i).num_rows for i in range(f.num_row_groups)
+        ] == [2, 2, 1]
+        rows = f.read().to_pylist()
+        assert rows[0]["pub_date_ms"] == 0
+        assert rows[0]["title"] is None
+        assert json.loads(rows[0]["other_fields"]) == {"new_field": [0]}
+        assert rows[4]["audio_length_sec"] is None
+        assert json.loads(rows[4]["other_fields"]) == {
+            "audio_length_sec": "unknown",
+            "new_field": [4],
+        }
+
+    def test_file_source(self, tmp_path):
+        path = tmp_path / "ids.txt"
+        path.write_text("a\n\n# comment\nb  # trailing\n")
+        assert list(export.file_source(str(path))) == ["a", "b"]
+
+
+def test_cli_help(capsys):
+    with pytest.raises(SystemExit) as e:
+        main(["export", "--help"])
+    assert e.value.code == 0
+    assert "--curated-list" in capsys.readouterr().out
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from listennotes import hedging, http_utils, podcast_api, ratelimit
+from tests.utils import path_of, stub_client
+
+TYPEAHEAD = "https://listen-api.listennotes.com/api/v2/typeahead"
+
+
+def _slow_first_handler(delay):
+    calls = []
+    lock = threading.Lock()
+
+    def handler(request):
+        with lock:
+            calls.append(path_of(request))
+            first = len(calls) == 1
+        if first:
+            time.sleep(delay)
+        return {"terms": ["first" if first else "hedge"]}
+
+    return handler, calls
+
+
+class TestHedgePolicy(object):
+    def test_applies(self):
+        policy = hedging.HedgePolicy()
+        assert policy.applies("GET", TYPEAHEAD + "?q=star")
+        assert not policy.applies("POST", TYPEAHEAD)
+        assert not policy.applies(
+            "GET", TYPEAHEAD.replace("typeahead", "search")
+        )
+
+    def test_delay(self):
+        policy = hedging.HedgePolicy(
+            initial_delay=0.2, min_delay=0.01, max_delay=0.5, min_samples=10
+        )
+        assert policy.delay(TYPEAHEAD) == 0.2
+        for _ in range(100):
+            policy.observe(TYPEAHEAD, 0.02)
+        assert 0.01 <= policy.delay(TYPEAHEAD) <= 0.025
+        for _ in range(100):
+            policy.observe(TYPEAHEAD, 10)
+        assert policy.delay(TYPEAHEAD) == 0.5
+
+    def test_budget(self):
+        policy = hedging.HedgePolicy(budget=0.5)
+        assert policy.allow_hedge()
+        assert not policy.allow_hedge()
+        policy.delay(TYPEAHEAD)
+        policy.delay(TYPEAHEAD)
+        assert policy.allow_hedge()
+        assert policy.stats()["hedges"] == 2
+
+    def test_rate_limiter(self):
+        policy = hedging.HedgePolicy()
+        bucket = ratelimit.TokenBucket(rate=1)
+        bucket.acquire()
+        assert not policy.allow_hedge(bucket)
+        assert policy.stats()["hedges"] == 0
+
+
+class TestClientHedging(object):
+    def test_hedge_wins(self):
+        policy = hedging.HedgePolicy(initial_delay=0.02)
+        client = podcast_api.Client(hedge=policy)
+        handler, calls = _slow_first_handler(0.5)
+        stub_client(client, handler)
+        started = time.monotonic()
+        assert client.typeahead(q="star").json() == {"terms": ["hedge"]}
+        assert time.monotonic() - started < 0.4
+        assert len(calls) == 2
+        assert policy.stats() == {"requests": 1, "hedges": 1, "hedges_won": 1}
+
+    def test_fast_response_is_not_hedged(self):
+        client = podcast_api.Client(hedge=True)
+        handler, calls = _slow_first_handler(0)
+        stub_client(client, handler)
+        assert client.typeahead(q="star").json() == {"terms": ["first"]}
+        client.search(q="star")
+        assert calls == ["/api/v2/typeahead", "/api/v2/search"]
+        assert client.hedge_policy.stats()["hedges"] == 0
+
+    def test_no_hedge_without_rate_limit_token(self):
+        client = podcast_api.Client(
+            hedge=hedging.HedgePolicy(initial_delay=0.01),
+            rate_limit=ratelimit.TokenBucket(rate=1),
+        )
+        handler, calls = _slow_first_handler(0.1)
+        stub_client(client, handler)
+        assert client.typeahead(q="star").json() == {"terms": ["first"]}
+        assert len(calls) == 1
+
+    def test_async_hedge_wins(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(request.url.path)
+            if len(calls) == 1:
+                await asyncio.sleep(0.5)
+            return httpx.Response(200, json={"n": len(calls)})
+
+        policy = hedging.HedgePolicy(initial_delay=0.02)
+
+        async def main():
+            client = podcast_api.AsyncClient()
+            client.http_client = http_utils.AsyncRequest(
+                transport=httpx.MockTransport(handler), hedge_policy=policy
+            )
+            async with client:
+                return await client.spellcheck(q="stra wars")
+
+        started = time.monotonic()
+        assert asyncio.run(main()).json() == {"n": 2}
+        assert time.monotonic() - started < 0.4
+        assert policy.stats()["hedges_won"] == 1
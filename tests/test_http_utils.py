@@ -0,0 +1,136 @@
+import asyncio
+import json
+import socket
+import threading
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from listennotes import endpoints, podcast_api, transport
+from tests.utils import stub_client
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _local_client(server, **kwargs):
+    client = podcast_api.Client(**kwargs)
+    client.api_base = "http://127.0.0.1:%s/api/v2" % server.server_port
+    return client
+
+
+class TestConnectionPool(object):
+    def test_pool_stats_count_reused_connections(self, server):
+        client = _local_client(server)
+        for _ in range(5):
+            client.just_listen()
+        assert client.pool_stats() == {
+            "requests": 5,
+            "new_connections": 1,
+            "reused_connections": 4,
+            "discarded_connections": 0,
+        }
+
+    def test_async_pool_stats_count_reused_connections(self, server):
+        async def main():
+            client = podcast_api.AsyncClient()
+            client.api_base = "http://127.0.0.1:%s/api/v2" % (
+                server.server_port
+            )
+            for _ in range(5):
+                await client.just_listen()
+            await client.aclose()
+            return client.pool_stats()
+
+        assert asyncio.run(main()) == {
+            "requests": 5,
+            "new_connections": 1,
+            "reused_connections": 4,
+            "discarded_connections": 0,
+        }
+
+    def test_pool_maxsize(self, server):
+        def run(client, threads):
+            with futures.ThreadPoolExecutor(threads) as executor:
+                list(executor.map(lambda i: client.just_listen(), range(60)))
+            return client.pool_stats()
+
+        stats = run(_local_client(server, pool_maxsize=2), 16)
+        assert stats["discarded_connections"] > 0
+
+        stats = run(_local_client(server, pool_maxsize=16), 16)
+        assert stats["discarded_connections"] == 0
+        assert stats["new_connections"] <= 16
+
+        stats = run(_local_client(server, pool_maxsize=2, pool_block=True), 16)
+        assert stats["discarded_connections"] == 0
+        assert stats["new_connections"] <= 2
+
+    def test_pool_maxsize_is_default_concurrency(self):
+        assert podcast_api.Client().max_workers == 10
+        assert podcast_api.Client(pool_maxsize=64).max_workers == 64
+
+    def test_tcp_keepalive(self):
+        options = transport.keepalive_socket_options()
+        assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in options
+        adapter = podcast_api.Client(tcp_keepalive=True).http_client.adapter
+        assert adapter.poolmanager.connection_pool_kw["socket_options"] == (
+            options
+        )
+
+    def test_custom_adapter(self):
+        adapter = transport.PoolingHTTPAdapter(pool_maxsize=3)
+        client = podcast_api.Client(adapter=adapter)
+        assert client.http_client.session.get_adapter("https://") is adapter
+
+
+class TestTimeouts(object):
+    def test_endpoint_timeouts(self):
+        client = podcast_api.Client(
+            timeout=(3, 20), endpoint_timeouts={"/typeahead": (1, 2)}
+        )
+        timeouts = []
+
+        def handler(request):
+            return {}
+
+        adapter = stub_client(client, handler)
+        send = adapter.send
+        adapter.send = lambda request, **kwargs: (
+            timeouts.append(kwargs["timeout"]) or send(request, **kwargs)
+        )
+        client.typeahead(q="star")
+        client.search(q="star")
+        assert timeouts == [(1, 2), (3, 20)]
+
+    def test_endpoint_map(self):
+        endpoint_map = endpoints.EndpointMap(
+            {"/podcasts/{id}": 1, "/podcasts/{id}/recommendations": 2}
+        )
+        base = "https://listen-api.listennotes.com/api/v2"
+        assert endpoint_map.get(base + "/podcasts/abc") == 1
+        assert endpoint_map.get(base + "/podcasts/abc/recommendations") == 2
+        assert endpoint_map.get(base + "/episodes/abc", 3) == 3
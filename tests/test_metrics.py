@@ -0,0 +1,193 @@
+import pytest
+from requests import exceptions
+
+from listennotes import endpoints, metrics, podcast_api, retry
+from listennotes.errors import NotFoundError
+from tests.utils import stub_client
+
+
+class _FakeInstrument(object):
+    def __init__(self):
+        self.records = []
+
+    def record(self, value, attributes):
+        self.records.append((value, attributes))
+
+    add = record
+
+
+class _FakeMeter(object):
+    def __init__(self):
+        self.instruments = {}
+
+    def create_histogram(self, name, **kwargs):
+        return self.instruments.setdefault(name, _FakeInstrument())
+
+    create_counter = create_histogram
+
+
+class TestHistogram(object):
+    def test_quantiles(self):
+        histogram = metrics.Histogram()
+        assert histogram.quantile(0.5) is None
+        for i in range(1, 101):
+            histogram.observe(i / 100.0)
+        assert histogram.count == 100
+        assert histogram.max == 1
+        assert 0.4 <= histogram.quantile(0.5) <= 0.5
+        assert 0.75 <= histogram.quantile(0.95) <= 1
+        assert histogram.quantile(1) == 1
+        counts = dict(histogram.cumulative_counts())
+        assert counts[0.1] == 10
+        assert counts[float("inf")] == 100
+
+    def test_above_last_bucket(self):
+        histogram = metrics.Histogram(buckets=(1, 2))
+        histogram.observe(10)
+        assert 2 <= histogram.quantile(0.99) <= 10
+
+
+class TestHooks(object):
+    def test_empty_hooks_are_falsy(self):
+        hooks = metrics.Hooks()
+        assert not hooks
+        callback = lambda event: None  # noqa: E731
+        hooks.add("on_retry", callback)
+        assert hooks
+        hooks.remove("on_retry", callback)
+        assert not hooks
+        with pytest.raises(ValueError):
+            hooks.add("on_success", callback)
+
+    def test_no_events_without_hooks(self, monkeypatch):
+        def fail(*args):
+            raise AssertionError("RequestEvent created")
+
+        monkeypatch.setattr(metrics, "RequestEvent", fail)
+        client = podcast_api.Client()
+        stub_client(client, lambda request: {"id": "abc"})
+        assert client.fetch_podcast_by_id(id="abc").json() == {"id": "abc"}
+
+    def test_events(self):
+        events = []
+        client = podcast_api.Client(
+            retry_policy=retry.RetryPolicy(base_delay=0.001, max_delay=0.01),
+            hooks={
+                event: (lambda event, name=event: events.append((name, event)))
+                for event in metrics.EVENTS
+            },
+        )
+        responses = iter([(503, {}, {}), {"id": "abc"}])
+        stub_client(client, lambda request: next(responses))
+        client.fetch_podcast_by_id(id="abc")
+        assert [name for name, _ in events] == [
+            "before_request",
+            "after_response",
+            "on_retry",
+            "before_request",
+            "after_response",
+        ]
+        retried = events[2][1]
+        assert retried.endpoint == "/podcasts/{id}"
+        assert retried.response.status_code == 503
+        assert retried.attempt == 0 and retried.delay <= 0.01
+        assert events[4][1].attempt == 1
+        assert events[4][1].elapsed >= 0
+
+    def test_on_error(self):
+        errors = []
+        client = podcast_api.Client(hooks={"on_error": errors.append})
+
+        def handler(request):
+            raise exceptions.ConnectionError("refused")
+
+        stub_client(client, handler)
+        with pytest.raises(exceptions.ConnectionError):
+            client.fetch_podcast_genres()
+        assert len(errors) == 1
+        assert isinstance(errors[0].error, exceptions.ConnectionError)
+        assert errors[0].response is None
+
+
+class TestMetricsCollector(object):
+    def test_client_metrics(self):
+        client = podcast_api.Client(metrics=True)
+
+        def handler(request):
+            if "missing" in request.url:
+                return (404, {}, {})
+            return {"id": "abc", "title": "x" * 100}
+
+        stub_client(client, handler)
+        for _ in range(3):
+            client.fetch_podcast_by_id(id="abc")
+        with pytest.raises(NotFoundError):
+            client.fetch_podcast_by_id(id="missing")
+        client.batch_fetch_episodes(ids="1,2")
+
+        snapshot = client.metrics.snapshot()
+        assert set(snapshot) == {"GET /podcasts/{id}", "POST /episodes"}
+        stats = snapshot["GET /podcasts/{id}"]
+        assert stats["count"] == 4
+        assert stats["statuses"] == {200: 3, 404: 1}
+        assert stats["response_bytes"] > 300
+        assert stats["p50"] <= stats["p95"] <= stats["p99"] <= stats["max"]
+        assert snapshot["POST /episodes"]["request_bytes"] == len("ids=1%2C2")
+
+        client.metrics.reset()
+        assert client.metrics.snapshot() == {}
+
+    def test_to_prometheus(self):
+        collector = metrics.MetricsCollector(buckets=(0.1, 1))
+        client = podcast_api.Client(metrics=collector)
+        stub_client(client, lambda request: {})
+        client.fetch_podcast_genres()
+        text = collector.to_prometheus()
+        labels = 'method="GET",endpoint="/genres"'
+        assert "# TYPE listennotes_request_duration_seconds histogram" in text
+        assert (
+            'listennotes_request_duration_seconds_bucket{%s,le="+Inf"} 1'
+            % labels
+        ) in text
+        assert "listennotes_request_duration_seconds_count{%s} 1" % labels in (
+            text
+        )
+        assert (
+            'listennotes_responses_total{%s,status="200"} 1' % labels in text
+        )
+        assert "listennotes_response_bytes_total{%s} 2" % labels in text
+
+    def test_opentelemetry(self):
+        meter = _FakeMeter()
+        client = podcast_api.Client()
+        client.hooks.register(metrics.OpenTelemetryMetrics(meter))
+        stub_client(client, lambda request: {})
+        client.fetch_episode_by_id(id="abc")
+        [(duration, attributes)] = meter.instruments[
+            "http.client.request.duration"
+        ].records
+        assert duration >= 0
+        assert attributes == {
+            "http.request.method": "GET",
+            "url.template": "/episodes/{id}",
+            "http.response.status_code": 200,
+        }
+
+
+@pytest.mark.parametrize(
+    "url, name",
+    [
+        ("https://x/api/v2/podcasts/abc", "/podcasts/{id}"),
+        ("https://x/api/v2/podcasts", "/podcasts"),
+        ("https://x/api/v2/podcasts/submit", "/podcasts/submit"),
+        ("https://x/api/v2/podcasts/abc/audience", "/podcasts/{id}/audience"),
+        (
+            "https://x/api/v2/podcasts/domains/a.com",
+            "/podcasts/domains/{domain_name}",
+        ),
+        ("https://x/api/v2/search?q=a", "/search"),
+        ("https://x/other", "/other"),
+    ],
+)
+def test_endpoint_name(url, name):
+    assert endpoints.endpoint_name(url) == name
@@ -0,0 +1,143 @@
+import json
+import pickle
+import tracemalloc
+
+import pytest
+
+from listennotes import models, podcast_api
+from tests.utils import stub_client
+
+PODCAST = {
+    "id": "4d3fe717742d4963a85562e9f84d8c79",
+    "title": "Star Wars 7x7",
+    "publisher": "Allen Voivod",
+    "total_episodes": 2,
+    "genre_ids": [86, 160],
+    "next_episode_pub_date": 1479110402000,
+    "a_new_field": "new",
+    "episodes": [
+        {"id": "e1", "title": "Episode 1", "pub_date_ms": 1479110402000},
+        {"id": "e2", "title": "Episode 2", "pub_date_ms": 1479110302000},
+    ],
+}
+
+
+class TestModels(object):
+    def test_fields(self):
+        podcast = models.Podcast(PODCAST)
+        assert podcast.id == PODCAST["id"]
+        assert podcast.genre_ids == [86, 160]
+        assert podcast.website is None
+        assert podcast.a_new_field == "new"
+        assert repr(podcast) == "<Podcast id=%r>" % PODCAST["id"]
+        with pytest.raises(AttributeError):
+            podcast.no_such_field
+        with pytest.raises(AttributeError):
+            podcast.__dict__
+
+    def test_nested_fields_are_decoded_lazily(self):
+        podcast = models.Podcast(PODCAST)
+        assert isinstance(podcast._episodes, bytes)
+        episodes = podcast.episodes
+        assert [type(e) for e in episodes] == [models.Episode] * 2
+        assert episodes[1].title == "Episode 2"
+        assert podcast.episodes is episodes
+        # The json is dropped once converted
+        assert podcast._episodes is episodes
+
+        episode = models.Episode({"id": "e1", "podcast": {"id": "p1"}})
+        assert episode.podcast.id == "p1"
+
+    def test_to_dict_round_trip(self):
+        podcast = models.Podcast(PODCAST)
+        podcast.episodes
+        data = podcast.to_dict()
+        assert data["episodes"] == [
+            models.Episode(e).to_dict() for e in PODCAST["episodes"]
+        ]
+        assert data["a_new_field"] == "new"
+        assert models.Podcast(data) == podcast
+        assert pickle.loads(pickle.dumps(podcast)) == podcast
+
+    def test_to_dict_without_access(self):
+        data = models.Podcast(PODCAST).to_dict()
+        assert [e["title"] for e in data["episodes"]] == [
+            "Episode 1",
+            "Episode 2",
+        ]
+
+    def test_smaller_than_dicts(self):
+        def podcast(p):
+            return {
+                "id": "p%s" % p,
+                "title": "Podcast %s" % p,
+                "episodes": [
+                    {
+                        "id": "%032x" % (p * 100 + i),
+                        "title": "Episode %s" % i,
+                        "description": "<p>%s</p>" % ("Words. " * 40),
+                        "pub_date_ms": 1479110402000 + i,
+                        "audio": "https://www.listennotes.com/e/p/%s/" % i,
+                        "audio_length_sec": 1234,
+                        "explicit_content": False,
+                    }
+                    for i in range(50)
+                ],
+            }
+
+        contents = [json.dumps(podcast(p)).encode() for p in range(50)]
+
+        def retained(build):
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            cache = build()
+            size = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            del cache
+            return size
+
+        dicts = retained(lambda: [json.loads(c) for c in contents])
+        podcasts = retained(
+            lambda: [models.Podcast(json.loads(c)) for c in contents]
+        )
+        assert podcasts < dicts * 0.6
+
+    def test_playlist_items(self):
+        playlist = models.Playlist(
+            {
+                "id": "pl",
+                "items": [
+                    {"id": 1, "type": "episode", "data": {"id": "e1"}},
+                    {"id": 2, "type": "podcast", "data": {"id": "p1"}},
+                ],
+            }
+        )
+        items = playlist.items
+        assert isinstance(items[0].data, models.Episode)
+        assert isinstance(items[1].data, models.Podcast)
+        assert (
+            items[1].to_dict()["data"]
+            == models.Podcast({"id": "p1"}).to_dict()
+        )
+
+    def test_parse(self):
+        client = podcast_api.Client()
+        stub_client(
+            client,
+            lambda request: {
+                "results": [{"id": "r1", "podcast": {"id": "p1"}}],
+                "next_offset": 10,
+            },
+        )
+        search = models.parse(client.search(q="star wars"))
+        assert isinstance(search, models.SearchResponse)
+        assert search.results[0].podcast.id == "p1"
+        assert search.next_offset == 10
+
+        stub_client(client, lambda request: PODCAST)
+        podcast = models.parse(client.fetch_podcast_by_id(id="abc"))
+        assert isinstance(podcast, models.Podcast)
+        batch = models.parse(client.batch_fetch_podcasts(ids="abc"))
+        assert isinstance(batch, models.BatchPodcasts)
+        with pytest.raises(ValueError):
+            models.parse(client.fetch_podcast_genres())
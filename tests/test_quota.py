@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+from listennotes import podcast_api, quota
+from tests.utils import stub_client
+
+NEXT_BILLING_DATE = "2030-01-01T00:00:00+00:00"
+
+
+def _quota_headers(usage, free_quota=1000):
+    return {
+        "X-ListenAPI-FreeQuota": str(free_quota),
+        "X-ListenAPI-Usage": str(usage),
+        "X-ListenAPI-NextBillingDate": NEXT_BILLING_DATE,
+    }
+
+
+class TestUsageTracker(object):
+    def test_parse_quota_headers(self):
+        assert quota.parse_quota_headers(_quota_headers(5)) == (
+            1000,
+            5,
+            datetime(2030, 1, 1, tzinfo=timezone.utc),
+        )
+        assert quota.parse_quota_headers({"X-ListenAPI-Usage": "x"}) == (
+            None,
+            None,
+            None,
+        )
+
+    def test_projected_exhaustion(self):
+        tracker = quota.UsageTracker()
+        assert tracker.remaining is None
+        assert tracker.projected_exhaustion() is None
+        tracker.record(1000, 100, now=0)
+        assert tracker.rate() is None
+        tracker.record(1000, 200, now=100)
+        assert tracker.remaining == 800
+        assert tracker.fraction_used == 0.2
+        assert tracker.rate() == 1
+        assert tracker.projected_exhaustion() == datetime(
+            1970, 1, 1, tzinfo=timezone.utc
+        ) + timedelta(seconds=900)
+
+        tracker.next_billing_date = datetime(
+            1970, 1, 1, 1, tzinfo=timezone.utc
+        )
+        assert tracker.will_exhaust_before_reset()
+
+    def test_rate_window(self):
+        tracker = quota.UsageTracker(window=60)
+        tracker.record(1000, 0, now=0)
+        tracker.record(1000, 100, now=50)
+        tracker.record(1000, 110, now=100)
+        assert tracker.rate() == 0.2
+
+    def test_ignores_out_of_order_updates(self):
+        tracker = quota.UsageTracker()
+        tracker.record(1000, 200, now=100)
+        tracker.record(1000, 190, now=99)
+        assert tracker.usage == 200
+
+    def test_thresholds(self):
+        crossed = []
+        tracker = quota.UsageTracker()
+        tracker.add_threshold(0.5, lambda f, t: crossed.append((f, t.usage)))
+        tracker.add_threshold(0.9, lambda f, t: crossed.append((f, t.usage)))
+        for now, usage in enumerate([100, 500, 600, 950, 960]):
+            tracker.record(1000, usage, now=now)
+        assert crossed == [(0.5, 500), (0.9, 950)]
+
+        # A new billing period resets the usage, and re-arms thresholds
+        tracker.record(1000, 0, now=10)
+        tracker.record(1000, 700, now=11)
+        assert crossed[-1] == (0.5, 700)
+
+    def test_client_usage_tracker(self):
+        client = podcast_api.Client(usage_tracker=True)
+        usage = iter(range(10, 20))
+        stub_client(
+            client, lambda request: (200, {}, _quota_headers(next(usage)))
+        )
+        client.fetch_podcast_genres()
+        client.fetch_podcast_genres()
+        snapshot = client.usage_tracker.snapshot()
+        assert snapshot["usage"] == 11
+        assert snapshot["remaining"] == 989
+        assert snapshot["next_billing_date"].year == 2030
@@ -0,0 +1,106 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from listennotes import podcast_api, ratelimit
+from listennotes.errors import RateLimitError
+from tests.utils import stub_client
+
+
+class _Response(object):
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestRateLimiter(object):
+    def test_token_bucket_paces_requests(self):
+        bucket = ratelimit.TokenBucket(rate=50, capacity=1)
+        start = time.monotonic()
+        for _ in range(11):
+            bucket.acquire()
+        assert time.monotonic() - start >= 0.18
+
+    def test_token_bucket_is_shared_across_threads(self):
+        bucket = ratelimit.TokenBucket(rate=100, capacity=5)
+        start = time.monotonic()
+        threads = [
+            threading.Thread(
+                target=lambda: [bucket.acquire() for _ in range(5)]
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 25 requests, 5 of them in the initial burst
+        assert time.monotonic() - start >= 0.18
+
+    def test_try_acquire(self):
+        bucket = ratelimit.TokenBucket(rate=1, capacity=2)
+        assert bucket.try_acquire()
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        limiter = ratelimit.RateLimiter(rate=10)
+        limiter.update(_Response(429, {"Retry-After": "5"}))
+        assert not limiter.try_acquire()
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            ratelimit.TokenBucket(rate=0)
+
+    def test_rate_limiter_backs_off_on_429(self):
+        limiter = ratelimit.RateLimiter(rate=10)
+        limiter.update(_Response(429, {"Retry-After": "0.2"}))
+        assert limiter.rate == 5
+        assert limiter.reserve() >= 0.15
+        for _ in range(100):
+            limiter.update(_Response(200))
+        assert limiter.rate == 10
+
+    def test_rate_limiter_paces_to_quota(self):
+        next_billing_date = datetime.now(timezone.utc) + timedelta(days=1)
+        headers = {
+            "X-ListenAPI-FreeQuota": "10000",
+            "X-ListenAPI-Usage": "1360",
+            "X-ListenAPI-NextBillingDate": next_billing_date.isoformat(),
+        }
+        limiter = ratelimit.RateLimiter(rate=10, pace_to_quota=True)
+        limiter.update(_Response(200, headers))
+        assert limiter.rate == pytest.approx(0.1, rel=0.01)
+
+        limiter = ratelimit.RateLimiter(rate=10)
+        limiter.update(_Response(200, headers))
+        assert limiter.rate == 10
+
+    def test_client_rate_limit(self):
+        client = podcast_api.Client(
+            rate_limit=ratelimit.RateLimiter(rate=20, capacity=1)
+        )
+        responses = iter([(429, {}, {"Retry-After": "0"})] + [{}] * 10)
+        adapter = stub_client(client, lambda request: next(responses))
+        with pytest.raises(RateLimitError):
+            client.just_listen()
+        assert client.http_client.rate_limiter.rate == 10
+
+        start = time.monotonic()
+        for _ in range(5):
+            client.just_listen()
+        assert time.monotonic() - start >= 0.25
+        assert len(adapter.requests) == 6
+
+    def test_shared_token_bucket(self, tmp_path):
+        path = str(tmp_path / "budget.db")
+        a = ratelimit.SharedTokenBucket(path, rate=2, capacity=1)
+        b = ratelimit.SharedTokenBucket(path, rate=2, capacity=1)
+        assert a.try_acquire()
+        assert not b.try_acquire()
+        assert 0.4 < b.reserve() <= 0.5
+
+        time.sleep(1)
+        b.update(_Response(429, {"Retry-After": "1"}))
+        assert not a.try_acquire()
+        assert 0.9 < a.reserve() <= 1
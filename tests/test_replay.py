@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+from listennotes import podcast_api, replay, stub_server
+from listennotes.errors import ListenApiError, RateLimitError
+
+
+@pytest.fixture
+def server():
+    with stub_server.StubServer() as the_server:
+        yield the_server
+
+
+def _client(api_base, **kwargs):
+    client = podcast_api.Client(**kwargs)
+    client.api_base = api_base
+    return client
+
+
+class TestReplayAdapter(object):
+    def test_record_then_replay(self, server, tmp_path):
+        cassette = str(tmp_path / "cassette.jsonl")
+        client = _client(
+            server.api_base,
+            adapter=replay.ReplayAdapter(cassette, mode="record"),
+        )
+        podcast = client.fetch_podcast_by_id(id="abc", sort="recent").json()
+        episodes = client.batch_fetch_episodes(ids="1,2").json()
+        assert server.requests == 2
+        server.stop()
+
+        # The stub server is down, and the api base doesn't matter
+        client = _client(
+            "https://listen-api.listennotes.com/api/v2",
+            adapter=replay.ReplayAdapter(cassette),
+        )
+        assert client.fetch_podcast_by_id(sort="recent", id="abc").json() == (
+            podcast
+        )
+        response = client.batch_fetch_episodes(ids="1,2")
+        assert response.json() == episodes
+        assert response.headers["X-ListenAPI-Usage"] == "2"
+        with pytest.raises(replay.InteractionNotFound):
+            client.fetch_podcast_by_id(id="abc")
+
+    def test_replays_in_recorded_order(self, server, tmp_path):
+        cassette = str(tmp_path / "cassette.jsonl")
+        client = _client(
+            server.api_base,
+            adapter=replay.ReplayAdapter(cassette, mode="record"),
+        )
+        for _ in range(2):
+            client.fetch_podcast_genres()
+
+        client = _client(
+            server.api_base, adapter=replay.ReplayAdapter(cassette)
+        )
+        usage = [
+            client.fetch_podcast_genres().headers["X-ListenAPI-Usage"]
+            for _ in range(3)
+        ]
+        assert usage == ["1", "2", "2"]
+
+    def test_once(self, server, tmp_path):
+        cassette = str(tmp_path / "cassette.jsonl")
+        adapter = replay.ReplayAdapter(cassette, mode="once")
+        client = _client(server.api_base, adapter=adapter)
+        client.fetch_episode_by_id(id="a")
+        client.fetch_episode_by_id(id="a")
+        client.fetch_episode_by_id(id="b")
+        assert server.requests == 2
+        assert len(replay.load_interactions(cassette)) == 2
+
+    def test_invalid_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            replay.ReplayAdapter(str(tmp_path / "c.jsonl"), mode="replace")
+
+
+class TestStubServer(object):
+    def test_synthetic_payloads(self, server):
+        client = _client(server.api_base)
+        podcast = client.fetch_podcast_by_id(id="abc").json()
+        assert podcast["id"] == "abc"
+        assert len(podcast["episodes"]) == 10
+        assert [
+            e["id"] for e in client.batch_fetch_all_episodes(["1", "2", "3"])
+        ] == ["1", "2", "3"]
+        assert len(list(client.iter_search_results(q="a"))) == 100
+
+    def test_replays_cassette(self, tmp_path):
+        cassette = str(tmp_path / "cassette.jsonl")
+        with open(cassette, "w") as f:
+            f.write(
+                '{"key": "GET /api/v2/genres? ", "status": 200, '
+                '"headers": {}, "text": "{\\"genres\\": []}"}\n'
+            )
+        with stub_server.StubServer(cassette=cassette) as server:
+            client = _client(server.api_base, usage_tracker=True)
+            assert client.fetch_podcast_genres().json() == {"genres": []}
+            assert client.usage_tracker.usage == 1
+
+    def test_latency_and_failures(self):
+        with stub_server.StubServer(
+            latency=0.05, rate_limit_rate=1, retry_after=0
+        ) as server:
+            client = _client(server.api_base)
+            started = time.monotonic()
+            with pytest.raises(RateLimitError) as e:
+                client.fetch_episode_by_id(id="a")
+            assert time.monotonic() - started >= 0.05
+            assert e.value.response.headers["Retry-After"] == "0"
+
+        with stub_server.StubServer(error_rate=1) as server:
+            with pytest.raises(ListenApiError):
+                _client(server.api_base).fetch_episode_by_id(id="a")
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+from requests import exceptions
+
+from listennotes import podcast_api, retry
+from listennotes.errors import ListenApiError, RateLimitError
+from tests.utils import stub_client
+
+
+class _Response(object):
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def _fast_policy(**kwargs):
+    return retry.RetryPolicy(base_delay=0.001, max_delay=0.01, **kwargs)
+
+
+class TestRetryPolicy(object):
+    def test_next_delay(self):
+        policy = retry.RetryPolicy(max_retries=2, base_delay=1, max_delay=3)
+        for retries in range(2):
+            delay = policy.next_delay("get", retries, 0, _Response(503))
+            assert 0 <= delay <= min(3, 2**retries)
+        assert policy.next_delay("GET", 2, 0, _Response(503)) is None
+        assert policy.next_delay("GET", 0, 0, _Response(404)) is None
+        assert policy.next_delay("POST", 0, 0, _Response(503)) is None
+        assert policy.next_delay("GET", 0, 0) is not None
+
+    def test_retry_after(self):
+        policy = retry.RetryPolicy(max_delay=5)
+        response = _Response(429, {"Retry-After": "2"})
+        assert policy.next_delay("GET", 0, 0, response) == 2
+        response = _Response(429, {"Retry-After": "60"})
+        assert policy.next_delay("GET", 0, 0, response) is None
+        policy = retry.RetryPolicy(respect_retry_after=False, max_delay=1)
+        assert policy.next_delay("GET", 0, 0, response) <= 1
+
+    def test_deadline(self):
+        policy = retry.RetryPolicy(deadline=10)
+        response = _Response(429, {"Retry-After": "2"})
+        assert policy.next_delay("GET", 0, 7, response) == 2
+        assert policy.next_delay("GET", 0, 8.5, response) is None
+        assert policy.timeout(30, 8) == 2
+        assert policy.timeout((5, 30), 8) == (2, 2)
+        assert retry.RetryPolicy().timeout(30, 8) == 30
+
+    def test_client_retries_get(self):
+        client = podcast_api.Client(retry_policy=_fast_policy())
+        responses = iter([(503, {}, {}), (429, {}, {}), {"id": "abc"}])
+        adapter = stub_client(client, lambda request: next(responses))
+        response = client.fetch_podcast_by_id(id="abc")
+        assert response.json() == {"id": "abc"}
+        assert response.retries == 2
+        assert len(adapter.requests) == 3
+
+    def test_client_gives_up(self):
+        client = podcast_api.Client(retry_policy=_fast_policy(max_retries=2))
+        adapter = stub_client(client, lambda request: (429, {}, {}))
+        with pytest.raises(RateLimitError) as excinfo:
+            client.search(q="dummy")
+        assert excinfo.value.response.retries == 2
+        assert len(adapter.requests) == 3
+
+    def test_client_does_not_retry_post(self):
+        client = podcast_api.Client(retry_policy=_fast_policy())
+        adapter = stub_client(client, lambda request: (500, {}, {}))
+        with pytest.raises(ListenApiError):
+            client.submit_podcast(rss="http://myrss.com/rss")
+        assert len(adapter.requests) == 1
+
+    def test_client_retries_timeouts(self):
+        client = podcast_api.Client(retry_policy=_fast_policy())
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                raise exceptions.ReadTimeout("timed out")
+            return {}
+
+        stub_client(client, handler)
+        assert client.just_listen().retries == 1
+
+    def test_client_deadline(self):
+        policy = retry.RetryPolicy(max_retries=100, deadline=0.3)
+        client = podcast_api.Client(retry_policy=policy)
+        stub_client(client, lambda request: (503, {}, {"Retry-After": "0.1"}))
+        start = time.monotonic()
+        with pytest.raises(ListenApiError):
+            client.just_listen()
+        assert time.monotonic() - start < 0.3
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from listennotes import podcast_api, scheduler
+from tests.utils import path_of, stub_client
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _start(func, *args):
+    thread = threading.Thread(target=func, args=args)
+    thread.start()
+    return thread
+
+
+def _waiting(the_scheduler):
+    return sum(s["waiting"] for s in the_scheduler.stats().values())
+
+
+class TestScheduler(object):
+    def test_classify(self):
+        the_scheduler = scheduler.Scheduler(4)
+        api = "https://listen-api.listennotes.com/api/v2"
+        assert the_scheduler.classify(api + "/typeahead").name == "interactive"
+        assert the_scheduler.classify(api + "/podcasts/abc").name == "default"
+        with scheduler.priority("bulk"):
+            assert scheduler.current_priority() == "bulk"
+            assert the_scheduler.classify(api + "/search").name == "bulk"
+        with scheduler.priority("urgent"):
+            with pytest.raises(ValueError):
+                the_scheduler.classify(api + "/search")
+
+    def test_higher_priority_jumps_the_queue(self):
+        the_scheduler = scheduler.Scheduler(1)
+        order = []
+        blocker = the_scheduler.acquire("/podcasts/a")
+
+        def request(url, name):
+            with scheduler.priority(name):
+                with the_scheduler.slot(url):
+                    order.append(name)
+
+        threads = [_start(request, "/podcasts/b", "bulk")]
+        _wait_for(lambda: _waiting(the_scheduler) == 1)
+        threads.append(_start(request, "/podcasts/c", "default"))
+        _wait_for(lambda: _waiting(the_scheduler) == 2)
+        threads.append(_start(request, "/typeahead", "interactive"))
+        _wait_for(lambda: _waiting(the_scheduler) == 3)
+
+        the_scheduler.release(blocker)
+        for thread in threads:
+            thread.join()
+        assert order == ["interactive", "default", "bulk"]
+        stats = the_scheduler.stats()
+        assert stats["bulk"]["completed"] == 1
+        assert stats["default"]["completed"] == 2
+
+    def test_class_concurrency_leaves_room_for_others(self):
+        the_scheduler = scheduler.Scheduler(4)
+
+        def acquire_bulk():
+            with scheduler.priority("bulk"):
+                return the_scheduler.acquire("/podcasts/a")
+
+        bulk = [acquire_bulk() for _ in range(2)]
+        thread = _start(acquire_bulk)
+        _wait_for(lambda: _waiting(the_scheduler) == 1)
+        # Bulk can only take 2 of the 4 slots
+        assert the_scheduler.acquire("/search").name == "interactive"
+        assert the_scheduler.in_flight == 3
+        the_scheduler.release(bulk[0])
+        thread.join()
+        assert the_scheduler.stats()["bulk"]["in_flight"] == 2
+
+    def test_class_rate(self):
+        the_scheduler = scheduler.Scheduler(
+            4, classes=[scheduler.PriorityClass("default", 0, rate=20)]
+        )
+        started = time.monotonic()
+        for _ in range(22):
+            the_scheduler.release(the_scheduler.acquire("/genres"))
+        assert time.monotonic() - started >= 0.09
+
+
+class TestClientScheduler(object):
+    def test_interactive_calls_jump_ahead_of_crawls(self):
+        client = podcast_api.Client(scheduler=True, pool_maxsize=1)
+        gate = threading.Event()
+        paths = []
+
+        def handler(request):
+            paths.append(path_of(request))
+            if len(paths) == 1:
+                gate.wait(5)
+            return {}
+
+        stub_client(client, handler)
+
+        def crawl():
+            with client.priority("bulk"):
+                for _ in client.fetch_many(
+                    "fetch_podcast_by_id", ["a", "b"], max_workers=2
+                ):
+                    pass
+
+        threads = [_start(crawl)]
+        _wait_for(lambda: _waiting(client.scheduler) == 1)
+        threads.append(_start(client.typeahead))
+        _wait_for(lambda: _waiting(client.scheduler) == 2)
+        gate.set()
+        for thread in threads:
+            thread.join()
+        assert paths[1] == "/api/v2/typeahead"
+        assert client.scheduler.stats()["bulk"]["completed"] == 2
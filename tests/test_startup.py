@@ -0,0 +1,72 @@
+import subprocess
+import sys
+import threading
+
+from listennotes import http_utils, podcast_api
+from tests.utils import stub_client
+
+# Modules only needed once a request is sent, or by AsyncClient
+DEFERRED = ("requests", "urllib3", "httpx", "asyncio", "sqlite3", "orjson")
+
+
+def _python(code, *options):
+    return subprocess.run(
+        [sys.executable] + list(options) + ["-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+class TestStartup(object):
+    def test_deferred_imports(self):
+        loaded = _python(
+            "import sys\n"
+            "from listennotes import podcast_api\n"
+            "podcast_api.Client()\n"
+            "podcast_api.Client(api_key='key', cache=True, retry_policy=True)\n"
+            "podcast_api.shared_client()\n"
+            "print(' '.join(sys.modules))"
+        ).stdout.split()
+        assert [m for m in DEFERRED if m in loaded] == []
+
+    def test_session_is_created_on_first_use(self):
+        client = podcast_api.Client(api_key="key", cache=True)
+        assert client.http_client._session is None
+        assert client.http_client.session is client.http_client.session
+
+    def test_session_created_once(self):
+        request = http_utils.Request()
+        sessions = []
+        threads = [
+            threading.Thread(target=lambda: sessions.append(request.session))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(set(map(id, sessions))) == 1
+        assert request.session.get_adapter("https://") is request.adapter
+
+    def test_first_request(self):
+        client = podcast_api.Client()
+        stub_client(client, lambda request: {"genres": []})
+        assert client.fetch_podcast_genres().json() == {"genres": []}
+        assert client.pool_stats() is not None
+
+
+class TestSharedClient(object):
+    def test_shared(self, monkeypatch):
+        monkeypatch.setattr(podcast_api, "_shared", None)
+        monkeypatch.setattr(podcast_api, "api_key", "key")
+        client = podcast_api.shared_client(timeout=5)
+        assert podcast_api.shared_client() is client
+        assert client.request_headers["X-ListenAPI-Key"] == "key"
+        assert client.http_client.timeout == 5
+
+    def test_new_client_after_fork(self, monkeypatch):
+        monkeypatch.setattr(podcast_api, "_shared", None)
+        client = podcast_api.shared_client()
+        monkeypatch.setattr(podcast_api.os, "getpid", lambda: -1)
+        assert podcast_api.shared_client() is not client
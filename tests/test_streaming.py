@@ -0,0 +1,175 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from listennotes import errors, http_utils, podcast_api, streaming
+from tests.utils import stub_client
+
+PODCAST = {
+    "id": "abc",
+    "description": "x" * 1000,
+    "episodes": [
+        {"id": i, "title": "Épisode ☃ %s" % i, "audio_length_sec": 12345}
+        for i in range(100)
+    ],
+    "next_episode_pub_date": 1479110402000,
+    "genre_ids": [86, 160],
+}
+
+
+class _Response(object):
+    def __init__(self, content, chunk_size):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), self.chunk_size):
+            end = i + self.chunk_size
+            yield self.content[i:end]
+
+    def close(self):
+        self.closed = True
+
+
+class _AsyncResponse(_Response):
+    async def aiter_bytes(self, chunk_size):
+        for chunk in self.iter_content(chunk_size):
+            yield chunk
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestItemStream(object):
+    @pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+    def test_chunk_boundaries(self, chunk_size):
+        content = json.dumps(PODCAST, ensure_ascii=False).encode("utf-8")
+        stream = streaming.ItemStream(
+            _Response(content, chunk_size), "episodes"
+        )
+        assert list(stream) == PODCAST["episodes"]
+        assert stream.fields == {
+            "id": "abc",
+            "description": "x" * 1000,
+            "next_episode_pub_date": 1479110402000,
+            "genre_ids": [86, 160],
+        }
+
+    @pytest.mark.parametrize(
+        "content",
+        [
+            b'{"took": 0.13, "episodes": [1.5, -2e-3, 10, "a\\\\\\"\xc3\xa9",'
+            b' true, false, null, {}, []], "count": 123456, "next": null}',
+            b'{"episodes": [1.5, 22]}',
+            b'{"episodes": [1e10], "total": -1.25E+10, "done": true}',
+        ],
+    )
+    def test_split_at_every_offset(self, content):
+        document = json.loads(content)
+        episodes = document.pop("episodes")
+        for offset in range(1, len(content)):
+            response = _Response(content, len(content))
+            response.iter_content = lambda chunk_size: iter(
+                [content[:offset], content[offset:]]
+            )
+            stream = streaming.ItemStream(response, "episodes")
+            assert list(stream) == episodes, offset
+            assert stream.fields == document, offset
+
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+    def test_async(self, chunk_size):
+        content = json.dumps(PODCAST, ensure_ascii=False).encode("utf-8")
+        response = _AsyncResponse(content, chunk_size)
+
+        async def main():
+            async with streaming.AsyncItemStream(response, "episodes") as s:
+                return [episode async for episode in s], s.fields
+
+        episodes, fields = asyncio.run(main())
+        assert episodes == PODCAST["episodes"]
+        assert fields["genre_ids"] == [86, 160]
+        assert response.closed
+
+    def test_items_are_yielded_before_the_body_is_complete(self):
+        content = json.dumps(PODCAST).encode("utf-8")
+        response = _Response(content, 256)
+        read = []
+        chunks = response.iter_content
+
+        def iter_content(chunk_size):
+            for chunk in chunks(chunk_size):
+                read.append(len(chunk))
+                yield chunk
+
+        response.iter_content = iter_content
+        stream = streaming.ItemStream(response, "episodes")
+        assert next(stream)["id"] == 0
+        assert sum(read) < len(content) / 2
+        stream.close()
+        assert response.closed
+
+    @pytest.mark.parametrize(
+        "content", [b'{"episodes": []}', b"{}", b'{"episodes": null}']
+    )
+    def test_empty(self, content):
+        assert (
+            list(streaming.ItemStream(_Response(content, 3), "episodes")) == []
+        )
+
+    @pytest.mark.parametrize(
+        "content", [b"[]", b'{"episodes": [1, 2', b'{"episodes": [1 2]}']
+    )
+    def test_invalid_json(self, content):
+        with pytest.raises(json.JSONDecodeError):
+            list(streaming.ItemStream(_Response(content, 3), "episodes"))
+
+
+class TestClientStreaming(object):
+    def test_stream_episodes(self):
+        client = podcast_api.Client()
+        adapter = stub_client(client, lambda request: PODCAST)
+        with client.stream_episodes(id="abc", sort="oldest_first") as stream:
+            assert [e["id"] for e in stream] == list(range(100))
+            assert stream.fields["next_episode_pub_date"] == 1479110402000
+        request = adapter.requests[0]
+        assert request.url.endswith("/podcasts/abc?sort=oldest_first")
+
+    def test_stream_batch_episodes(self):
+        client = podcast_api.Client()
+        adapter = stub_client(
+            client, lambda request: {"episodes": PODCAST["episodes"]}
+        )
+        stream = client.stream_batch_episodes(ids=["1", "2"])
+        assert len(list(stream)) == 100
+        assert adapter.requests[0].method == "POST"
+        assert adapter.requests[0].body == "ids=1%2C2"
+
+    def test_async_stream_episodes(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            if request.url.path.endswith("/missing"):
+                return httpx.Response(404, json={"error": "missing"})
+            return httpx.Response(200, json=PODCAST)
+
+        async def main():
+            client = podcast_api.AsyncClient()
+            client.http_client = http_utils.AsyncRequest(
+                transport=httpx.MockTransport(handler)
+            )
+            stream = await client.stream_episodes(id="abc", sort="oldest_first")
+            async with stream:
+                ids = [episode["id"] async for episode in stream]
+            with pytest.raises(errors.NotFoundError) as e:
+                await client.stream_episodes(id="missing")
+            await client.aclose()
+            return ids, e.value.response
+
+        ids, response = asyncio.run(main())
+        assert ids == list(range(100))
+        assert response.json() == {"error": "missing"}
+        assert requests[0].url.query == b"sort=oldest_first"
@@ -0,0 +1,160 @@
+from urllib.parse import parse_qs
+
+import pytest
+
+from listennotes import podcast_api, sync
+from tests.utils import path_of, query_of, stub_client
+
+DAY = 86400000
+PAGE_SIZE = 3
+
+
+class FakeApi(object):
+    """Podcasts with daily episodes, served 3 episodes per page."""
+
+    def __init__(self, episodes):
+        # podcast id => number of episodes
+        self.episodes = dict(episodes)
+        self.calls = []
+
+    def _episodes(self, podcast_id):
+        return [
+            {"id": "%s-%s" % (podcast_id, i), "pub_date_ms": i * DAY}
+            for i in range(self.episodes[podcast_id], 0, -1)
+        ]
+
+    def _latest(self, podcast_id):
+        return self.episodes[podcast_id] * DAY
+
+    def __call__(self, request):
+        path = path_of(request)
+        if request.method == "POST":
+            ids = parse_qs(request.body)["ids"][0].split(",")
+            self.calls.append(("batch", len(ids)))
+            return {
+                "podcasts": [
+                    {"id": i, "latest_pub_date_ms": self._latest(i)}
+                    for i in ids
+                    if i in self.episodes
+                ]
+            }
+        podcast_id = path.rsplit("/", 1)[-1]
+        query = query_of(request)
+        assert query["sort"] == ["recent_first"]
+        before = int(query.get("next_episode_pub_date", ["0"])[0])
+        episodes = [
+            e
+            for e in self._episodes(podcast_id)
+            if not before or e["pub_date_ms"] < before
+        ][:PAGE_SIZE]
+        self.calls.append(("podcast", podcast_id, before))
+        return {
+            "id": podcast_id,
+            "episodes": episodes,
+            "next_episode_pub_date": episodes[-1]["pub_date_ms"]
+            if episodes
+            else None,
+        }
+
+
+def _sync(api, store=None, **kwargs):
+    client = podcast_api.Client()
+    stub_client(client, api)
+    return sync.EpisodeSync(client, store, max_workers=2, **kwargs)
+
+
+class TestEpisodeSync(object):
+    def test_delta_sync(self):
+        api = FakeApi({"a": 5, "b": 2})
+        store = sync.MemoryWatermarkStore()
+        results = list(_sync(api, store).sync(["a", "b", "unknown"]))
+        assert [(r.podcast_id, len(r.episodes)) for r in results] == [
+            ("a", 5),
+            ("b", 2),
+        ]
+        assert results[0].episodes[0]["id"] == "a-5"
+        assert store.get_many(["a", "b"]) == {
+            "a": sync.Watermark(5 * DAY, 5 * DAY),
+            "b": sync.Watermark(2 * DAY, 2 * DAY),
+        }
+
+        # Nothing new: a single batch request
+        api.calls = []
+        engine = _sync(api, store)
+        assert list(engine.sync(["a", "b"])) == []
+        assert api.calls == [("batch", 2)]
+
+        # 4 new episodes of a: 2 pages, stopping at the watermark
+        api.episodes["a"] = 9
+        api.calls = []
+        engine = _sync(api, store)
+        results = list(engine.sync(["a", "b"]))
+        assert [e["id"] for e in results[0].episodes] == [
+            "a-9",
+            "a-8",
+            "a-7",
+            "a-6",
+        ]
+        assert api.calls == [
+            ("batch", 2),
+            ("podcast", "a", 0),
+            ("podcast", "a", 7 * DAY),
+        ]
+        assert engine.stats() == {
+            "checked": 2,
+            "changed": 1,
+            "missing": 0,
+            "episodes": 4,
+            "requests": 2,
+        }
+
+    def test_since_ms(self):
+        api = FakeApi({"a": 10})
+        store = sync.MemoryWatermarkStore()
+        results = list(_sync(api, store, since_ms=8 * DAY).sync(["a"]))
+        assert [e["id"] for e in results[0].episodes] == ["a-10", "a-9"]
+        api.episodes["a"] = 11
+        results = list(_sync(api, store).sync(["a"]))
+        assert [e["id"] for e in results[0].episodes] == ["a-11"]
+
+    def test_watermark_advances_after_consumer(self):
+        api = FakeApi({"a": 2, "b": 2})
+        store = sync.MemoryWatermarkStore()
+        results = _sync(api, store).sync(["a", "b"])
+        next(results)
+        # Interrupted while saving the result of a
+        results.close()
+        assert store.get_many(["a", "b"]) == {}
+
+    def test_error(self):
+        api = FakeApi({"a": 2})
+
+        def handler(request):
+            if request.method == "GET":
+                return 500, {}, {}
+            return api(request)
+
+        client = podcast_api.Client()
+        stub_client(client, handler)
+        store = sync.MemoryWatermarkStore()
+        (result,) = sync.EpisodeSync(client, store).sync(["a"])
+        assert result.error is not None
+        assert store.get_many(["a"]) == {}
+
+    def test_async_client(self):
+        with pytest.raises(TypeError) as e:
+            sync.EpisodeSync(podcast_api.AsyncClient())
+        assert "Client" in str(e.value)
+
+    def test_sqlite_store(self, tmp_path):
+        path = str(tmp_path / "watermarks.db")
+        store = sync.SQLiteWatermarkStore(path)
+        store.set("a", sync.Watermark(2, 1))
+        store.set("b", sync.Watermark(None, None))
+        store = sync.SQLiteWatermarkStore(path)
+        assert store.get_many(["a", "b", "c"]) == {
+            "a": sync.Watermark(2, 1),
+            "b": sync.Watermark(None, None),
+        }
+        store.delete("a")
+        assert len(store) == 1
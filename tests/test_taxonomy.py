@@ -0,0 +1,95 @@
+import pytest
+
+from listennotes import podcast_api, taxonomy
+from tests.utils import path_of, stub_client
+
+GENRES = [
+    {"id": 67, "name": "Podcasts", "parent_id": None},
+    {"id": 93, "name": "Business", "parent_id": 67},
+    {"id": 144, "name": "Personal Finance", "parent_id": 67},
+    {"id": 98, "name": "Investing", "parent_id": 144},
+    {"id": 171, "name": "Careers", "parent_id": 93},
+    {"id": 107, "name": "Science", "parent_id": 67},
+]
+REGIONS = {"us": "United States", "gb": "United Kingdom"}
+LANGUAGES = ["Any language", "English", "French"]
+
+
+def _taxonomy():
+    return taxonomy.Taxonomy(GENRES, REGIONS, LANGUAGES)
+
+
+class TestTaxonomy(object):
+    def test_tree(self):
+        t = _taxonomy()
+        assert t.genre("98").name == "Investing"
+        assert t.parent(98).id == 144
+        assert t.parent(67) is None
+        assert [g.id for g in t.roots()] == [67]
+        assert [g.name for g in t.children(67)] == [
+            "Business",
+            "Personal Finance",
+            "Science",
+        ]
+        assert [g.id for g in t.path(98)] == [67, 144, 98]
+        assert [g.id for g in t.ancestors(98)] == [144, 67]
+        assert [g.id for g in t.descendants(67)] == [93, 144, 107, 171, 98]
+        assert t.is_descendant(98, 67)
+        assert t.is_descendant(98, 98)
+        assert not t.is_descendant(98, 93)
+        with pytest.raises(KeyError):
+            t.path(1)
+
+    def test_cycle(self):
+        with pytest.raises(ValueError):
+            taxonomy.Taxonomy(
+                [
+                    {"id": 1, "name": "A", "parent_id": 2},
+                    {"id": 2, "name": "B", "parent_id": 1},
+                ]
+            )
+
+    def test_search(self):
+        t = _taxonomy()
+        assert [g.id for g in t.search("finance")] == [144]
+        assert [g.id for g in t.search("p")] == [144, 67]
+        assert [g.id for g in t.search("in")] == [98]
+        assert [g.id for g in t.search("PERSONAL fin")] == [144]
+        assert t.search("nance") == []
+        assert t.search(" ") == []
+        assert [g.id for g in t.search("c", limit=1)] == [171]
+
+    def test_regions_and_languages(self):
+        t = _taxonomy()
+        assert t.region_name("US") == "United States"
+        assert t.region_code("united kingdom") == "gb"
+        assert t.language("english") == "English"
+        assert t.language("klingon") is None
+
+    def test_save_and_load(self, tmp_path):
+        path = str(tmp_path / "taxonomy.json.gz")
+        _taxonomy().save(path)
+        t = taxonomy.Taxonomy.load(path)
+        assert t.genres == _taxonomy().genres
+        assert t.regions == REGIONS
+        assert t.languages == tuple(LANGUAGES)
+        assert [g.id for g in t.path(98)] == [67, 144, 98]
+
+    def test_bundled_snapshot(self):
+        t = taxonomy.Taxonomy.load()
+        assert t.genre(144).name == "Personal Finance"
+        assert [g.id for g in t.ancestors(144)] == [67]
+        assert t.region_name("us") == "United States"
+        assert t.language("English") == "English"
+
+    def test_from_api(self):
+        client = podcast_api.Client()
+        payloads = {
+            "/api/v2/genres": {"genres": GENRES},
+            "/api/v2/regions": {"regions": REGIONS},
+            "/api/v2/languages": {"languages": LANGUAGES},
+        }
+        stub_client(client, lambda request: payloads[path_of(request)])
+        t = taxonomy.Taxonomy.from_api(client)
+        assert t.genres == _taxonomy().genres
+        assert t.regions == REGIONS
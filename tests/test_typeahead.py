@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from listennotes import http_utils, podcast_api, typeahead
+from tests.utils import query_of, stub_client
+
+TERMS = {
+    "s": ["star wars", "startup", "science"],
+    "st": ["star wars", "startup"],
+    "sta": ["star wars", "startup"],
+}
+
+
+def _handler(calls):
+    def handler(request):
+        q = query_of(request)["q"][0]
+        calls.append(q)
+        return {"terms": TERMS.get(q, []), "genres": [], "podcasts": []}
+
+    return handler
+
+
+class TestPrefixCache(object):
+    def test_accepts(self):
+        accepts = typeahead.PrefixCache.accepts
+        assert accepts({"q": "star", "show_podcasts": 1, "safe_mode": 0})
+        assert not accepts({"show_podcasts": 1})
+        assert not accepts({"q": "star", "offset": 10})
+
+    def test_normalize_prefix(self):
+        assert typeahead.normalize_prefix("  Star   Wars ") == "star wars"
+
+    def test_lru_eviction_prunes_trie(self):
+        client = podcast_api.Client(
+            typeahead_cache=typeahead.PrefixCache(maxsize=2)
+        )
+        calls = []
+        stub_client(client, _handler(calls))
+        for q in ("s", "st", "sta", "s"):
+            client.typeahead(q=q)
+        assert calls == ["s", "st", "sta", "s"]
+        cache = client.typeahead_cache
+        assert cache.stats()["size"] == 2
+        # "st" was evicted, but the branch to "sta" stays
+        assert cache._roots[("0", "0", "0")].children["s"].children["t"]
+
+        response = client.typeahead(q="s")
+        cache.put({"q": "x"}, response)
+        cache.put({"q": "y"}, response)
+        assert set(cache._roots[("0", "0", "0")].children) == {"x", "y"}
+
+    def test_ttl(self):
+        client = podcast_api.Client(
+            typeahead_cache=typeahead.PrefixCache(ttl=0.05)
+        )
+        calls = []
+        stub_client(client, _handler(calls))
+        client.typeahead(q="st")
+        client.typeahead(q="st")
+        time.sleep(0.06)
+        client.typeahead(q="st")
+        assert calls == ["st", "st"]
+
+
+class TestClientTypeahead(object):
+    def test_exact_hits(self):
+        client = podcast_api.Client(typeahead_cache=True)
+        calls = []
+        stub_client(client, _handler(calls))
+        first = client.typeahead(q="Star", show_podcasts=1)
+        assert client.typeahead(q="star ", show_podcasts=1) is first
+        # Options are part of the key
+        client.typeahead(q="star", show_podcasts=0)
+        client.typeahead(q="star", show_genres=1)
+        # Other params aren't cached
+        client.typeahead(q="star", foo="bar")
+        client.typeahead(q="star", foo="bar")
+        assert calls == ["Star", "star", "star", "star", "star"]
+        assert client.typeahead_cache.stats()["hits"] == 1
+
+    def test_empty_prefix_answers_longer_ones(self):
+        client = podcast_api.Client(typeahead_cache=True)
+        calls = []
+        stub_client(client, _handler(calls))
+        assert client.typeahead(q="zz").json()["terms"] == []
+        response = client.typeahead(q="zzz")
+        assert response.json() == {"terms": [], "genres": [], "podcasts": []}
+        assert calls == ["zz"]
+        # But not for other options
+        client.typeahead(q="zzz", safe_mode=1)
+        assert calls == ["zz", "zzz"]
+        assert client.typeahead_cache.stats()["derived"] == 1
+
+    def test_limits(self):
+        cache = typeahead.PrefixCache(limits={"terms": 3, "podcasts": 5})
+        client = podcast_api.Client(typeahead_cache=cache)
+        calls = []
+        stub_client(client, _handler(calls))
+        # 3 terms is the limit: "s" may have more results
+        client.typeahead(q="s")
+        client.typeahead(q="st")
+        # "st" is complete, so "star" and "startu" are answered from it
+        assert client.typeahead(q="star").json()["terms"] == [
+            "star wars",
+            "startup",
+        ]
+        assert client.typeahead(q="startu").json()["terms"] == ["startup"]
+        assert client.typeahead(q="star w").json()["terms"] == ["star wars"]
+        assert client.typeahead(q="wars").json()["terms"] == []
+        assert calls == ["s", "st", "wars"]
+
+
+class TestTypeaheadSession(object):
+    def test_superseded_queries(self):
+        client = podcast_api.Client(typeahead_cache=True)
+        calls = []
+        stub_client(client, _handler(calls))
+        session = typeahead.TypeaheadSession(client, debounce=0.05)
+        results = {}
+
+        def query(q):
+            results[q] = session.query(q=q)
+
+        first = threading.Thread(target=query, args=("s",))
+        first.start()
+        time.sleep(0.01)
+        query("st")
+        first.join()
+        assert results["s"] is None
+        assert results["st"].json()["terms"] == TERMS["st"]
+        assert calls == ["st"]
+        # Cached prefixes skip the debounce
+        started = time.monotonic()
+        assert session.query(q="st") is results["st"]
+        assert time.monotonic() - started < 0.05
+
+    def test_async_cancels_superseded_request(self):
+        calls = []
+
+        async def handler(request):
+            q = request.url.params["q"]
+            calls.append(q)
+            await asyncio.sleep(0.1)
+            return httpx.Response(200, json={"terms": [q]})
+
+        async def main():
+            client = podcast_api.AsyncClient(typeahead_cache=True)
+            client.http_client = http_utils.AsyncRequest(
+                transport=httpx.MockTransport(handler)
+            )
+            session = typeahead.TypeaheadSession(client, debounce=0.01)
+            async with client:
+                first = asyncio.ensure_future(session.aquery(q="s"))
+                await asyncio.sleep(0.05)
+                second = await session.aquery(q="st")
+                return await first, second
+
+        first, second = asyncio.run(main())
+        assert first is None
+        assert second.json() == {"terms": ["st"]}
+        assert calls == ["s", "st"]
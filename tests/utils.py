@@ -0,0 +1,58 @@
+import json
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class StubAdapter(BaseAdapter):
+    """A requests transport adapter serving canned responses offline.
+
+    handler(request) is called for each prepared request and returns either
+    a dict (a 200 JSON response) or a (status_code, body, headers) tuple.
+    """
+
+    def __init__(self, handler):
+        super(StubAdapter, self).__init__()
+        self.handler = handler
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        result = self.handler(request)
+        if isinstance(result, dict):
+            result = (200, result, {})
+        status_code, body, headers = result
+
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers = CaseInsensitiveDict(headers)
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        response._content = body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.reason = "Stub"
+        response.encoding = "utf-8"
+        return response
+
+    def close(self):
+        pass
+
+
+def stub_client(client, handler):
+    """Route every request made by a podcast_api.Client to handler."""
+    adapter = StubAdapter(handler)
+    client.http_client.session.mount("https://", adapter)
+    client.http_client.session.mount("http://", adapter)
+    return adapter
+
+
+def path_of(request):
+    return urlparse(request.url).path
+
+
+def query_of(request):
+    return parse_qs(urlparse(request.url).query)